@@ -34,7 +34,8 @@ if __name__ == "__main__":
     last_ts = None
 
     while True:
-        if not xdpcHandler.realtime_queue.empty():
+        # Sleeps until the callback queued a sample instead of spinning on empty()
+        if xdpcHandler.waitForSample(timeout=0.5):
             d = xdpcHandler.realtime_queue.get()
 
             if last_ts:
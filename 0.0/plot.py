@@ -1,35 +1,20 @@
 from xdpchandler import *
 import movelladot_pc_sdk
 import pandas as pd
+import os
 import sys
 import threading
 import queue
 from collections import deque
-import math
+import numpy as np
+# quatmath lives in the repository root; appended, so the modules of this folder
+# (xdpchandler, user_settings) still take precedence
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import quatmath
 
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtWidgets, QtCore
 
-# =========================================
-# Conversión quaternion -> Euler
-# =========================================
-def quaternion_to_euler(qw, qx, qy, qz):
-    sinr_cosp = 2 * (qw * qx + qy * qz)
-    cosr_cosp = 1 - 2 * (qx*qx + qy*qy)
-    roll = math.atan2(sinr_cosp, cosr_cosp)
-
-    sinp = 2 * (qw*qy - qz*qx)
-    if abs(sinp) >= 1:
-        pitch = math.copysign(math.pi/2, sinp)
-    else:
-        pitch = math.asin(sinp)
-
-    siny_cosp = 2 * (qw*qz + qx*qy)
-    cosy_cosp = 1 - 2 * (qy*qy + qz*qz)
-    yaw = math.atan2(siny_cosp, cosy_cosp)
-
-    return math.degrees(yaw), math.degrees(pitch), math.degrees(roll)
-
 # =========================================
 # Realtime plot class
 # =========================================
@@ -82,25 +67,25 @@ class RealtimePlot(QtWidgets.QWidget):
         self.resize(900, 600)
 
     def update_plot(self):
-        updated = False
+        samples = []
         while not self.plot_queue.empty():
-            d = self.plot_queue.get()
-            qw, qx, qy, qz = d["qw"], d["qx"], d["qy"], d["qz"]
-            yaw, pitch, roll = quaternion_to_euler(qw, qx, qy, qz)
+            samples.append(self.plot_queue.get())
 
-            self.qw_data.append(qw)
-            self.qx_data.append(qx)
-            self.qy_data.append(qy)
-            self.qz_data.append(qz)
+        if not samples:
+            return
 
-            self.yaw_data.append(yaw)
-            self.pitch_data.append(pitch)
-            self.roll_data.append(roll)
+        # Conversión quaternion -> Euler de todo el bloque a la vez
+        quats = np.array([(d["qw"], d["qx"], d["qy"], d["qz"]) for d in samples])
+        euler = quatmath.toEuler(quats)
 
-            updated = True
+        self.qw_data.extend(quats[:, 0])
+        self.qx_data.extend(quats[:, 1])
+        self.qy_data.extend(quats[:, 2])
+        self.qz_data.extend(quats[:, 3])
 
-        if not updated:
-            return
+        self.roll_data.extend(euler[:, 0])
+        self.pitch_data.extend(euler[:, 1])
+        self.yaw_data.extend(euler[:, 2])
 
         x = range(len(self.qw_data))
 
@@ -166,7 +151,8 @@ if __name__ == "__main__":
     def acquire_data():
         global last_ts
         while True:
-            if not xdpcHandler.realtime_queue.empty():
+            # Sleeps until the callback queued a sample instead of spinning on empty()
+            if xdpcHandler.waitForSample(timeout=0.5):
                 d = xdpcHandler.realtime_queue.get()
 
                 if last_ts:
@@ -1,47 +1,21 @@
 from xdpchandler import *
 import movelladot_pc_sdk
+import os
 import sys
 import threading
 import queue
 from collections import deque
-import math
 import numpy as np
+# quatmath and sessionfile live in the repository root; appended, so the modules of this folder
+# (xdpchandler, user_settings) still take precedence
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import quatmath
+import sessionfile
 
 from pyqtgraph.Qt import QtWidgets, QtCore
 import pyqtgraph as pg
 import pyqtgraph.opengl as gl
 
-# =========================================
-# Funciones auxiliares
-# =========================================
-def quaternion_to_euler(qw, qx, qy, qz):
-    sinr_cosp = 2 * (qw * qx + qy * qz)
-    cosr_cosp = 1 - 2 * (qx*qx + qy*qy)
-    roll = math.atan2(sinr_cosp, cosr_cosp)
-
-    sinp = 2 * (qw*qy - qz*qx)
-    if abs(sinp) >= 1:
-        pitch = math.copysign(math.pi/2, sinp)
-    else:
-        pitch = math.asin(sinp)
-
-    siny_cosp = 2 * (qw*qz + qx*qy)
-    cosy_cosp = 1 - 2 * (qy*qy + qz*qz)
-    yaw = math.atan2(siny_cosp, cosy_cosp)
-
-    return math.degrees(yaw), math.degrees(pitch), math.degrees(roll)
-
-def quaternion_to_matrix(qw, qx, qy, qz):
-    xx = qx*qx; yy = qy*qy; zz = qz*qz
-    xy = qx*qy; xz = qx*qz; yz = qy*qz
-    wx = qw*qx; wy = qw*qy; wz = qw*qz
-
-    return np.array([
-        [1-2*(yy+zz), 2*(xy - wz), 2*(xz + wy)],
-        [2*(xy + wz), 1-2*(xx+zz), 2*(yz - wx)],
-        [2*(xz - wy), 2*(yz + wx), 1-2*(xx+yy)]
-    ])
-
 # =========================================
 # Dashboard widget
 # =========================================
@@ -125,24 +99,24 @@ class DOTDashboard(QtWidgets.QWidget):
         self.resize(1000, 900)
 
     def update_dashboard(self):
-        updated = False
+        samples = []
         while not self.plot_queue.empty():
-            d = self.plot_queue.get()
+            samples.append(self.plot_queue.get())
 
-            ax, ay, az = d.get("ax",0), d.get("ay",0), d.get("az",0)
-            gx, gy, gz = d.get("gx",0), d.get("gy",0), d.get("gz",0)
-            qw, qx, qy, qz = d.get("qw",0), d.get("qx",0), d.get("qy",0), d.get("qz",0)
-            yaw, pitch, roll = quaternion_to_euler(qw,qx,qy,qz)
+        if not samples:
+            return
 
-            self.ax_data.append(ax); self.ay_data.append(ay); self.az_data.append(az)
-            self.gx_data.append(gx); self.gy_data.append(gy); self.gz_data.append(gz)
-            self.yaw_data.append(yaw); self.pitch_data.append(pitch); self.roll_data.append(roll)
+        # Todo el bloque de muestras se convierte de una vez
+        acc = np.array([(d.get("ax",0), d.get("ay",0), d.get("az",0)) for d in samples])
+        gyr = np.array([(d.get("gx",0), d.get("gy",0), d.get("gz",0)) for d in samples])
+        quats = np.array([(d.get("qw",0), d.get("qx",0), d.get("qy",0), d.get("qz",0)) for d in samples])
+        euler = quatmath.toEuler(quats)
 
-            self.last_matrix = quaternion_to_matrix(qw,qx,qy,qz)
-            updated = True
+        self.ax_data.extend(acc[:, 0]); self.ay_data.extend(acc[:, 1]); self.az_data.extend(acc[:, 2])
+        self.gx_data.extend(gyr[:, 0]); self.gy_data.extend(gyr[:, 1]); self.gz_data.extend(gyr[:, 2])
+        self.roll_data.extend(euler[:, 0]); self.pitch_data.extend(euler[:, 1]); self.yaw_data.extend(euler[:, 2])
 
-        if not updated:
-            return
+        self.last_matrix = quatmath.toMatrix(quats[-1])
 
         # Actualizar cubo 3D
         verts_centered = self.cube_verts - np.mean(self.cube_verts, axis=0)
@@ -197,9 +171,12 @@ if __name__ == "__main__":
         sys.exit(-1)
 
     plot_queue = queue.Queue(maxsize=500)  # Cola limitada para GUI
-    data_log = []
     last_ts = None
 
+    # Las muestras se escriben a disco durante la sesión, no en una lista en memoria
+    session_file = "movella_dot_dashboard.session"
+    xdpcHandler.startSessionRecording(session_file)
+
     # Data acquisition thread
     def acquire_data():
         global last_ts
@@ -230,8 +207,6 @@ if __name__ == "__main__":
                 "qz": d.get("qz",0.0)
             }
 
-            data_log.append(row)
-
             # Evitar que la cola se llene y genere retrasos
             while True:
                 try:
@@ -252,9 +227,10 @@ if __name__ == "__main__":
     dashboard.show()
 
     try:
-        sys.exit(app.exec_())
+        status = app.exec_()
     except KeyboardInterrupt:
-        import pandas as pd
-        df = pd.DataFrame(data_log)
-        df.to_csv("movella_dot_dashboard.csv", index=False)
-        print("Datos guardados")
+        status = 0
+    xdpcHandler.stopSessionRecording()
+    sessionfile.toCsv(session_file, "movella_dot_dashboard.csv", device.bluetoothAddress())
+    print("Datos guardados")
+    sys.exit(status)
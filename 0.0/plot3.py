@@ -1,6 +1,11 @@
+import os
 import sys
 import threading
 import numpy as np
+# quatmath lives in the repository root; appended, so the modules of this folder
+# (xdpchandler, user_settings) still take precedence
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import quatmath
 import pyqtgraph.opengl as gl
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import QTimer
@@ -8,17 +13,6 @@ from PyQt5.QtCore import QTimer
 from xdpchandler import *
 import movelladot_pc_sdk
 
-# ==========================================================
-# Quaternion → Rotation Matrix
-# ==========================================================
-def quat_to_matrix(q):
-    w, x, y, z = q
-    return np.array([
-        [1 - 2*(y*y + z*z), 2*(x*y - z*w),     2*(x*z + y*w)],
-        [2*(x*y + z*w),     1 - 2*(x*x + z*z), 2*(y*z - x*w)],
-        [2*(x*z - y*w),     2*(y*z + x*w),     1 - 2*(x*x + y*y)]
-    ])
-
 # ==========================================================
 # Global quaternion (shared)
 # ==========================================================
@@ -61,7 +55,8 @@ def sensor_loop():
     print("📡 Streaming orientation...")
 
     while True:
-        if not xdpcHandler.realtime_queue.empty():
+        # Sleeps until the callback queued a sample instead of spinning on empty()
+        if xdpcHandler.waitForSample(timeout=0.5):
             d = xdpcHandler.realtime_queue.get()
 
             q = np.array([
@@ -137,7 +132,7 @@ def update():
     with lock:
         q = current_quat.copy()
 
-    R = quat_to_matrix(q)
+    R = quatmath.toMatrix(q)
     rotated = verts0 @ R.T
 
     mesh.setMeshData(
@@ -1,7 +1,11 @@
+import os
+import sys
 from xdpchandler import *
 import movelladot_pc_sdk
-
-import pandas as pd
+# sessionfile lives in the repository root; appended, so the modules of this folder
+# (xdpchandler, user_settings) still take precedence
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import sessionfile
 
 
 if __name__ == "__main__":
@@ -31,19 +35,22 @@ if __name__ == "__main__":
         print("Failed to start measurement")
         exit(-1)
 
+    # ===============================
+    # DATA STORAGE
+    # ===============================
+    # Every sample is written to disk while streaming, a crash only loses the last second
+    session_file = "movella_dot_data.session"
+    xdpcHandler.startSessionRecording(session_file, metadata={"payloadMode": "CustomMode5"})
+
     print("\nStreaming data in real time...\n")
     print("Press CTRL + C to stop and save CSV file")
 
     last_ts = None
 
-    # ===============================
-    # DATA STORAGE
-    # ===============================
-    data_log = []
-
     try:
         while True:
-            if not xdpcHandler.realtime_queue.empty():
+            # Sleeps until the callback queued a sample instead of spinning on empty()
+            if xdpcHandler.waitForSample(timeout=0.5):
                 d = xdpcHandler.realtime_queue.get()
 
                 if last_ts:
@@ -53,39 +60,24 @@ if __name__ == "__main__":
 
                 last_ts = d["timestamp"]
 
-                row = {
-                    "timestamp": d.get("timestamp", 0),
-                    "dt": dt,
-
-                    "qw": d.get("qw", 0.0),
-                    "qx": d.get("qx", 0.0),
-                    "qy": d.get("qy", 0.0),
-                    "qz": d.get("qz", 0.0),
-
-                    "ax": d.get("ax", 0.0),
-                    "ay": d.get("ay", 0.0),
-                    "az": d.get("az", 0.0),
-
-                    "gx": d.get("gx", 0.0),
-                    "gy": d.get("gy", 0.0),
-                    "gz": d.get("gz", 0.0),
-                }
-
-                data_log.append(row)
-
                 print(
                     f"dt:{dt:.4f}  "
-                    f"Q:[{row['qw']:.3f},{row['qx']:.3f},{row['qy']:.3f},{row['qz']:.3f}]  "
-                    f"A:[{row['ax']:.3f},{row['ay']:.3f},{row['az']:.3f}]  "
-                    f"G:[{row['gx']:.3f},{row['gy']:.3f},{row['gz']:.3f}]"
+                    f"Q:[{d['qw']:.3f},{d['qx']:.3f},{d['qy']:.3f},{d['qz']:.3f}]  "
+                    f"A:[{d['ax']:.3f},{d['ay']:.3f},{d['az']:.3f}]  "
+                    f"G:[{d['gx']:.3f},{d['gy']:.3f},{d['gz']:.3f}]"
                 )
 
     except KeyboardInterrupt:
         print("\nStopping measurement and saving CSV file...")
 
-        df = pd.DataFrame(data_log)
+        stats = xdpcHandler.realtimeQueueStats()
+        print(f"Realtime queue: {stats['put']} samples received, {stats['dropped']} dropped, "
+              f"{stats['coalesced']} coalesced, max depth {stats['max_depth']}/{stats['maxsize']}")
+
+        session = xdpcHandler.stopSessionRecording()
+        print(f"Session: {session['records']} samples in {session['bytes']} bytes, {session_file}")
 
         filename = "movella_dot_data.csv"
-        df.to_csv(filename, index=False)
+        sessionfile.toCsv(session_file, filename, device.bluetoothAddress())
 
         print(f"Data saved to {filename}")
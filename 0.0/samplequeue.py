@@ -0,0 +1,177 @@
+#  Bounded queue between the SDK callback thread and the consumers of the XdpcHandler.
+#
+#  queue.Queue can only block or raise when it is full, which is not acceptable on the SDK
+#  callback thread, and an unbounded queue grows without limit when a consumer stalls.
+#  SampleQueue has a fixed capacity and a configurable policy for what happens on overflow.
+#
+
+from collections import deque
+from queue import Empty
+from threading import Condition
+import time
+
+# Overflow policies
+DROP_OLDEST = "drop-oldest"    # discard the oldest queued sample to make room
+DROP_NEWEST = "drop-newest"    # discard the incoming sample
+BLOCK = "block"                # the producer waits until the consumer made room
+COALESCE = "coalesce"          # discard the whole backlog, only the incoming (latest) sample is kept
+
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK, COALESCE)
+
+
+class SampleQueue:
+    """
+    Thread-safe FIFO with a fixed capacity and an overflow policy
+
+    The get side follows queue.Queue (get, get_nowait, empty, qsize, queue.Empty), so
+    existing consumers keep working. Dropped and coalesced samples are counted and
+    available through stats().
+    """
+    def __init__(self, maxsize=1000, policy=DROP_OLDEST):
+        """
+        Parameters:
+            maxsize: The maximum number of queued samples, must be at least 1
+            policy: One of DROP_OLDEST, DROP_NEWEST, BLOCK or COALESCE
+        """
+        if maxsize < 1:
+            raise ValueError(f"Queue capacity must be at least 1, got {maxsize}")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}', expected one of {', '.join(POLICIES)}")
+
+        self.__maxsize = maxsize
+        self.__policy = policy
+        self.__items = deque()
+        self.__condition = Condition()
+
+        self.__put = 0
+        self.__dropped = 0
+        self.__coalesced = 0
+        self.__maxDepth = 0
+
+    def maxsize(self):
+        """
+        Returns:
+             The capacity of the queue
+        """
+        return self.__maxsize
+
+    def policy(self):
+        """
+        Returns:
+             The overflow policy of the queue
+        """
+        return self.__policy
+
+    def put(self, item):
+        """
+        Adds an item to the queue, applying the overflow policy when the queue is full
+
+        Parameters:
+            item: The item to queue
+        Returns:
+            False if the item itself was dropped, True otherwise
+        """
+        with self.__condition:
+            self.__put += 1
+            if len(self.__items) >= self.__maxsize:
+                if self.__policy == DROP_OLDEST:
+                    self.__items.popleft()
+                    self.__dropped += 1
+                elif self.__policy == DROP_NEWEST:
+                    self.__dropped += 1
+                    return False
+                elif self.__policy == COALESCE:
+                    self.__coalesced += len(self.__items)
+                    self.__items.clear()
+                else:
+                    while len(self.__items) >= self.__maxsize:
+                        self.__condition.wait()
+
+            self.__items.append(item)
+            if len(self.__items) > self.__maxDepth:
+                self.__maxDepth = len(self.__items)
+            self.__condition.notify_all()
+            return True
+
+    def get(self, block=True, timeout=None):
+        """
+        Removes and returns the oldest item
+
+        Parameters:
+            block: Wait for an item if the queue is empty
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+             The oldest item
+        Raises:
+            queue.Empty if no item became available
+        """
+        with self.__condition:
+            if not self.__items:
+                if not block:
+                    raise Empty
+                if timeout is None:
+                    while not self.__items:
+                        self.__condition.wait()
+                else:
+                    deadline = time.monotonic() + timeout
+                    while not self.__items:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise Empty
+                        self.__condition.wait(remaining)
+
+            item = self.__items.popleft()
+            if self.__policy == BLOCK:
+                self.__condition.notify_all()
+            return item
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the queue holds at least one item, without removing it
+
+        Parameters:
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+            True if an item is available, False if the timeout expired
+        """
+        with self.__condition:
+            return bool(self.__condition.wait_for(lambda: self.__items, timeout))
+
+    def get_nowait(self):
+        """
+        Same as get(block=False)
+        """
+        return self.get(block=False)
+
+    def empty(self):
+        """
+        Returns:
+             True if no items are queued
+        """
+        with self.__condition:
+            return not self.__items
+
+    def qsize(self):
+        """
+        Returns:
+             The number of queued items
+        """
+        with self.__condition:
+            return len(self.__items)
+
+    def stats(self):
+        """
+        Returns:
+             A dict with the capacity, policy, current depth, maximum depth reached and
+             the number of samples put, dropped and coalesced since the queue was created
+        """
+        with self.__condition:
+            return {
+                "maxsize": self.__maxsize,
+                "policy": self.__policy,
+                "depth": len(self.__items),
+                "max_depth": self.__maxDepth,
+                "put": self.__put,
+                "dropped": self.__dropped,
+                "coalesced": self.__coalesced,
+            }
@@ -27,10 +27,16 @@
 #  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #  
 
+import os
+import sys
 import movelladot_pc_sdk
 from collections import defaultdict
 from threading import Lock
-from queue import Queue
+from samplequeue import SampleQueue, DROP_OLDEST
+# sessionfile lives in the repository root; appended, so the modules of this folder
+# (samplequeue, user_settings) still take precedence
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sessionfile import SessionWriter
 from pynput import keyboard
 from user_settings import *
 import time
@@ -45,7 +51,7 @@ def on_press(key):
 
 
 class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
-    def __init__(self, max_buffer_size=5):
+    def __init__(self, max_buffer_size=5, queue_capacity=1000, queue_policy=DROP_OLDEST):
         movelladot_pc_sdk.XsDotCallback.__init__(self)
 
         self.__manager = 0
@@ -66,7 +72,10 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         self.__maxNumberOfPacketsInBuffer = max_buffer_size
         self.__packetBuffer = defaultdict(list)
         self.__progress = dict()
-        self.realtime_queue = Queue()
+        self.realtime_queue = SampleQueue(queue_capacity, queue_policy)
+        # SessionWriter while startSessionRecording is active, and the slot of each recorded address
+        self.__sessionWriter = None
+        self.__sessionSlots = dict()
 
 
     def initialize(self):
@@ -100,6 +109,8 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         """
         Close connections to any Movella DOT devices and destructs the connection manager created in initialize
         """
+        if self.__sessionWriter is not None:
+            self.stopSessionRecording()
         print("Closing ports...")
         self.__closing = True
         self.__manager.close()
@@ -275,6 +286,61 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         self.__lock.release()
         return res
 
+    def waitForSample(self, timeout=None):
+        """
+        Blocks until the realtime queue holds a sample, without polling
+
+        Parameters:
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+            True if a sample is available, False if the timeout expired
+        """
+        return self.realtime_queue.wait(timeout)
+
+    def realtimeQueueStats(self):
+        """
+        Returns:
+             A dict with the depth, maximum depth and the number of put, dropped and coalesced
+             samples of the realtime queue, see SampleQueue.stats()
+        """
+        return self.realtime_queue.stats()
+
+    def startSessionRecording(self, path, metadata=None, **kwargs):
+        """
+        Starts writing every live sample of the connected devices to a binary session file
+        All samples are recorded, including those the realtime queue drops when the consumer is slow.
+        A background thread writes them, see sessionfile.SessionWriter; sessionfile.toCsv converts
+        the session to the CSV layout of recordDAta.py
+
+        Parameters:
+            path: The session file to create
+            metadata: A dict with additional header fields, e.g. the payload mode
+            kwargs: Passed on to SessionWriter, e.g. fsyncInterval
+        Returns:
+             The SessionWriter
+        """
+        if self.__sessionWriter is not None:
+            raise RuntimeError(f"Already recording to {self.__sessionWriter.path()}")
+        addresses = [device.bluetoothAddress() for device in self.__connectedDots]
+        outputRates = {device.outputRate() for device in self.__connectedDots}
+        self.__sessionSlots = {address: slot for slot, address in enumerate(addresses)}
+        self.__sessionWriter = SessionWriter(path, addresses, outputRate=outputRates.pop() if len(outputRates) == 1 else None,
+                                             metadata=metadata, **kwargs)
+        return self.__sessionWriter
+
+    def stopSessionRecording(self):
+        """
+        Stops the session recording, writes the queued samples and closes the session file
+
+        Returns:
+             The final SessionWriter.stats(), None if no session was recorded
+        """
+        writer = self.__sessionWriter
+        if writer is None:
+            return None
+        self.__sessionWriter = None
+        return writer.close()
+
     def packetsReceived(self):
         """
         Returns:
@@ -385,6 +451,16 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
 
         self.realtime_queue.put(data)
 
+        writer = self.__sessionWriter
+        if writer is not None:
+            address = device.bluetoothAddress()
+            slot = self.__sessionSlots.get(address)
+            if slot is None:
+                slot = self.__sessionSlots[address] = len(self.__sessionSlots)
+                writer.setDevice(slot, address)
+            writer.addSample(slot, data["timestamp"], time.time(), (data["qw"], data["qx"], data["qy"], data["qz"]),
+                             (data["ax"], data["ay"], data["az"]), (data["gx"], data["gy"], data["gz"]))
+
 
     def onProgressUpdated(self, device, current, total, identifier):
         """
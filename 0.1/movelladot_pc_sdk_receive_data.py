@@ -1,5 +1,6 @@
 from xdpchandler import *
 import movelladot_pc_sdk
+import numpy as np
 
 if __name__ == "__main__":
 
@@ -31,23 +32,27 @@ if __name__ == "__main__":
 
     print("\nStreaming data in real time...\n")
 
+    address = device.portInfo().bluetoothAddress()
     last_ts = None
 
     while True:
-        if not xdpcHandler.realtime_queue.empty():
-            d = xdpcHandler.realtime_queue.get()
+        # Sleeps until the callback stored new samples instead of spinning on read()
+        if not xdpcHandler.waitForSamples(address, timeout=0.5):
+            continue
 
-            if last_ts:
-                dt = (d["timestamp"] - last_ts) / 1e6
-            else:
-                dt = 0j
+        samples = xdpcHandler.sample_store.read(address)
+        if len(samples) == 0:
+            continue
 
-            last_ts = d["timestamp"]
+        # dt de todo el bloque de una vez
+        ts = samples["timestamp"]
+        dt = np.diff(ts, prepend=ts[0] if last_ts is None else last_ts) / 1e6
+        last_ts = ts[-1]
 
+        for dt_i, q, a, g in zip(dt, samples["quat"], samples["acc"], samples["gyro"]):
             print(
-                f"dt:{dt:.4f}  "
-                f"Q:[{d.get('qw',0):.3f},{d.get('qx',0):.3f},{d.get('qy',0):.3f},{d.get('qz',0):.3f}]  "
-                f"A:[{d.get('ax',0):.3f},{d.get('ay',0):.3f},{d.get('az',0):.3f}]  "
-                f"G:[{d.get('gx',0):.3f},{d.get('gy',0):.3f},{d.get('gz',0):.3f}]"
+                f"dt:{dt_i:.4f}  "
+                f"Q:[{q[0]:.3f},{q[1]:.3f},{q[2]:.3f},{q[3]:.3f}]  "
+                f"A:[{a[0]:.3f},{a[1]:.3f},{a[2]:.3f}]  "
+                f"G:[{g[0]:.3f},{g[1]:.3f},{g[2]:.3f}]"
             )
-
@@ -1,28 +1,12 @@
 from xdpchandler import *
 import movelladot_pc_sdk
 import matplotlib.pyplot as plt
-from collections import deque
+import numpy as np
 
 plt.ion()
 
 N = 100
 
-# Colas para quaterniones
-qw_vals = deque([0]*N, maxlen=N)
-qx_vals = deque([0]*N, maxlen=N)
-qy_vals = deque([0]*N, maxlen=N)
-qz_vals = deque([0]*N, maxlen=N)
-
-# Colas para aceleración
-ax_vals = deque([0]*N, maxlen=N)
-ay_vals = deque([0]*N, maxlen=N)
-az_vals = deque([0]*N, maxlen=N)
-
-# Colas para giroscopio
-gx_vals = deque([0]*N, maxlen=N)
-gy_vals = deque([0]*N, maxlen=N)
-gz_vals = deque([0]*N, maxlen=N)
-
 if __name__ == "__main__":
 
     xdpcHandler = XdpcHandler()
@@ -64,45 +48,35 @@ if __name__ == "__main__":
 
     print("\nStreaming data in real time...\n")
 
+    address = device.portInfo().bluetoothAddress()
+
     while True:
-        if not xdpcHandler.realtime_queue.empty():
-            d = xdpcHandler.realtime_queue.get()
+        # Sleeps until the callback stored new samples instead of spinning on read()
+        if not xdpcHandler.waitForSamples(address, timeout=0.5):
+            continue
 
-            # Mostrar en consola
+        samples = xdpcHandler.sample_store.read(address)
+        if len(samples) == 0:
+            continue
+
+        # Mostrar en consola
+        for q, a, g in zip(samples["quat"], samples["acc"], samples["gyro"]):
             print(
-                f"Q:[{d.get('qw',0):.3f},{d.get('qx',0):.3f},{d.get('qy',0):.3f},{d.get('qz',0):.3f}]  "
-                f"A:[{d.get('ax',0):.3f},{d.get('ay',0):.3f},{d.get('az',0):.3f}]  "
-                f"G:[{d.get('gx',0):.3f},{d.get('gy',0):.3f},{d.get('gz',0):.3f}]"
+                f"Q:[{q[0]:.3f},{q[1]:.3f},{q[2]:.3f},{q[3]:.3f}]  "
+                f"A:[{a[0]:.3f},{a[1]:.3f},{a[2]:.3f}]  "
+                f"G:[{g[0]:.3f},{g[1]:.3f},{g[2]:.3f}]"
             )
 
-            # Guardar datos en colas
-            qw_vals.append(d.get("qw",0))
-            qx_vals.append(d.get("qx",0))
-            qy_vals.append(d.get("qy",0))
-            qz_vals.append(d.get("qz",0))
-
-            ax_vals.append(d.get("ax",0))
-            ay_vals.append(d.get("ay",0))
-            az_vals.append(d.get("az",0))
-
-            gx_vals.append(d.get("gx",0))
-            gy_vals.append(d.get("gy",0))
-            gz_vals.append(d.get("gz",0))
-
-            # Actualizar plots
-            for line, vals, ax in zip(lines_q, [qw_vals,qx_vals,qy_vals,qz_vals], [axs[0]]*4):
-                line.set_ydata(vals)
-                line.set_xdata(range(len(vals)))
-                ax.set_ylim(min(vals)-0.1, max(vals)+0.1)
-
-            for line, vals, ax in zip(lines_a, [ax_vals,ay_vals,az_vals], [axs[1]]*3):
-                line.set_ydata(vals)
-                line.set_xdata(range(len(vals)))
-                ax.set_ylim(min(vals)-1, max(vals)+1)
-
-            for line, vals, ax in zip(lines_g, [gx_vals,gy_vals,gz_vals], [axs[2]]*3):
-                line.set_ydata(vals)
-                line.set_xdata(range(len(vals)))
-                ax.set_ylim(min(vals)-1, max(vals)+1)
-
-            plt.pause(0.001)
+        # Ventana con las últimas N muestras, como bloques N×4 (Q) y N×3 (A, G)
+        window = xdpcHandler.sample_store.latest(address, N)
+        x = np.arange(len(window))
+
+        # Actualizar plots
+        for block, lines, ax, margin in ((window["quat"], lines_q, axs[0], 0.1),
+                                         (window["acc"], lines_a, axs[1], 1),
+                                         (window["gyro"], lines_g, axs[2], 1)):
+            for k, line in enumerate(lines):
+                line.set_data(x, block[:, k])
+            ax.set_ylim(block.min() - margin, block.max() + margin)
+
+        plt.pause(0.001)
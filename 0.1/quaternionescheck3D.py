@@ -2,6 +2,7 @@ from xdpchandler import *
 import movelladot_pc_sdk
 import matplotlib.pyplot as plt
 from collections import deque
+import numpy as np
 
 # Número de puntos a mostrar en la gráfica
 N = 100
@@ -52,27 +53,31 @@ if __name__ == "__main__":
 
     print("\nStreaming cuaterniones en tiempo real...\n")
 
+    address = device.portInfo().bluetoothAddress()
+
     while True:
-        if not xdpcHandler.realtime_queue.empty():
-            d = xdpcHandler.realtime_queue.get()
-            qw, qx, qy, qz = d.get("qw",0), d.get("qx",0), d.get("qy",0), d.get("qz",0)
+        # Sleeps until the callback stored new samples instead of spinning on read()
+        if not xdpcHandler.waitForSamples(address, timeout=0.5):
+            continue
+
+        quats = xdpcHandler.sample_store.read(address)["quat"]
 
-            # Ignorar datos vacíos
-            if qw==0 and qx==0 and qy==0 and qz==0:
-                continue
+        # Ignorar datos vacíos
+        quats = quats[np.any(quats != 0, axis=1)]
+        if len(quats) == 0:
+            continue
 
-            # Mostrar en terminal
+        # Mostrar en terminal
+        for qw, qx, qy, qz in quats:
             print(f"Q: [{qw:.3f}, {qx:.3f}, {qy:.3f}, {qz:.3f}]")
 
-            # Guardar en colas
-            qw_vals.append(qw)
-            qx_vals.append(qx)
-            qy_vals.append(qy)
-            qz_vals.append(qz)
+        # Guardar en colas, una columna (qw, qx, qy, qz) por cola
+        for vals, column in zip([qw_vals, qx_vals, qy_vals, qz_vals], quats.T):
+            vals.extend(column)
 
-            # Actualizar plot
-            for line, vals in zip(lines, [qw_vals, qx_vals, qy_vals, qz_vals]):
-                line.set_ydata(vals)
-                line.set_xdata(range(len(vals)))
+        # Actualizar plot
+        for line, vals in zip(lines, [qw_vals, qx_vals, qy_vals, qz_vals]):
+            line.set_ydata(vals)
+            line.set_xdata(range(len(vals)))
 
-            plt.pause(0.01)
+        plt.pause(0.01)
@@ -1,9 +1,15 @@
+import os
+import sys
 from xdpchandler import *
 import movelladot_pc_sdk
 import matplotlib.pyplot as plt
 from collections import deque
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
+# quatmath lives in the repository root; appended, so the modules of this folder
+# (xdpchandler, user_settings) still take precedence
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import quatmath
 
 # Número de puntos para la gráfica de cuaterniones (2D)
 N = 100
@@ -41,14 +47,6 @@ ax3d.set_zlabel("Z")
 # Vector de referencia del sensor (ej. eje X del sensor)
 v_ref = np.array([1,0,0])
 
-# Función para convertir cuaternión a matriz de rotación
-def quat_to_rot_matrix(qw, qx, qy, qz):
-    return np.array([
-        [1-2*(qy**2 + qz**2), 2*(qx*qy - qz*qw), 2*(qx*qz + qy*qw)],
-        [2*(qx*qy + qz*qw), 1-2*(qx**2 + qz**2), 2*(qy*qz - qx*qw)],
-        [2*(qx*qz - qy*qw), 2*(qy*qz + qx*qw), 1-2*(qx**2 + qy**2)]
-    ])
-
 if __name__ == "__main__":
     xdpcHandler = XdpcHandler()
     if not xdpcHandler.initialize():
@@ -73,39 +71,42 @@ if __name__ == "__main__":
 
     print("\nStreaming cuaterniones en tiempo real...\n")
 
+    address = device.portInfo().bluetoothAddress()
+
     while True:
-        if not xdpcHandler.realtime_queue.empty():
-            d = xdpcHandler.realtime_queue.get()
-            qw, qx, qy, qz = d.get("qw",0), d.get("qx",0), d.get("qy",0), d.get("qz",0)
-
-            if qw==0 and qx==0 and qy==0 and qz==0:
-                continue
-
-            # Guardar en colas para 2D
-            qw_vals.append(qw)
-            qx_vals.append(qx)
-            qy_vals.append(qy)
-            qz_vals.append(qz)
-
-            # Actualizar gráfica 2D
-            for line, vals in zip(lines, [qw_vals, qx_vals, qy_vals, qz_vals]):
-                line.set_ydata(vals)
-                line.set_xdata(range(len(vals)))
-
-            # --- Orientación 3D ---
-            R = quat_to_rot_matrix(qw, qx, qy, qz)
-            v_rot = R @ v_ref  # vector rotado
-
-            ax3d.cla()  # limpiar plot 3D
-            ax3d.set_xlim([-1, 1])
-            ax3d.set_ylim([-1, 1])
-            ax3d.set_zlim([-1, 1])
-            ax3d.set_title("Orientación 3D del sensor")
-            ax3d.set_xlabel("X")
-            ax3d.set_ylabel("Y")
-            ax3d.set_zlabel("Z")
-
-            # Dibujar vector rotado
-            ax3d.quiver(0,0,0, v_rot[0], v_rot[1], v_rot[2], length=1, color='r')
-
-            plt.pause(0.01)
+        # Sleeps until the callback stored new samples instead of spinning on read()
+        if not xdpcHandler.waitForSamples(address, timeout=0.5):
+            continue
+
+        quats = xdpcHandler.sample_store.read(address)["quat"]
+
+        # Ignorar datos vacíos
+        quats = quats[np.any(quats != 0, axis=1)]
+        if len(quats) == 0:
+            continue
+
+        # Guardar en colas para 2D, una columna (qw, qx, qy, qz) por cola
+        for vals, column in zip([qw_vals, qx_vals, qy_vals, qz_vals], quats.T):
+            vals.extend(column)
+
+        # Actualizar gráfica 2D
+        for line, vals in zip(lines, [qw_vals, qx_vals, qy_vals, qz_vals]):
+            line.set_ydata(vals)
+            line.set_xdata(range(len(vals)))
+
+        # --- Orientación 3D con la muestra más reciente ---
+        v_rot = quatmath.rotate(quats[-1], v_ref)  # vector rotado
+
+        ax3d.cla()  # limpiar plot 3D
+        ax3d.set_xlim([-1, 1])
+        ax3d.set_ylim([-1, 1])
+        ax3d.set_zlim([-1, 1])
+        ax3d.set_title("Orientación 3D del sensor")
+        ax3d.set_xlabel("X")
+        ax3d.set_ylabel("Y")
+        ax3d.set_zlabel("Z")
+
+        # Dibujar vector rotado
+        ax3d.quiver(0,0,0, v_rot[0], v_rot[1], v_rot[2], length=1, color='r')
+
+        plt.pause(0.01)
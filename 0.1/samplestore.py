@@ -0,0 +1,227 @@
+#  Columnar storage for the live samples received by the XdpcHandler.
+#
+#  Every device gets a preallocated structured NumPy array that is used as a ring: the SDK
+#  callback writes the timestamp, orientation, acceleration and gyroscope values of a sample
+#  in place, and consumers read whole blocks of samples at once instead of one dict per sample.
+#
+
+import numpy as np
+from threading import Lock, Condition
+
+# One row per sample
+SAMPLE_DTYPE = np.dtype([
+    ("timestamp", np.int64),        # sampleTimeFine in microseconds
+    ("quat", np.float64, (4,)),     # qw, qx, qy, qz
+    ("acc", np.float64, (3,)),      # calibrated acceleration ax, ay, az [m/s²]
+    ("gyro", np.float64, (3,)),     # calibrated angular velocity gx, gy, gz [deg/s]
+])
+
+
+class _DeviceSamples:
+    """
+    Ring of samples of a single device
+    """
+    def __init__(self, capacity):
+        self.rows = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        # Field views, so the callback does not have to look up the fields for every sample
+        self.timestamp = self.rows["timestamp"]
+        self.quat = self.rows["quat"]
+        self.acc = self.rows["acc"]
+        self.gyro = self.rows["gyro"]
+        # Total number of samples written and read, the ring index is the count modulo capacity
+        self.written = 0
+        self.read = 0
+        self.overruns = 0
+
+
+class SampleStore:
+    """
+    Preallocated per-device sample storage
+
+    The producer (the SDK callback) only writes into arrays that were allocated when the
+    device sent its first sample, so there are no per-sample allocations on the callback
+    thread. When a consumer falls behind more than the capacity, the oldest unread samples
+    are overwritten and counted as overruns.
+    """
+    def __init__(self, capacity=4096):
+        """
+        Parameters:
+            capacity: The number of samples kept per device
+        """
+        if capacity < 1:
+            raise ValueError(f"Sample store capacity must be at least 1, got {capacity}")
+
+        self.__capacity = capacity
+        self.__lock = Lock()
+        # Signalled by append, lets consumers sleep until new samples arrive
+        self.__newSamples = Condition(self.__lock)
+        # Number of consumers blocked in waitAll, append only notifies when there is one
+        self.__waiters = 0
+        self.__devices = dict()
+
+    def capacity(self):
+        """
+        Returns:
+             The number of samples kept per device
+        """
+        return self.__capacity
+
+    def addresses(self):
+        """
+        Returns:
+             A list with the bluetooth addresses of the devices that have sent samples
+        """
+        self.__lock.acquire()
+        res = list(self.__devices)
+        self.__lock.release()
+        return res
+
+    def append(self, address, timestamp, quat, acc, gyro):
+        """
+        Writes one sample in place
+
+        Parameters:
+            address: The bluetooth address of the device that sent the sample
+            timestamp: The sampleTimeFine of the sample
+            quat: The orientation quaternion (w, x, y, z), any sequence of 4 values
+            acc: The calibrated acceleration (x, y, z), any sequence of 3 values
+            gyro: The calibrated angular velocity (x, y, z), any sequence of 3 values
+        """
+        self.__lock.acquire()
+        dev = self.__devices.get(address)
+        if dev is None:
+            dev = self.__devices[address] = _DeviceSamples(self.__capacity)
+
+        i = dev.written % self.__capacity
+        dev.timestamp[i] = timestamp
+        dev.quat[i] = quat
+        dev.acc[i] = acc
+        dev.gyro[i] = gyro
+        dev.written += 1
+        # The waiter count is changed under the same lock, so a consumer that registered has not
+        # checked its predicate yet or is already waiting
+        if self.__waiters:
+            self.__newSamples.notify_all()
+        self.__lock.release()
+
+    def available(self, address):
+        """
+        Parameters:
+            address: The bluetooth address of the device
+        Returns:
+             The number of samples that were not read yet
+        """
+        self.__lock.acquire()
+        dev = self.__devices.get(address)
+        res = 0 if dev is None else min(dev.written - dev.read, self.__capacity)
+        self.__lock.release()
+        return res
+
+    def wait(self, address, timeout=None):
+        """
+        Blocks until a device has unread samples, without polling
+
+        Parameters:
+            address: The bluetooth address of the device
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+            True if unread samples are available, False if the timeout expired
+        """
+        return self.waitAll([address], timeout)
+
+    def waitAll(self, addresses, timeout=None):
+        """
+        Blocks until each of the devices has unread samples, without polling
+
+        Parameters:
+            addresses: The bluetooth addresses of the devices
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+            True if unread samples are available for each device, False if the timeout expired
+        """
+        self.__newSamples.acquire()
+        self.__waiters += 1
+        res = self.__newSamples.wait_for(lambda: all(self.__unread(address) > 0 for address in addresses), timeout)
+        self.__waiters -= 1
+        self.__newSamples.release()
+        return res
+
+    def __unread(self, address):
+        """
+        The number of samples written but not read yet, the lock must be held
+        """
+        dev = self.__devices.get(address)
+        return 0 if dev is None else dev.written - dev.read
+
+    def overruns(self, address):
+        """
+        Parameters:
+            address: The bluetooth address of the device
+        Returns:
+             The number of samples that were overwritten before they were read
+        """
+        self.__lock.acquire()
+        dev = self.__devices.get(address)
+        res = 0 if dev is None else dev.overruns
+        self.__lock.release()
+        return res
+
+    def read(self, address, max_n=None):
+        """
+        Reads the samples that arrived since the previous read, oldest first
+
+        Parameters:
+            address: The bluetooth address of the device
+            max_n: The maximum number of samples to read, None reads all unread samples
+        Returns:
+             A structured array with SAMPLE_DTYPE rows, use e.g. samples["quat"] for an N×4 block
+        """
+        self.__lock.acquire()
+        dev = self.__devices.get(address)
+        if dev is None:
+            self.__lock.release()
+            return np.zeros(0, dtype=SAMPLE_DTYPE)
+
+        missed = dev.written - dev.read - self.__capacity
+        if missed > 0:
+            dev.overruns += missed
+            dev.read += missed
+
+        count = dev.written - dev.read
+        if max_n is not None and max_n < count:
+            count = max_n
+        res = self.__copyRange(dev, dev.read, count)
+        dev.read += count
+        self.__lock.release()
+        return res
+
+    def latest(self, address, n):
+        """
+        Returns the newest samples without marking them as read, e.g. for a plot window
+
+        Parameters:
+            address: The bluetooth address of the device
+            n: The maximum number of samples to return
+        Returns:
+             A structured array with at most n SAMPLE_DTYPE rows, oldest first
+        """
+        self.__lock.acquire()
+        dev = self.__devices.get(address)
+        if dev is None:
+            self.__lock.release()
+            return np.zeros(0, dtype=SAMPLE_DTYPE)
+
+        count = min(n, dev.written, self.__capacity)
+        res = self.__copyRange(dev, dev.written - count, count)
+        self.__lock.release()
+        return res
+
+    def __copyRange(self, dev, first, count):
+        """
+        Copies count rows starting at the absolute sample number first, handles the wrap around
+        """
+        start = first % self.__capacity
+        end = start + count
+        if end <= self.__capacity:
+            return dev.rows[start:end].copy()
+        return np.concatenate((dev.rows[start:], dev.rows[:end - self.__capacity]))
@@ -30,7 +30,7 @@
 import movelladot_pc_sdk
 from collections import defaultdict
 from threading import Lock
-from queue import Queue
+from samplestore import SampleStore
 from pynput import keyboard
 from user_settings import *
 import time
@@ -45,7 +45,7 @@ def on_press(key):
 
 
 class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
-    def __init__(self, max_buffer_size=5):
+    def __init__(self, max_buffer_size=5, sample_capacity=4096):
         movelladot_pc_sdk.XsDotCallback.__init__(self)
 
         self.__manager = 0
@@ -66,7 +66,7 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         self.__maxNumberOfPacketsInBuffer = max_buffer_size
         self.__packetBuffer = defaultdict(list)
         self.__progress = dict()
-        self.realtime_queue = Queue()
+        self.sample_store = SampleStore(sample_capacity)
 
 
     def initialize(self):
@@ -275,6 +275,30 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         self.__lock.release()
         return res
 
+    def waitForSamples(self, bluetoothAddress, timeout=None):
+        """
+        Blocks until the sample store holds unread samples for a device, without polling
+
+        Parameters:
+            bluetoothAddress: The bluetooth address of the Movella DOT to wait for
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+            True if unread samples are available, False if the timeout expired
+        """
+        return self.sample_store.wait(bluetoothAddress, timeout)
+
+    def waitForAllSamples(self, timeout=None):
+        """
+        Blocks until the sample store holds unread samples for each of the connected Movella DOT devices
+
+        Parameters:
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+            True if unread samples are available for each device, False if the timeout expired
+        """
+        addresses = [dev.portInfo().bluetoothAddress() for dev in self.__connectedDots]
+        return self.sample_store.waitAll(addresses, timeout)
+
     def packetsReceived(self):
         """
         Returns:
@@ -361,30 +385,21 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         self.__errorReceived = True
 
     def onLiveDataAvailable(self, device, packet):
-        data = {}
-        data["timestamp"] = packet.sampleTimeFine()
-
-        # ORIENTACIÓN
-        q = packet.orientationQuaternion()  # todavía lo puedes dejar, aunque esté en 0
-        data["qw"] = q[0]
-        data["qx"] = q[1]
-        data["qy"] = q[2]
-        data["qz"] = q[3]
-
-        # ACELERACIÓN calibrada
-        a = packet.calibratedAcceleration()
-        data["ax"] = a[0]
-        data["ay"] = a[1]
-        data["az"] = a[2]
-
-        # GIROSCOPIO calibrado
-        g = packet.calibratedGyroscopeData()
-        data["gx"] = g[0]
-        data["gy"] = g[1]
-        data["gz"] = g[2]
-
-        self.realtime_queue.put(data)
-        
+        """
+        Called when new data has been received from a device
+        Writes timestamp, orientation, calibrated acceleration and calibrated gyroscope data
+        in place into the device's rows of the sample store
+
+        Parameters:
+            device: The device that initiated the callback.
+            packet: The data packet that has been received (and processed).
+        """
+        self.sample_store.append(device.portInfo().bluetoothAddress(),
+                                 packet.sampleTimeFine(),
+                                 packet.orientationQuaternion(),  # todavía lo puedes dejar, aunque esté en 0
+                                 packet.calibratedAcceleration(),
+                                 packet.calibratedGyroscopeData())
+
     def onProgressUpdated(self, device, current, total, identifier):
         """
         Called when a long-duration operation has made some progress or has completed.
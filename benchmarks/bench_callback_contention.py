@@ -0,0 +1,122 @@
+#  Contention benchmark for the SDK callback path of the XdpcHandler.
+#
+#  A producer thread plays the SDK callback for 5 sensors at 120 Hz each. A consumer thread
+#  keeps reading packets the way the scripts do (polling every device in a loop). The time
+#  spent inside the callback is recorded and reported as percentiles for:
+#
+#    lock: the previous implementation, the callback takes the handler lock and does the
+#          address lookups and the packet copy while holding it (a bounded deque + Lock)
+#    spsc: the current implementation, lookups and copy happen before a lock-free publish
+#          on a per-device SpscChannel
+#
+#  The SWIG calls are simulated with small pure Python workloads of a similar cost.
+#
+#  Usage: python benchmarks/bench_callback_contention.py [seconds]
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from packetbuffer import SpscChannel
+
+SENSORS = 5
+RATE_HZ = 120
+CAPACITY = 5
+ADDRESSES = [f"D4:22:CD:00:7C:{i:02X}" for i in range(SENSORS)]
+PAYLOAD = bytes(128)
+
+
+def bluetoothAddress(device):
+    # Stands in for device.portInfo().bluetoothAddress(): a call returning a new string
+    return "".join(ADDRESSES[device])
+
+
+def copyPacket(packet):
+    # Stands in for movelladot_pc_sdk.XsDataPacket(packet)
+    return bytearray(packet)
+
+
+class LockedBuffers:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # deque(maxlen) drops the oldest packet when full, like the ring buffer the handler used then
+        self.buffers = {address: deque(maxlen=CAPACITY) for address in ADDRESSES}
+
+    def onLiveDataAvailable(self, device, packet):
+        self.lock.acquire()
+        self.buffers[bluetoothAddress(device)].append(copyPacket(packet))
+        self.lock.release()
+
+    def getNextPacket(self, address):
+        self.lock.acquire()
+        buffer = self.buffers[address]
+        packet = buffer.popleft() if buffer else None
+        self.lock.release()
+        return packet
+
+
+class SpscBuffers:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {address: SpscChannel(CAPACITY) for address in ADDRESSES}
+
+    def onLiveDataAvailable(self, device, packet):
+        self.channels[bluetoothAddress(device)].push(copyPacket(packet))
+
+    def getNextPacket(self, address):
+        self.lock.acquire()
+        packet = self.channels[address].pop()
+        self.lock.release()
+        return packet
+
+
+def run(buffers, seconds):
+    running = True
+    latencies = []
+
+    def consumer():
+        while running:
+            for address in ADDRESSES:
+                buffers.getNextPacket(address)
+
+    reader = threading.Thread(target=consumer, daemon=True)
+    reader.start()
+
+    period = 1.0 / (RATE_HZ * SENSORS)
+    nextTime = time.perf_counter()
+    endTime = nextTime + seconds
+    device = 0
+    while nextTime < endTime:
+        nextTime += period
+        delay = nextTime - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        start = time.perf_counter_ns()
+        buffers.onLiveDataAvailable(device, PAYLOAD)
+        latencies.append(time.perf_counter_ns() - start)
+        device = (device + 1) % SENSORS
+
+    running = False
+    reader.join()
+    latencies.sort()
+    return latencies
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))] / 1000.0
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+
+    print(f"{SENSORS} sensors x {RATE_HZ} Hz, {seconds:.0f} s per run, callback duration in us")
+    print(f"{'variant':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>9}")
+    for name, buffers in (("lock", LockedBuffers()), ("spsc", SpscBuffers())):
+        lat = run(buffers, seconds)
+        print(f"{name:>8} {percentile(lat, 50):>8.1f} {percentile(lat, 90):>8.1f} {percentile(lat, 99):>8.1f} "
+              f"{percentile(lat, 99.9):>8.1f} {lat[-1] / 1000.0:>9.1f}")
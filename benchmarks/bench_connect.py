@@ -0,0 +1,68 @@
+#  Session bring-up benchmark of XdpcHandler.connectDots on the simulated SDK.
+#
+#  Connects 1, 5, 10 and 20 simulated sensors, whose openPort takes --delay seconds and fails with
+#  probability --failure-rate, once one after the other (workers=1, what connectDots used to do)
+#  and once with a pool of --workers parallel connections. Reports the wall time until all devices
+#  are connected, the time per sensor and the retries that were needed.
+#
+#  A real Bluetooth adapter sets up only a few connections at the same time (some stacks only one),
+#  so every run is repeated for each --slots limit of the simulated adapter, 1 and 3 by default.
+#  With a single slot the workers can not help: the bring-up time stays linear in the sensors.
+#
+#  Usage: python benchmarks/bench_connect.py [--sensors 1 5 10 20] [--delay 0.5] [--failure-rate 0.1] [--workers 8] [--slots 1 3]
+
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import movelladot_sim
+from connectscheduler import Backoff
+
+
+def run(sensors, workers, delay, failureRate, slots, seed):
+    movelladot_sim.configure(sensors=sensors, seed=seed, advertisement_delay_s=0.05, connect_delay_s=delay,
+                             connect_failure_rate=failureRate, connect_slots=slots)
+    movelladot_sim.install()
+    from xdpchandler import XdpcHandler
+
+    handler = XdpcHandler()
+    with redirect_stdout(io.StringIO()):
+        handler.initialize()
+        handler.manager().enableDeviceDetection()
+        time.sleep(0.1)
+        handler.manager().disableDeviceDetection()
+        start = time.perf_counter()
+        handler.connectDots(workers=workers, attempts=5, backoff=Backoff(base=delay / 2))
+        elapsed = time.perf_counter() - start
+    report = handler.connectReport()
+    connected = len(handler.connectedDots())
+    retries = sum(stats["retries"] for stats in report.values())
+    with redirect_stdout(io.StringIO()):
+        handler.cleanup()
+    return elapsed, connected, retries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="connectDots bring-up time on the simulated SDK")
+    parser.add_argument("--sensors", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--delay", type=float, default=0.5, help="mean openPort time in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--slots", type=int, nargs="+", default=[1, 3],
+                        help="parallel connections the simulated adapter serves, 0 for no limit")
+    options = parser.parse_args()
+
+    print(f"openPort {options.delay} s, failure rate {options.failure_rate}")
+    print(f"{'slots':>9} {'sensors':>7} {'workers':>7} {'connected':>9} {'retries':>7} {'total s':>8} {'s/sensor':>8}")
+    for slots in options.slots:
+        for sensors in options.sensors:
+            for workers in (1, options.workers):
+                elapsed, connected, retries = run(sensors, workers, options.delay, options.failure_rate, slots or None,
+                                                  seed=sensors)
+                print(f"{slots or 'unlimited':>9} {sensors:>7} {workers:>7} {connected:>9} {retries:>7} {elapsed:>8.2f} "
+                      f"{elapsed / sensors:>8.3f}")
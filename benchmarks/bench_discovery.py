@@ -0,0 +1,58 @@
+#  Discovery time benchmark of XdpcHandler.discoverDots on the simulated SDK.
+#
+#  The simulated sensors advertise for the first time after a random delay of up to --delay
+#  seconds and then every --repeat seconds. For 1, 5, 10 and 20 sensors, discovery waits for the
+#  expected set of addresses (all sensors) and, separately, for the first half of them. Reports
+#  the time until discoverDots returned, the advertisements received and the unique devices kept.
+#
+#  Usage: python benchmarks/bench_discovery.py [--sensors 1 5 10 20] [--delay 2.0] [--repeat 0.2]
+
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import movelladot_sim
+
+
+def run(sensors, delay, repeat, expectAll):
+    movelladot_sim.configure(sensors=sensors, seed=sensors, advertisement_delay_s=delay, advertisement_repeat_s=repeat)
+    movelladot_sim.install()
+    from xdpchandler import XdpcHandler
+
+    handler = XdpcHandler()
+    with redirect_stdout(io.StringIO()):
+        handler.initialize()
+    addresses = [f"D4:22:CD:00:{0x7C + i // 256:02X}:{i % 256:02X}" for i in range(sensors)]
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        if expectAll:
+            detected = handler.discoverDots(expected=addresses, timeout=20.0)
+        else:
+            detected = handler.discoverDots(expected=(), count=max(sensors // 2, 1), timeout=20.0)
+    elapsed = time.perf_counter() - start
+    received = sum(stats["count"] for stats in handler.advertisements().values())
+    rssi = [stats["rssi"] for stats in handler.advertisements().values()]
+    ranked = [handler.advertisements()[portInfo.bluetoothAddress()]["rssi"] for portInfo in detected] == sorted(rssi, reverse=True)
+    with redirect_stdout(io.StringIO()):
+        handler.cleanup()
+    return elapsed, received, len(detected), ranked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="discoverDots time on the simulated SDK")
+    parser.add_argument("--sensors", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--delay", type=float, default=2.0, help="maximum delay of the first advertisement")
+    parser.add_argument("--repeat", type=float, default=0.2, help="interval of the repeated advertisements")
+    options = parser.parse_args()
+
+    print(f"{'sensors':>7} {'wait for':>9} {'s':>6} {'advertisements':>14} {'devices':>7} {'by RSSI':>7}")
+    for sensors in options.sensors:
+        for expectAll in (True, False):
+            elapsed, received, devices, ranked = run(sensors, options.delay, options.repeat, expectAll)
+            target = "all" if expectAll else f"{max(sensors // 2, 1)}"
+            print(f"{sensors:>7} {target:>9} {elapsed:>6.2f} {received:>14} {devices:>7} {str(ranked):>7}")
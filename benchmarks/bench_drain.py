@@ -0,0 +1,88 @@
+#  Benchmark for draining the XdpcHandler packet buffers: one packet per call versus batch drain.
+#
+#  Mirrors the locking pattern of XdpcHandler.getNextPacket (one lock round trip per packet)
+#  and XdpcHandler.drainAll (one lock round trip per drain) on the same SpscChannel
+#  storage. The producer fills the buffers for 5 sensors at 120 Hz, the consumer drains them
+#  once per tick, for a 50 ms GUI tick and for a consumer that fell 1 s behind.
+#
+#  Usage: python benchmarks/bench_drain.py [repetitions]
+
+import os
+import sys
+import time
+from threading import Lock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from packetbuffer import SpscChannel
+
+SENSORS = 5
+RATE_HZ = 120
+TICKS_S = [0.05, 0.2, 1.0]
+
+
+class Buffers:
+    def __init__(self, addresses, capacity):
+        self.lock = Lock()
+        self.buffers = {address: SpscChannel(capacity) for address in addresses}
+
+    def fill(self, count):
+        for buffer in self.buffers.values():
+            for i in range(count):
+                buffer.push(i)
+
+    def getNextPacket(self, address):
+        self.lock.acquire()
+        packet = self.buffers[address].pop()
+        self.lock.release()
+        return packet
+
+    def packetAvailable(self, address):
+        self.lock.acquire()
+        res = len(self.buffers[address]) > 0
+        self.lock.release()
+        return res
+
+    def drainAll(self):
+        self.lock.acquire()
+        packets = {address: buffer.popMany() for address, buffer in self.buffers.items()}
+        self.lock.release()
+        return packets
+
+
+def drain_single(buffers, addresses):
+    count = 0
+    for address in addresses:
+        while buffers.packetAvailable(address):
+            buffers.getNextPacket(address)
+            count += 1
+    return count
+
+
+def drain_batch(buffers, addresses):
+    return sum(len(packets) for packets in buffers.drainAll().values())
+
+
+def run(drain, tick, repetitions):
+    addresses = [f"D4:22:CD:00:7C:{i:02X}" for i in range(SENSORS)]
+    perTick = int(RATE_HZ * tick)
+    buffers = Buffers(addresses, perTick)
+    elapsed = 0.0
+    for _ in range(repetitions):
+        buffers.fill(perTick)
+        start = time.perf_counter()
+        drained = drain(buffers, addresses)
+        elapsed += time.perf_counter() - start
+        assert drained == perTick * SENSORS
+    return elapsed / repetitions, perTick * SENSORS
+
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print(f"{SENSORS} sensors x {RATE_HZ} Hz")
+    print(f"{'tick [s]':>9} {'packets':>8} {'single us':>10} {'batch us':>9} {'speedup':>8}")
+    for tick in TICKS_S:
+        single, packets = run(drain_single, tick, repetitions)
+        batch, _ = run(drain_batch, tick, repetitions)
+        print(f"{tick:>9.2f} {packets:>8} {single * 1e6:>10.1f} {batch * 1e6:>9.1f} {single / batch:>7.1f}x")
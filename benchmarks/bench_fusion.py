@@ -0,0 +1,55 @@
+#  Benchmark for FusionEngine: host side orientation filters for many sensors at 120 Hz.
+#
+#  Runs every filter on synthetic gyroscope/accelerometer (and magnetometer) data for all
+#  sensors in lockstep, one update() per sample instant as in a live loop. Reports the
+#  per-update latency percentiles and the fraction of one core needed to keep up in real time.
+#
+#  Usage: python benchmarks/bench_fusion.py [sensors] [seconds]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fusion import FusionEngine
+
+RATE_HZ = 120
+CASES = [
+    ("madgwick", False, {}),
+    ("madgwick", True, {}),
+    ("mahony", False, {"kp": 1.0, "ki": 0.01}),
+    ("mahony", True, {"kp": 1.0, "ki": 0.01}),
+    ("ekf", False, {}),
+]
+
+
+def run(sensors, seconds, filterName, useMag, gains):
+    steps = int(seconds * RATE_HZ)
+    rng = np.random.default_rng(0)
+    gyro = rng.normal(0.0, 30.0, (steps, sensors, 3))
+    acc = rng.normal(0.0, 0.2, (steps, sensors, 3)) + [0.0, 0.0, 9.81]
+    mag = rng.normal(0.0, 0.01, (steps, sensors, 3)) + [0.4, 0.0, -0.9] if useMag else None
+
+    engine = FusionEngine(sensors, RATE_HZ, filterName, **gains)
+    latencies = np.empty(steps)
+    for t in range(steps):
+        start = time.perf_counter()
+        engine.update(gyro[t], acc[t], None if mag is None else mag[t])
+        latencies[t] = time.perf_counter() - start
+    return latencies
+
+
+if __name__ == "__main__":
+    sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+
+    print(f"{sensors} sensors x {RATE_HZ} Hz, {seconds:.0f} s of data, one update per sample instant")
+    print(f"{'filter':>10} {'mag':>4} {'p50 us':>8} {'p99 us':>8} {'max us':>8} {'updates/s':>10} {'core %':>7}")
+    for filterName, useMag, gains in CASES:
+        latencies = run(sensors, seconds, filterName, useMag, gains)
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+        print(f"{filterName:>10} {'yes' if useMag else 'no':>4} {p50:>8.1f} {p99:>8.1f} {latencies.max() * 1e6:>8.1f} "
+              f"{1.0 / latencies.mean():>10.0f} {100.0 * latencies.sum() / seconds:>7.2f}")
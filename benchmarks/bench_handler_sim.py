@@ -0,0 +1,75 @@
+#  End-to-end throughput benchmark of the XdpcHandler on the simulated SDK.
+#
+#  Connects the simulated sensors, streams for a while and drains the packets the way a
+#  control loop would (wait for all devices, then drainAll). Reports the delivered packet
+#  rate, dropped packets, the CPU time used by the process, the SDK call profile and the
+#  callback to dequeue latency and the sample loss detected from sampleTimeFine.
+#
+#  Usage: python benchmarks/bench_handler_sim.py [--sensors 1 5 10 20] [--rate 120] [--seconds 5]
+
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import movelladot_sim
+
+
+def run(sensors, rate, seconds, lossRate=0.0):
+    movelladot_sim.configure(sensors=sensors, output_rate=rate, seed=sensors, advertisement_delay_s=0.05,
+                             connect_delay_s=0.0, loss_rate=lossRate)
+    movelladot_sim.install()
+    from xdpchandler import XdpcHandler
+    import movelladot_pc_sdk
+
+    handler = XdpcHandler(max_buffer_size=rate)
+    with redirect_stdout(io.StringIO()):
+        handler.initialize()
+        handler.manager().enableDeviceDetection()
+        time.sleep(0.1)
+        handler.manager().disableDeviceDetection()
+        handler.connectDots()
+    for device in handler.connectedDots():
+        device.startMeasurement(movelladot_pc_sdk.XsPayloadMode_CustomMode5)
+
+    handler.enableSwigProfiling()
+    # Discard what arrived while the measurements were started
+    handler.drainAll()
+    handler.enableLatencyStats()
+    received = 0
+    cpuStart = time.process_time()
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        if handler.waitForPackets(timeout=0.1):
+            received += sum(len(packets) for packets in handler.drainAll().values())
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpuStart
+
+    dropped = sum(handler.droppedPackets(address) for address in handler.connectedAddresses())
+    profile = handler.swigProfile().get("XsDataPacket", {})
+    latency = [stats["latency_ms"] for stats in handler.latencyStats().values()]
+    p50 = max(stats["p50"] for stats in latency)
+    p99 = max(stats["p99"] for stats in latency)
+    lossPct = max(stats["loss_pct"] for stats in handler.sequenceStats().values())
+    with redirect_stdout(io.StringIO()):
+        handler.cleanup()
+    return received / elapsed, dropped, 100.0 * cpu / elapsed, profile.get("ms_per_s", 0.0), p50, p99, lossPct
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sensors", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--rate", type=int, default=120)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--loss-rate", type=float, default=0.0, help="simulated BLE packet loss")
+    options = parser.parse_args()
+
+    print(f"{'sensors':>8} {'expected/s':>11} {'received/s':>11} {'dropped':>8} {'cpu %':>6} {'copy ms/s':>10} {'p50 ms':>7} {'p99 ms':>7} {'loss %':>7}")
+    for sensors in options.sensors:
+        rate, dropped, cpu, copyMs, p50, p99, lossPct = run(sensors, options.rate, options.seconds, options.loss_rate)
+        print(f"{sensors:>8} {sensors * options.rate:>11} {rate:>11.1f} {dropped:>8} {cpu:>6.1f} {copyMs:>10.2f} "
+              f"{p50:>7.2f} {p99:>7.2f} {lossPct:>7.2f}")
@@ -0,0 +1,119 @@
+#  Benchmark for the logfile loader on a generated capture.
+#
+#  Writes a logfile_*.csv style capture (metadata line, header, samples at 60 Hz) of the given
+#  number of rows and reads it with logfile.load, logfile.iterChunks, np.loadtxt and, when it is
+#  installed, pandas.read_csv (skipping the metadata line, which it can not parse). The same is done
+#  for a copy with one malformed line per 1M rows, comparing logfile.load with the line by line parse
+#  of every chunk with a malformed line it used to fall back to. Then builds the sparse time index and
+#  reads one minute from the middle of the capture with logfile.loadRange.
+#
+#  Usage: python benchmarks/bench_logfile.py [rows] [path]
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import logfile
+import timeindex
+
+METADATA = ("DeviceTag: Brazo,FirmwareVersion: 3.0.0,AppVersion: 2023.6.0,SyncStatus: Unknown (Synced/Un-synced),"
+            "OutputRate: 60,FilterProfile: Unknown,Measurement Mode: Sensor fusion Mode - Extended (Euler),"
+            "StartTime: 2026-01-16 09:06:20.454,© Movella Technologies B.V. 2005-2026")
+HEADER = "SampleTimeFine,Quat_W,Quat_X,Quat_Y,Quat_Z,FreeAcc_X,FreeAcc_Y,FreeAcc_Z,Status"
+
+
+def generate(path, rows, chunk=1000000):
+    rng = np.random.default_rng(0)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(METADATA + "\n" + HEADER + "\n")
+        for first in range(0, rows, chunk):
+            n = min(chunk, rows - first)
+            timeFine = (7736793 + np.round((first + np.arange(n)) * 1e6 / 60)).astype(np.int64) % (1 << 32)
+            values = np.round(rng.normal(0.0, 0.5, (n, 7)), 4)
+            # Formatting the columns separately is much faster than np.savetxt
+            columns = [timeFine.astype(str)] + [np.char.mod("%.4f", values[:, i]) for i in range(7)] + [np.full(n, "0")]
+            lines = columns[0]
+            for column in columns[1:]:
+                lines = np.char.add(np.char.add(lines, ","), column)
+            file.write("\n".join(lines.tolist()) + "\n")
+
+
+def damage(path, damagedPath, every=1000000):
+    """
+    Copies the capture, replacing every Nth sample line by a malformed one
+    """
+    with open(path, "rb") as source, open(damagedPath, "wb") as target:
+        for i, line in enumerate(source):
+            target.write(b"12345,0.1,garbage\n" if i > 2 and i % every == every // 2 else line)
+
+
+def timed(function):
+    start = time.perf_counter()
+    res = function()
+    return time.perf_counter() - start, res
+
+
+if __name__ == "__main__":
+    rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10000000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), f"logfile_bench_{rows}.csv")
+
+    if not os.path.exists(path):
+        print(f"Generating {rows} rows in {path}...")
+        generate(path, rows)
+    size = os.path.getsize(path) / 1e6
+    print(f"{path}: {size:.0f} MB")
+
+    def chunked():
+        return sum(len(chunk) for chunk in logfile.iterChunks(path))
+
+    results = [
+        ("logfile.load", lambda: len(logfile.load(path)[1])),
+        ("logfile.iterChunks", chunked),
+        ("np.loadtxt", lambda: len(np.loadtxt(path, delimiter=",", skiprows=2))),
+    ]
+    try:
+        import pandas as pd
+        results.append(("pandas.read_csv", lambda: len(pd.read_csv(path, skiprows=1))))
+    except ImportError:
+        print("pandas is not installed, skipping pandas.read_csv")
+
+    damagedPath = path[:-len(".csv")] + "_damaged.csv"
+    if not os.path.exists(damagedPath):
+        damage(path, damagedPath)
+
+    def lineByLine():
+        # What _parse did before: the whole chunk in Python as soon as one line is malformed
+        limit = logfile.SLOW_PATH_BYTES
+        logfile.SLOW_PATH_BYTES = float("inf")
+        try:
+            return len(logfile.load(damagedPath)[1])
+        finally:
+            logfile.SLOW_PATH_BYTES = limit
+
+    # pandas.read_csv is left out: on_bad_lines="skip" keeps a line with too few fields (filled with NaN)
+    results += [
+        ("damaged logfile.load", lambda: len(logfile.load(damagedPath)[1])),
+        ("damaged line by line", lineByLine),
+    ]
+
+    print(f"{'reader':>22} {'rows':>10} {'seconds':>8} {'MB/s':>7} {'Mrows/s':>8}")
+    for name, function in results:
+        seconds, count = timed(function)
+        print(f"{name:>22} {count:>10} {seconds:>8.2f} {size / seconds:>7.1f} {count / seconds / 1e6:>8.2f}")
+
+    sidecar = timeindex.sidecarPath(path)
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+    middle = rows / 60 / 2
+    buildSeconds, index = timed(lambda: logfile.openIndex(path))
+    openSeconds, index = timed(lambda: logfile.openIndex(path))
+    rangeSeconds, (_, samples) = timed(lambda: logfile.loadRange(path, middle, middle + 60.0, index))
+    print(f"{'operation':>28} {'ms':>10}")
+    print(f"{'build index':>28} {buildSeconds * 1e3:>10.1f}  ({len(index)} anchors)")
+    print(f"{'open index (sidecar)':>28} {openSeconds * 1e3:>10.1f}")
+    print(f"{'loadRange 60 s':>28} {rangeSeconds * 1e3:>10.1f}  ({len(samples)} rows)")
@@ -0,0 +1,62 @@
+#  Micro-benchmark for the per-device packet channel of the XdpcHandler.
+#
+#  Compares the list based FIFO the handler started with (append + pop(0)), a bounded
+#  collections.deque and the SpscChannel the handler uses, in steady state: the buffer is
+#  kept at its capacity and every iteration enqueues one packet and dequeues one packet.
+#  The default max_buffer_size of the handler is 5.
+#
+#  Usage: python benchmarks/bench_packetbuffer.py [iterations]
+
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from packetbuffer import SpscChannel
+
+CAPACITIES = [5, 16, 256, 4096, 65536]
+
+
+def bench_list(capacity, iterations):
+    buffer = [object() for _ in range(capacity)]
+    item = object()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        buffer.append(item)
+        buffer.pop(0)
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_deque(capacity, iterations):
+    buffer = deque((object() for _ in range(capacity)), maxlen=capacity)
+    item = object()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        buffer.popleft()
+        buffer.append(item)
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_channel(capacity, iterations):
+    channel = SpscChannel(capacity)
+    for _ in range(capacity):
+        channel.push(object())
+    item = object()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        channel.pop()
+        channel.push(item)
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    print(f"{'capacity':>10} {'list ns/op':>12} {'deque ns/op':>12} {'channel ns/op':>14}")
+    for capacity in CAPACITIES:
+        listTime = bench_list(capacity, iterations)
+        dequeTime = bench_deque(capacity, iterations)
+        channelTime = bench_channel(capacity, iterations)
+        print(f"{capacity:>10} {listTime * 1e9:>12.1f} {dequeTime * 1e9:>12.1f} {channelTime * 1e9:>14.1f}")
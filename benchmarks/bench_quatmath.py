@@ -0,0 +1,86 @@
+#  Benchmark for quatmath: batched NumPy conversions versus the per-sample helpers they replace.
+#
+#  The scalar functions below are the quaternion_to_euler and quat_to_matrix helpers that were
+#  duplicated in the plot scripts, called once per quaternion. The batched versions convert the
+#  whole N×4 block in one call.
+#
+#  Usage: python benchmarks/bench_quatmath.py [count]
+
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import quatmath
+
+
+def quaternion_to_euler(qw, qx, qy, qz):
+    sinr_cosp = 2 * (qw * qx + qy * qz)
+    cosr_cosp = 1 - 2 * (qx*qx + qy*qy)
+    roll = math.atan2(sinr_cosp, cosr_cosp)
+
+    sinp = 2 * (qw*qy - qz*qx)
+    if abs(sinp) >= 1:
+        pitch = math.copysign(math.pi/2, sinp)
+    else:
+        pitch = math.asin(sinp)
+
+    siny_cosp = 2 * (qw*qz + qx*qy)
+    cosy_cosp = 1 - 2 * (qy*qy + qz*qz)
+    yaw = math.atan2(siny_cosp, cosy_cosp)
+
+    return math.degrees(yaw), math.degrees(pitch), math.degrees(roll)
+
+
+def quat_to_matrix(q):
+    w, x, y, z = q
+    return np.array([
+        [1 - 2*(y*y + z*z), 2*(x*y - z*w),     2*(x*z + y*w)],
+        [2*(x*y + z*w),     1 - 2*(x*x + z*z), 2*(y*z - x*w)],
+        [2*(x*z - y*w),     2*(y*z + x*w),     1 - 2*(x*x + y*y)]
+    ])
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    res = function(*args)
+    return time.perf_counter() - start, res
+
+
+def scalar_euler(quats):
+    return [quaternion_to_euler(qw, qx, qy, qz) for qw, qx, qy, qz in quats.tolist()]
+
+
+def scalar_matrix(quats):
+    return [quat_to_matrix(q) for q in quats]
+
+
+if __name__ == "__main__":
+    count = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000
+    quats = quatmath.normalize(np.random.default_rng(0).normal(size=(count, 4)))
+    other = quatmath.normalize(np.random.default_rng(1).normal(size=(count, 4)))
+
+    print(f"{count} quaternions")
+    print(f"{'operation':>18} {'per-call s':>11} {'batched s':>10} {'Mquat/s':>8} {'speedup':>8}")
+    cases = [
+        ("euler", scalar_euler, quatmath.toEuler, (quats,)),
+        ("matrix", scalar_matrix, quatmath.toMatrix, (quats,)),
+        ("multiply", None, quatmath.multiply, (quats, other)),
+        ("relativeRotation", None, quatmath.relativeRotation, (quats, other)),
+        ("normalize", None, quatmath.normalize, (quats,)),
+        ("slerp", None, quatmath.slerp, (quats, other, np.full(count, 0.5))),
+    ]
+    for name, scalar, batched, args in cases:
+        batchedTime, res = timed(batched, *args)
+        if scalar is None:
+            print(f"{name:>18} {'-':>11} {batchedTime:>10.3f} {count / batchedTime / 1e6:>8.1f} {'-':>8}")
+            continue
+        scalarTime, reference = timed(scalar, *args)
+        if name == "euler":
+            assert np.allclose(np.asarray(reference)[:, ::-1], res)
+        print(f"{name:>18} {scalarTime:>11.3f} {batchedTime:>10.3f} {count / batchedTime / 1e6:>8.1f} "
+              f"{scalarTime / batchedTime:>7.0f}x")
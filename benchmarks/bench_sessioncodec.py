@@ -0,0 +1,88 @@
+#  Benchmark for the compressed session codec.
+#
+#  Encodes blocks of one device with smooth synthetic motion (orientation from a random walk of the
+#  Euler angles, gravity plus sensor noise on the accelerometer) with raw records and the codec
+#  variants, and reports bytes per sample, encode and decode throughput in MB/s of raw records and
+#  the largest round-trip error per field next to the guaranteed tolerance.
+#
+#  Usage: python benchmarks/bench_sessioncodec.py [samples] [blockRecords]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import quatmath
+import sessioncodec
+import sessionfile
+
+RATE = 60
+
+
+def generate(samples):
+    rng = np.random.default_rng(0)
+    records = np.zeros(samples, dtype=sessionfile.RECORD_DTYPE)
+    records["flags"] = sessionfile.HAS_QUAT | sessionfile.HAS_ACC | sessionfile.HAS_GYRO | sessionfile.HAS_FREE_ACC
+    records["sampleTimeFine"] = (7736793 + np.round(np.arange(samples) * 1e6 / RATE)).astype(np.int64) % (1 << 32)
+    records["hostTime"] = 1.77e9 + np.arange(samples) / RATE + rng.gamma(2.0, 0.004, samples)
+
+    # Roll, pitch and yaw follow a slow random walk, as for a moving arm
+    rates = np.cumsum(rng.normal(0.0, 2.0, (samples, 3)), axis=0)
+    rates -= np.linspace(0.0, 1.0, samples)[:, np.newaxis] * rates[-1]
+    half = np.radians(np.cumsum(rates, axis=0) / RATE) / 2
+    cr, cp, cy = np.cos(half).T
+    sr, sp, sy = np.sin(half).T
+    quat = np.stack((cr * cp * cy + sr * sp * sy, sr * cp * cy - cr * sp * sy,
+                     cr * sp * cy + sr * cp * sy, cr * cp * sy - sr * sp * cy), axis=-1)
+    # The Euler rates approximate the angular velocity well enough for a compression benchmark
+    gyro = rates
+
+    gravity = quatmath.rotate(quatmath.conjugate(quat), np.array([0.0, 0.0, 9.81]))
+    records["quat"] = quat
+    records["gyro"] = gyro + rng.normal(0.0, 0.1, (samples, 3))
+    records["freeAcc"] = rng.normal(0.0, 0.05, (samples, 3))
+    records["acc"] = gravity + records["freeAcc"] + rng.normal(0.0, 0.02, (samples, 3))
+    records["mag"] = np.nan
+    return records
+
+
+def timed(function):
+    start = time.perf_counter()
+    res = function()
+    return time.perf_counter() - start, res
+
+
+if __name__ == "__main__":
+    samples = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000
+    blockRecords = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    records = generate(samples)
+    blocks = [records[first:first + blockRecords] for first in range(0, samples, blockRecords)]
+    rawMB = records.nbytes / 1e6
+    print(f"{samples} samples at {RATE} Hz in blocks of {blockRecords}, {rawMB:.0f} MB raw")
+
+    variants = [
+        ("zlib", sessioncodec.Codec("zlib")),
+        ("lzma", sessioncodec.Codec("lzma")),
+        ("zlib lossless", sessioncodec.Codec("zlib", quantize=False)),
+        ("zlib level 1", sessioncodec.Codec("zlib", level=1)),
+    ]
+    print(f"{'codec':>14} {'B/sample':>9} {'ratio':>6} {'enc MB/s':>9} {'dec MB/s':>9}  max error / tolerance")
+    print(f"{'raw':>14} {records.itemsize:>9.1f} {1.0:>6.1f} {'-':>9} {'-':>9}")
+    for name, codec in variants:
+        encodeSeconds, payloads = timed(lambda: [codec.encode(block) for block in blocks])
+        decodeSeconds, decoded = timed(lambda: [codec.decode(payload, len(block), sessionfile.RECORD_DTYPE)
+                                                for payload, block in zip(payloads, blocks)])
+        decoded = np.concatenate(decoded)
+        size = sum(len(payload) for payload in payloads)
+
+        assert np.array_equal(decoded["sampleTimeFine"], records["sampleTimeFine"])
+        tolerance = codec.tolerance()
+        errors = []
+        for field in ("hostTime", "quat", "acc", "gyro", "freeAcc"):
+            error = float(np.nanmax(np.abs(decoded[field].astype(np.float64) - records[field].astype(np.float64))))
+            errors.append(f"{field} {error:.2g}/{tolerance[field]:.2g}")
+        print(f"{name:>14} {size / samples:>9.1f} {records.nbytes / size:>6.1f} {rawMB / encodeSeconds:>9.0f} "
+              f"{rawMB / decodeSeconds:>9.0f}  {', '.join(errors)}")
@@ -0,0 +1,78 @@
+#  Benchmark for random access to a recorded session.
+#
+#  Writes a session of 5 devices at 60 Hz with the given number of records (default 20M, 1.6 GB),
+#  then compares opening it with SessionReader and seeking and reading a one minute window of one
+#  device against loading the whole session with sessionfile.load.
+#
+#  Usage: python benchmarks/bench_sessionreader.py [records] [path]
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import sessionfile
+
+DEVICES = ["D4:22:CD:00:7C:6B", "D4:22:CD:00:7C:8A", "D4:22:CD:00:7C:96", "D4:22:CD:00:7C:A4", "D4:22:CD:00:7C:B0"]
+RATE = 60
+START = 1.77e9
+
+
+def generate(path, records, chunk=1000000):
+    rng = np.random.default_rng(0)
+    writer = sessionfile.SessionWriter(path, DEVICES, outputRate=RATE, blockRecords=4096)
+    for first in range(0, records, chunk):
+        n = min(chunk, records - first)
+        index = first + np.arange(n)
+        block = np.zeros(n, dtype=sessionfile.RECORD_DTYPE)
+        block["device"] = index % len(DEVICES)
+        sample = index // len(DEVICES)
+        block["flags"] = sessionfile.HAS_QUAT | sessionfile.HAS_ACC | sessionfile.HAS_GYRO
+        block["sampleTimeFine"] = (7736793 + np.round(sample * 1e6 / RATE)).astype(np.int64) % (1 << 32)
+        block["hostTime"] = START + sample / RATE + rng.uniform(0.005, 0.02, n)
+        block["quat"] = rng.normal(0.0, 0.5, (n, 4))
+        block["acc"] = rng.normal(0.0, 1.0, (n, 3))
+        block["gyro"] = rng.normal(0.0, 10.0, (n, 3))
+        writer.addRecords(block)
+    return writer.close()
+
+
+def timed(function):
+    start = time.perf_counter()
+    res = function()
+    return time.perf_counter() - start, res
+
+
+if __name__ == "__main__":
+    records = int(float(sys.argv[1])) if len(sys.argv) > 1 else 20000000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), f"session_bench_{records}.session")
+
+    if not os.path.exists(path):
+        print(f"Generating {records} records in {path}...")
+        seconds, stats = timed(lambda: generate(path, records))
+        print(f"Written in {seconds:.2f} s, {stats['bytes'] / 1e6 / seconds:.0f} MB/s")
+    size = os.path.getsize(path) / 1e6
+    duration = records / len(DEVICES) / RATE
+    print(f"{path}: {size:.0f} MB, {duration / 3600:.2f} h")
+
+    address = DEVICES[-1]
+    rng = np.random.default_rng(1)
+    seekTimes = START + rng.uniform(0.0, duration, 1000)
+
+    openSeconds, reader = timed(lambda: sessionfile.SessionReader(path))
+    firstSeek, _ = timed(lambda: reader.seek(address, seekTimes[0]))
+    seekSeconds, _ = timed(lambda: [reader.seek(address, t) for t in seekTimes])
+    windowSeconds, window = timed(lambda: reader.window(address, START + duration / 2, START + duration / 2 + 60.0))
+    print(f"{'operation':>28} {'ms':>10}")
+    print(f"{'SessionReader()':>28} {openSeconds * 1e3:>10.3f}")
+    print(f"{'first seek (builds index)':>28} {firstSeek * 1e3:>10.3f}")
+    print(f"{'seek, mean of 1000':>28} {seekSeconds:>10.3f}")
+    print(f"{'60 s window':>28} {windowSeconds * 1e3:>10.3f}  ({len(window)} records)")
+    reader.close()
+
+    loadSeconds, (_, allRecords) = timed(lambda: sessionfile.load(path))
+    print(f"{'sessionfile.load (all)':>28} {loadSeconds * 1e3:>10.1f}  ({len(allRecords)} records)")
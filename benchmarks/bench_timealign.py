@@ -0,0 +1,70 @@
+#  Benchmark for StreamAligner: resampling unsynchronized sensors onto a common clock.
+#
+#  Every sensor samples at 120 Hz with its own random phase and clock offset, the aligner
+#  receives one block per tick (as from XdpcHandler.drainAll) and resamples all sensors at
+#  120 Hz with SLERP. Reports the processing time per tick and the fraction of one core needed
+#  to keep up in real time.
+#
+#  Usage: python benchmarks/bench_timealign.py [seconds]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from quatmath import normalize
+from timealign import StreamAligner
+
+RATE_HZ = 120
+SENSOR_COUNTS = [1, 5, 10, 20]
+TICKS_S = [0.05, 0.5]
+
+
+def generate(sensors, seconds, rng):
+    n = int(seconds * RATE_HZ)
+    streams = []
+    for _ in range(sensors):
+        phase = rng.uniform(0.0, 1.0 / RATE_HZ)
+        receiveTimes = phase + np.arange(n) / RATE_HZ + np.abs(rng.normal(0.0, 0.004, n))
+        timeFine = (rng.integers(0, 1 << 32) + np.round((phase + np.arange(n) / RATE_HZ) * 1e6)).astype(np.int64) % (1 << 32)
+        quat = normalize(np.cumsum(rng.normal(0.0, 0.01, (n, 4)), axis=0) + [1.0, 0.0, 0.0, 0.0])
+        acc = rng.normal(0.0, 1.0, (n, 3))
+        gyro = rng.normal(0.0, 10.0, (n, 3))
+        streams.append((timeFine, quat, acc, gyro, receiveTimes))
+    return streams
+
+
+def run(sensors, tick, seconds):
+    streams = generate(sensors, seconds, np.random.default_rng(sensors))
+    addresses = [f"D4:22:CD:00:7C:{i:02X}" for i in range(sensors)]
+    aligner = StreamAligner(addresses, RATE_HZ)
+    perTick = int(tick * RATE_HZ)
+    ticks = len(streams[0][0]) // perTick
+    outputs = 0
+    elapsed = 0.0
+    worst = 0.0
+    for k in range(ticks):
+        block = slice(k * perTick, (k + 1) * perTick)
+        start = time.perf_counter()
+        for address, (timeFine, quat, acc, gyro, receiveTimes) in zip(addresses, streams):
+            aligner.add(address, timeFine[block], quat[block], acc[block], gyro[block], receiveTimes[block])
+        times, _ = aligner.resample()
+        spent = time.perf_counter() - start
+        elapsed += spent
+        worst = max(worst, spent)
+        outputs += len(times)
+    return elapsed / ticks, worst, outputs, elapsed / (ticks * tick)
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 30.0
+
+    print(f"{RATE_HZ} Hz, {seconds:.0f} s of data")
+    print(f"{'sensors':>8} {'tick [s]':>9} {'mean us':>9} {'worst us':>9} {'instants':>9} {'core %':>7}")
+    for sensors in SENSOR_COUNTS:
+        for tick in TICKS_S:
+            mean, worst, outputs, load = run(sensors, tick, seconds)
+            print(f"{sensors:>8} {tick:>9.2f} {mean * 1e6:>9.1f} {worst * 1e6:>9.1f} {outputs:>9} {100 * load:>7.2f}")
@@ -0,0 +1,201 @@
+#  Parallel Bluetooth connection establishment for the XdpcHandler.
+#
+#  Opening a port blocks for the whole BLE connection setup, and connectDots used to open the
+#  detected devices one after the other with a single immediate retry, so the bring-up time grew
+#  with every sensor. The ConnectionScheduler opens the ports from a bounded pool of worker
+#  threads, retries a failed device after an exponentially growing, jittered delay (the other
+#  workers keep connecting meanwhile) and records per device how long it took and how many
+#  attempts were needed.
+#
+
+import queue
+import random
+import threading
+import time
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter: the delay before retry n is about base * 2^(n - 1), at most maximum
+    """
+    def __init__(self, base=0.5, maximum=8.0, jitter=0.5, rng=None):
+        """
+        Parameters:
+            base: The delay before the first retry in seconds
+            maximum: The upper limit of the delay in seconds
+            jitter: The fraction of the delay that is randomized, so devices that failed together do not retry together
+            rng: The random.Random to draw the jitter from, None for a new one
+        """
+        self.base = base
+        self.maximum = maximum
+        self.jitter = jitter
+        self.__rng = rng or random.Random()
+
+    def delay(self, retry):
+        """
+        Parameters:
+            retry: The number of the retry, starting at 1
+        Returns:
+             The time to wait before it in seconds
+        """
+        delay = min(self.base * 2 ** (retry - 1), self.maximum)
+        return delay * (1.0 - self.jitter * self.__rng.random())
+
+
+class ConnectResult:
+    """
+    The outcome of connecting one device
+    """
+    __slots__ = ("portInfo", "address", "device", "attempts", "seconds", "opening", "waited", "error")
+
+    def __init__(self, portInfo, address):
+        self.portInfo = portInfo
+        self.address = address
+        # The XsDotDevice, None if the connection failed
+        self.device = None
+        self.attempts = 0
+        # Time from the start of the scheduler until the device was connected or given up, the part
+        # of it spent in openPort and the part spent in backoff delays
+        self.seconds = 0.0
+        self.opening = 0.0
+        self.waited = 0.0
+        self.error = None
+
+    def connected(self):
+        return self.device is not None
+
+    def asDict(self):
+        return {"connected": self.connected(), "attempts": self.attempts, "retries": max(self.attempts - 1, 0),
+                "seconds": self.seconds, "open_s": self.opening, "backoff_s": self.waited, "error": self.error}
+
+
+class ConnectionScheduler:
+    """
+    Opens the ports of detected Bluetooth devices in parallel
+    """
+    def __init__(self, manager, workers=4, attempts=3, backoff=None, log=print):
+        """
+        Parameters:
+            manager: The XsDotConnectionManager
+            workers: The maximum number of ports opened at the same time, 1 connects one after the other
+            attempts: The number of times a device is tried before giving up
+            backoff: The Backoff between the attempts of a device, None for Backoff()
+            log: Called with the progress messages, None to stay silent
+        """
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        self.__manager = manager
+        self.__workers = workers
+        self.__attempts = max(attempts, 1)
+        self.__backoff = backoff or Backoff()
+        self.__log = log
+        self.__logLock = threading.Lock()
+
+    def connect(self, portInfos):
+        """
+        Parameters:
+            portInfos: The XsPortInfos of the Bluetooth devices to connect
+        Returns:
+             A list with the ConnectResult of each port, in the order of portInfos
+        """
+        self.__start = time.perf_counter()
+        results = [ConnectResult(portInfo, portInfo.bluetoothAddress()) for portInfo in portInfos]
+        # (earliest start time, sequence, result): a failed device is put back with its retry time,
+        # so the workers connect other devices instead of sleeping through its backoff
+        self.__pending = queue.PriorityQueue()
+        for i, result in enumerate(results):
+            self.__pending.put((self.__start, i, result))
+        self.__sequence = len(results)
+        self.__remaining = len(results)
+        self.__lock = threading.Lock()
+
+        threads = [threading.Thread(target=self.__work, name=f"connect {i}", daemon=True)
+                   for i in range(min(self.__workers, len(results)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def __work(self):
+        while True:
+            with self.__lock:
+                if self.__remaining == 0:
+                    return
+            try:
+                notBefore, _, result = self.__pending.get(timeout=0.05)
+            except queue.Empty:
+                # The other devices are being connected, one of them may still be put back
+                continue
+            delay = notBefore - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            done = True
+            try:
+                try:
+                    opened = self.__open(result)
+                except Exception as error:
+                    # openPort and device can throw through SWIG, the device must still be counted or
+                    # the other workers wait for it forever
+                    result.device = None
+                    result.error = f"{type(error).__name__}: {error}"
+                    opened = False
+                if not opened and result.attempts < self.__attempts:
+                    wait = self.__backoff.delay(result.attempts)
+                    result.waited += wait
+                    self.__message(f"Connection to Device {result.address} failed, retrying in {wait:.2f} s...")
+                    with self.__lock:
+                        self.__sequence += 1
+                        self.__pending.put((time.perf_counter() + wait, self.__sequence, result))
+                    done = False
+                    continue
+
+                result.seconds = time.perf_counter() - self.__start
+                if not result.connected():
+                    self.__message(f"Could not open DOT {result.address}. Reason: {result.error}")
+            finally:
+                if done:
+                    with self.__lock:
+                        self.__remaining -= 1
+
+    def __message(self, message):
+        # One message at a time, print from several threads can interleave the lines
+        if self.__log is not None:
+            with self.__logLock:
+                self.__log(message)
+
+    def __open(self, result):
+        """
+        Makes one connection attempt, returns True if the device is connected
+        """
+        result.attempts += 1
+        if result.attempts == 1:
+            self.__message(f"Opening DOT with address: @ {result.address}")
+        start = time.perf_counter()
+        opened = self.__manager.openPort(result.portInfo)
+        result.opening += time.perf_counter() - start
+        if not opened:
+            result.error = self.__manager.lastResultText()
+            return False
+        device = self.__manager.device(result.portInfo.deviceId())
+        if device is None:
+            result.error = "The connection manager has no device for the port"
+            return False
+        result.device = device
+        result.error = None
+        return True
+
+
+def formatReport(report):
+    """
+    Parameters:
+        report: A dict mapping each address to ConnectResult.asDict(), see XdpcHandler.connectReport
+    Returns:
+         The report as a table with one line per device
+    """
+    lines = [f"{'address':>17} {'connected':>9} {'attempts':>8} {'done s':>7} {'open s':>7} {'backoff s':>9}  error"]
+    for address, stats in report.items():
+        lines.append(f"{address:>17} {str(stats['connected']):>9} {stats['attempts']:>8} {stats['seconds']:>7.2f} "
+                     f"{stats['open_s']:>7.2f} {stats['backoff_s']:>9.2f}  {stats['error'] or ''}")
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+#  Persistent cache of the last known good Movella DOTs.
+#
+#  Every script used to scan for up to 20 seconds before it could connect, even when the same
+#  sensors were used the run before. The cache file keeps for each device that was connected its
+#  bluetooth address, device ID, tag name, firmware version, output rate and filter profile, so
+#  XdpcHandler.connectKnownDots can open those devices directly on the next start and scan only
+#  for the ones that could not be reached.
+#
+
+import json
+import os
+import time
+
+CACHE_VERSION = 1
+
+
+def load(path):
+    """
+    Parameters:
+        path: The cache file
+    Returns:
+         A dict mapping the bluetooth address of each cached device to its entry (see describe),
+         empty if the file does not exist or can not be read
+    """
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return dict()
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return dict()
+    return {entry["address"]: entry for entry in data.get("devices", []) if "address" in entry and "deviceId" in entry}
+
+
+def save(path, entries):
+    """
+    Writes the cache, replacing an existing file only once the new one is complete
+
+    Parameters:
+        path: The cache file
+        entries: A dict mapping bluetooth addresses to entries, as returned by load
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump({"version": CACHE_VERSION, "devices": sorted(entries.values(), key=lambda entry: entry["address"])},
+                  file, indent=2)
+    os.replace(temporary, path)
+
+
+def describe(device, address):
+    """
+    Parameters:
+        device: A connected XsDotDevice
+        address: Its bluetooth address
+    Returns:
+         The cache entry of the device
+    """
+    return {"address": address,
+            "deviceId": _text(device.deviceId()),
+            "tagName": _text(device.deviceTagName()),
+            "firmware": _text(device.firmwareVersion()),
+            "outputRate": device.outputRate(),
+            "filterProfile": _text(device.onboardFilterProfile()),
+            "lastConnected": time.time()}
+
+
+def portInfo(sdk, entry):
+    """
+    Parameters:
+        sdk: The movelladot_pc_sdk module
+        entry: A cache entry
+    Returns:
+         An XsPortInfo to open the cached device with, None if the SDK can not construct one without an advertisement.
+         XsPortInfo(address, deviceId) is not used anywhere else, so the caller has to handle None.
+         This path has only been run against movelladot_sim, not checked against the real SDK; SWIG
+         raises NotImplementedError when no constructor overload matches the arguments
+    """
+    try:
+        return sdk.XsPortInfo(entry["address"], sdk.XsDeviceId(entry["deviceId"]))
+    except (TypeError, AttributeError, ValueError, NotImplementedError, RuntimeError):
+        return None
+
+
+def _text(value):
+    """
+    Returns an SDK value (XsString, XsVersion, XsDeviceId, XsFilterProfile) as str
+    """
+    if hasattr(value, "toXsString"):
+        return str(value.toXsString())
+    if hasattr(value, "label"):
+        return str(value.label())
+    return str(value)
@@ -0,0 +1,163 @@
+#  Address-keyed registry of the Movella DOTs an XdpcHandler streams from.
+#
+#  The connected devices used to be a list (and a parallel list of cached handles): a power down
+#  removed a device by walking the list, calling bluetoothAddress() through SWIG for every entry
+#  and removing from the list it was iterating, and looking up a device by address meant another
+#  linear scan. The DeviceRegistry keeps one DeviceHandle per bluetooth address, found in O(1) by
+#  address or by the C++ device pointer the SDK callbacks pass. A device keeps its slot for the
+#  lifetime of the registry, also when it is removed and connected again. Readers on the hot path
+#  (packetsAvailable, waitForPackets, the GUI and sync loops) take an immutable snapshot of the
+#  connected handles without locking; it is rebuilt once per change under the registry lock.
+#
+
+from threading import Lock
+
+
+class DeviceHandle:
+    """
+    Cached data of a device, so the hot paths do not have to cross the SWIG boundary
+    """
+    __slots__ = ("slot", "address", "device", "key", "channel", "connected", "tracker", "lastReceive")
+
+    def __init__(self, slot, address, channel):
+        self.slot = slot
+        self.address = address
+        # The XsDotDevice and its pointer, replaced when the device is reconnected with a new object
+        self.device = None
+        self.key = None
+        self.channel = channel
+        # False for a device that streams but was not opened through the handler, and while the SDK
+        # destroyed the device object of a supervised device until it is reconnected
+        self.connected = False
+        # SequenceTracker, created from the output rate when the first packet arrives
+        self.tracker = None
+        # perf_counter time of the last packet, for the silence detection of the reconnect supervisor
+        self.lastReceive = None
+
+
+class DeviceRegistry:
+    """
+    The devices of an XdpcHandler by bluetooth address and by device pointer
+
+    Lookups by address or pointer and snapshot() do not lock, the modifications are serialized.
+    """
+    def __init__(self):
+        self.__lock = Lock()
+        self.__byAddress = dict()
+        self.__byKey = dict()
+        # Bluetooth address -> slot, kept when a device is removed so it gets its slot back
+        self.__slots = dict()
+        # Tuple of the connected handles ordered by slot, replaced (never changed) on every modification
+        self.__snapshot = ()
+
+    def add(self, address, device, key, channel, connected=True):
+        """
+        Registers a device, or binds a new device object to the handle of a known address
+
+        Parameters:
+            address: The bluetooth address
+            device: The XsDotDevice
+            key: The identity of the C++ device object, see xdpchandler._deviceKey
+            channel: The packet channel of the address, used when the address is new
+            connected: True if the device belongs to the connected devices
+        Returns:
+             The DeviceHandle of the address
+        """
+        with self.__lock:
+            handle = self.__byAddress.get(address)
+            if handle is None:
+                slot = self.__slots.setdefault(address, len(self.__slots))
+                handle = self.__byAddress[address] = DeviceHandle(slot, address, channel)
+            self.__bind(handle, device, key)
+            if connected and not handle.connected:
+                handle.connected = True
+                self.__publish()
+            return handle
+
+    def rebind(self, address, device, key):
+        """
+        Replaces the device object of a registered address, e.g. after a reconnection, and puts a
+        device that was set disconnected back into the snapshot
+
+        Returns:
+             The DeviceHandle of the address, None if the address is not registered
+        """
+        with self.__lock:
+            handle = self.__byAddress.get(address)
+            if handle is not None:
+                self.__bind(handle, device, key)
+                if not handle.connected:
+                    handle.connected = True
+                    self.__publish()
+            return handle
+
+    def setDisconnected(self, address):
+        """
+        Drops a device from the snapshot but keeps its handle, e.g. while the SDK destroyed the device
+        object and it is being reconnected
+
+        Returns:
+             The DeviceHandle of the address, None if the address is not registered
+        """
+        with self.__lock:
+            handle = self.__byAddress.get(address)
+            if handle is not None and handle.connected:
+                handle.connected = False
+                self.__publish()
+            return handle
+
+    def remove(self, address):
+        """
+        Returns:
+             The DeviceHandle of the removed address, None if it was not registered
+        """
+        with self.__lock:
+            handle = self.__byAddress.pop(address, None)
+            if handle is None:
+                return None
+            if self.__byKey.get(handle.key) is handle:
+                del self.__byKey[handle.key]
+            if handle.connected:
+                self.__publish()
+            return handle
+
+    def get(self, address):
+        """
+        Returns:
+             The DeviceHandle of a bluetooth address, None if it is not registered
+        """
+        return self.__byAddress.get(address)
+
+    def byKey(self, key):
+        """
+        Returns:
+             The DeviceHandle of a device pointer, None if it is not registered
+        """
+        return self.__byKey.get(key)
+
+    def snapshot(self):
+        """
+        Returns:
+             A tuple with the handles of the connected devices ordered by slot, it does not change when
+             devices are added or removed later
+        """
+        return self.__snapshot
+
+    def handles(self):
+        """
+        Returns:
+             A list with the handles of all registered devices, including the ones not connected through the handler
+        """
+        with self.__lock:
+            return list(self.__byAddress.values())
+
+    def __bind(self, handle, device, key):
+        if handle.key is not None and handle.key != key and self.__byKey.get(handle.key) is handle:
+            del self.__byKey[handle.key]
+        handle.device = device
+        handle.key = key
+        self.__byKey[key] = handle
+
+    def __publish(self):
+        self.__snapshot = tuple(sorted((handle for handle in self.__byAddress.values() if handle.connected),
+                                       key=lambda handle: handle.slot))
@@ -0,0 +1,232 @@
+#  Groups the live data of synchronized Movella DOTs into frames.
+#
+#  Synchronized DOTs sample on a common clock, so the samples taken at the same moment carry
+#  the same sampleTimeFine (within a few microseconds). Taking one packet per device from the
+#  packet buffers only lines up as long as no packet is lost: after a single drop the rows drift
+#  apart. The FrameAssembler matches packets by sampleTimeFine instead and reports missing
+#  packets as holes in the frame.
+#
+
+from bisect import bisect_left, insort
+
+SAMPLE_TIME_FINE_WRAP = 1 << 32
+
+
+class Frame:
+    """
+    The packets of all devices that were sampled at the same moment
+    """
+    __slots__ = ("timestamp", "packets")
+
+    def __init__(self, timestamp, addresses):
+        """
+        Parameters:
+            timestamp: The sampleTimeFine of the frame
+            addresses: The bluetooth addresses of the devices in the frame
+        """
+        self.timestamp = timestamp
+        # Bluetooth address -> packet, None for a device that has no packet in this frame
+        self.packets = dict.fromkeys(addresses)
+
+    def complete(self):
+        """
+        Returns:
+             True if the frame holds a packet of every device
+        """
+        for packet in self.packets.values():
+            if packet is None:
+                return False
+        return True
+
+    def missing(self):
+        """
+        Returns:
+             A list with the bluetooth addresses of the devices that have no packet in this frame
+        """
+        return [address for address, packet in self.packets.items() if packet is None]
+
+
+class FrameAssembler:
+    """
+    Matches the packets of several devices by sampleTimeFine and emits the frames in time order
+
+    Packets of one device must be added in the order they were received, the devices may be
+    interleaved arbitrarily. A frame is emitted as soon as it is complete, or with holes once
+    every missing device has delivered a later packet (the missing packet can not arrive anymore).
+    At most maxPending frames are kept: when a device stops sending, the oldest frame is emitted
+    with holes instead of growing the reorder buffer.
+
+    Not thread-safe, meant to be used by the thread that reads the packets.
+    """
+    def __init__(self, addresses, outputRate, tolerance=None, maxPending=32):
+        """
+        Parameters:
+            addresses: The bluetooth addresses of the devices to assemble, e.g. XdpcHandler.connectedAddresses()
+            outputRate: The output rate of the devices in Hz
+            tolerance: The maximum sampleTimeFine difference within a frame in µs, None uses half a sample interval
+            maxPending: The maximum number of incomplete frames kept in the reorder buffer
+        """
+        if maxPending < 1:
+            raise ValueError(f"maxPending must be at least 1, got {maxPending}")
+
+        self.__addresses = list(addresses)
+        self.__tolerance = 500000 / outputRate if tolerance is None else tolerance
+        self.__maxPending = maxPending
+
+        # Pending frames, ascending by their unwrapped timestamp
+        self.__keys = list()
+        self.__frames = dict()
+        # Newest unwrapped timestamp per device, and of all devices
+        self.__latest = dict.fromkeys(self.__addresses)
+        self.__reference = None
+        self.__lastEmitted = None
+
+        self.__emitted = 0
+        self.__complete = 0
+        self.__forced = 0
+        self.__late = 0
+        self.__ignored = 0
+
+    def addresses(self):
+        """
+        Returns:
+             The bluetooth addresses of the assembled devices, in frame order
+        """
+        return list(self.__addresses)
+
+    def add(self, address, packet, sampleTimeFine=None):
+        """
+        Adds a packet of a device
+
+        Parameters:
+            address: The bluetooth address of the device
+            packet: The data packet
+            sampleTimeFine: The sampleTimeFine of the packet, None reads it from the packet
+        Returns:
+             A list with the frames that became ready, oldest first
+        """
+        if address not in self.__latest:
+            self.__ignored += 1
+            return []
+        if sampleTimeFine is None:
+            sampleTimeFine = packet.sampleTimeFine()
+
+        t = self.__unwrap(sampleTimeFine)
+        if self.__lastEmitted is not None and t <= self.__lastEmitted + self.__tolerance:
+            # Its frame was already emitted
+            self.__late += 1
+            return []
+
+        frame = None
+        i = bisect_left(self.__keys, t - self.__tolerance)
+        while i < len(self.__keys) and self.__keys[i] <= t + self.__tolerance:
+            candidate = self.__frames[self.__keys[i]]
+            if candidate.packets[address] is None:
+                frame = candidate
+                break
+            i += 1
+        if frame is None:
+            while t in self.__frames:
+                # A device sent two packets within the tolerance, keep them in separate frames
+                t += 1
+            frame = self.__frames[t] = Frame(sampleTimeFine, self.__addresses)
+            insort(self.__keys, t)
+        frame.packets[address] = packet
+
+        if self.__latest[address] is None or t > self.__latest[address]:
+            self.__latest[address] = t
+        return self.__emitReady()
+
+    def addPackets(self, packets):
+        """
+        Adds the packets of several devices, e.g. the result of XdpcHandler.drainAll()
+
+        Parameters:
+            packets: A dict mapping the bluetooth address of each device to a list of its packets, oldest first
+        Returns:
+             A list with the frames that became ready, oldest first
+        """
+        frames = []
+        for address, devicePackets in packets.items():
+            for packet in devicePackets:
+                frames.extend(self.add(address, packet))
+        return frames
+
+    def flush(self):
+        """
+        Emits all pending frames, with holes where packets are missing, e.g. at the end of a session
+
+        Returns:
+             A list with the pending frames, oldest first
+        """
+        frames = []
+        while self.__keys:
+            frames.append(self.__emitOldest())
+        return frames
+
+    def pending(self):
+        """
+        Returns:
+             The number of frames in the reorder buffer
+        """
+        return len(self.__keys)
+
+    def stats(self):
+        """
+        Returns:
+             A dict with the number of emitted frames, complete frames, frames with holes, frames emitted
+             with holes because the reorder buffer was full, packets that arrived after their frame was
+             emitted, packets of unknown devices and the number of pending frames
+        """
+        return {
+            "frames": self.__emitted,
+            "complete": self.__complete,
+            "with_holes": self.__emitted - self.__complete,
+            "forced": self.__forced,
+            "late_packets": self.__late,
+            "ignored_packets": self.__ignored,
+            "pending": len(self.__keys),
+        }
+
+    def __unwrap(self, sampleTimeFine):
+        """
+        Maps a 32 bit sampleTimeFine onto a timeline without wraparound, relative to the newest timestamp seen
+        """
+        if self.__reference is None:
+            self.__reference = sampleTimeFine
+            return sampleTimeFine
+
+        delta = (sampleTimeFine - self.__reference) % SAMPLE_TIME_FINE_WRAP
+        if delta >= SAMPLE_TIME_FINE_WRAP // 2:
+            delta -= SAMPLE_TIME_FINE_WRAP
+        t = self.__reference + delta
+        if t > self.__reference:
+            self.__reference = t
+        return t
+
+    def __emitReady(self):
+        frames = []
+        while self.__keys:
+            key = self.__keys[0]
+            frame = self.__frames[key]
+            ready = True
+            for address, packet in frame.packets.items():
+                latest = self.__latest[address]
+                if packet is None and (latest is None or latest <= key + self.__tolerance):
+                    ready = False
+                    break
+            if not ready:
+                if len(self.__keys) <= self.__maxPending:
+                    break
+                self.__forced += 1
+            frames.append(self.__emitOldest())
+        return frames
+
+    def __emitOldest(self):
+        key = self.__keys.pop(0)
+        frame = self.__frames.pop(key)
+        self.__lastEmitted = key
+        self.__emitted += 1
+        if frame.complete():
+            self.__complete += 1
+        return frame
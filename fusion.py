@@ -0,0 +1,315 @@
+#  Host side orientation filters for several Movella DOTs at once.
+#
+#  The DOTs already output an orientation, but the calibrated accelerometer and gyroscope data
+#  can also be fused on the host, e.g. to compare filters or to tune them for a movement. The
+#  filters keep the state of all sensors in arrays shaped [n_sensors, ...] and advance every
+#  sensor by one sample per NumPy operation, so the cost per step hardly depends on the number
+#  of sensors.
+#
+#  Quaternions are (w, x, y, z) and rotate the sensor frame into the global frame, like the DOT
+#  output and quatmath.toMatrix. The global z axis points up.
+#
+
+import numpy as np
+
+import quatmath
+
+
+def _gravityDirection(q):
+    """
+    The global z axis (the direction of the measured gravity reaction) expressed in the sensor frame, n×3
+    """
+    w, x, y, z = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    return np.stack((2.0 * (x * z - w * y), 2.0 * (y * z + w * x), 1.0 - 2.0 * (x * x + y * y)), axis=-1)
+
+
+def _unit(v):
+    """
+    Normalizes the rows of v, returns the unit vectors and a mask of the rows with a usable norm
+    """
+    norm = np.linalg.norm(v, axis=-1, keepdims=True)
+    valid = (norm[:, 0] > 1e-9) & np.isfinite(norm[:, 0])
+    return v / np.where(valid[:, np.newaxis], norm, 1.0), valid
+
+
+def _integrate(q, gyro, dt):
+    """
+    Advances q by the angular velocity gyro [rad/s] over dt
+    """
+    qDot = 0.5 * quatmath.multiply(q, np.concatenate((np.zeros((len(q), 1)), gyro), axis=1))
+    return q + qDot * dt
+
+
+def quaternionFromGravity(acc):
+    """
+    Initial orientation from the accelerometer: roll and pitch from gravity, yaw zero
+
+    Parameters:
+        acc: Accelerations in the sensor frame while (nearly) at rest, n×3
+    Returns:
+         The quaternions, n×4
+    """
+    acc = np.asarray(acc, dtype=np.float64)
+    roll = np.arctan2(acc[:, 1], acc[:, 2])
+    pitch = np.arctan2(-acc[:, 0], np.hypot(acc[:, 1], acc[:, 2]))
+    cr, sr = np.cos(roll / 2.0), np.sin(roll / 2.0)
+    cp, sp = np.cos(pitch / 2.0), np.sin(pitch / 2.0)
+    return np.stack((cr * cp, sr * cp, cr * sp, -sr * sp), axis=-1)
+
+
+class MadgwickFilter:
+    """
+    Madgwick's gradient descent filter, with magnetometer (MARG) or without (IMU)
+    """
+    def __init__(self, sensors, beta=0.1):
+        """
+        Parameters:
+            sensors: The number of sensors
+            beta: The gain of the gradient descent step, higher trusts the accelerometer more
+        """
+        self.beta = beta
+
+    def step(self, q, gyro, acc, mag, dt):
+        """
+        Parameters:
+            q: The current orientations, n×4
+            gyro: The angular velocities [rad/s], n×3
+            acc: The accelerations, n×3
+            mag: The magnetic fields, n×3, or None
+            dt: The time step [s]
+        Returns:
+             The new orientations, n×4 (not normalized)
+        """
+        qDot = 0.5 * quatmath.multiply(q, np.concatenate((np.zeros((len(q), 1)), gyro), axis=1))
+        a, accValid = _unit(acc)
+        w, x, y, z = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+
+        # Objective function f = expected gravity direction - measured, and its Jacobian
+        f = _gravityDirection(q) - a
+        J = np.stack((
+            np.stack((-2.0 * y, 2.0 * z, -2.0 * w, 2.0 * x), axis=-1),
+            np.stack((2.0 * x, 2.0 * w, 2.0 * z, 2.0 * y), axis=-1),
+            np.stack((np.zeros_like(w), -4.0 * x, -4.0 * y, np.zeros_like(w)), axis=-1),
+        ), axis=1)
+        gradient = np.einsum("nij,ni->nj", J, f)
+
+        if mag is not None:
+            m, magValid = _unit(mag)
+            # Earth field in the global frame, rotated onto the x-z plane
+            h = quatmath.rotate(q, m)
+            bx = np.hypot(h[:, 0], h[:, 1])
+            bz = h[:, 2]
+            fb = np.stack((
+                2.0 * bx * (0.5 - y * y - z * z) + 2.0 * bz * (x * z - w * y) - m[:, 0],
+                2.0 * bx * (x * y - w * z) + 2.0 * bz * (w * x + y * z) - m[:, 1],
+                2.0 * bx * (w * y + x * z) + 2.0 * bz * (0.5 - x * x - y * y) - m[:, 2],
+            ), axis=-1)
+            Jb = np.stack((
+                np.stack((-2.0 * bz * y, 2.0 * bz * z, -4.0 * bx * y - 2.0 * bz * w, -4.0 * bx * z + 2.0 * bz * x), axis=-1),
+                np.stack((-2.0 * bx * z + 2.0 * bz * x, 2.0 * bx * y + 2.0 * bz * w, 2.0 * bx * x + 2.0 * bz * z, -2.0 * bx * w + 2.0 * bz * y), axis=-1),
+                np.stack((2.0 * bx * y, 2.0 * bx * z - 4.0 * bz * x, 2.0 * bx * w - 4.0 * bz * y, 2.0 * bx * x), axis=-1),
+            ), axis=1)
+            gradient = gradient + np.where(magValid[:, np.newaxis], np.einsum("nij,ni->nj", Jb, fb), 0.0)
+
+        step, stepValid = _unit(gradient)
+        qDot -= self.beta * np.where((accValid & stepValid)[:, np.newaxis], step, 0.0)
+        return q + qDot * dt
+
+
+class MahonyFilter:
+    """
+    Mahony's complementary filter: a PI controller corrects the gyroscope with the gravity (and magnetic) error
+    """
+    def __init__(self, sensors, kp=1.0, ki=0.0):
+        """
+        Parameters:
+            sensors: The number of sensors
+            kp: The proportional gain
+            ki: The integral gain, estimates the gyroscope bias
+        """
+        self.kp = kp
+        self.ki = ki
+        self.integral = np.zeros((sensors, 3))
+
+    def step(self, q, gyro, acc, mag, dt):
+        """
+        Same parameters as MadgwickFilter.step
+        """
+        a, accValid = _unit(acc)
+        error = np.where(accValid[:, np.newaxis], np.cross(a, _gravityDirection(q)), 0.0)
+
+        if mag is not None:
+            m, magValid = _unit(mag)
+            h = quatmath.rotate(q, m)
+            # Expected field direction in the sensor frame, from the horizontal and vertical field components
+            b = np.stack((np.hypot(h[:, 0], h[:, 1]), np.zeros(len(q)), h[:, 2]), axis=-1)
+            expected = quatmath.rotate(quatmath.conjugate(q), b)
+            error += np.where(magValid[:, np.newaxis], np.cross(m, expected), 0.0)
+
+        if self.ki > 0.0:
+            self.integral += self.ki * error * dt
+        return _integrate(q, gyro + self.kp * error + self.integral, dt)
+
+
+class EkfFilter:
+    """
+    Extended Kalman filter with the quaternion as state, predicted with the gyroscope and corrected
+    with the gravity direction from the accelerometer. The magnetometer is not used, so the yaw
+    follows the gyroscope.
+    """
+    def __init__(self, sensors, gyroNoise=0.01, accNoise=0.05):
+        """
+        Parameters:
+            sensors: The number of sensors
+            gyroNoise: The standard deviation of the gyroscope noise [rad/s]
+            accNoise: The standard deviation of the normalized accelerometer noise
+        """
+        self.gyroNoise = gyroNoise
+        self.accNoise = accNoise
+        self.P = np.tile(np.eye(4) * 0.01, (sensors, 1, 1))
+
+    def step(self, q, gyro, acc, mag, dt):
+        """
+        Same parameters as MadgwickFilter.step, mag is ignored
+        """
+        n = len(q)
+        gx, gy, gz = gyro[:, 0], gyro[:, 1], gyro[:, 2]
+        zero = np.zeros(n)
+        omega = np.stack((
+            np.stack((zero, -gx, -gy, -gz), axis=-1),
+            np.stack((gx, zero, gz, -gy), axis=-1),
+            np.stack((gy, -gz, zero, gx), axis=-1),
+            np.stack((gz, gy, -gx, zero), axis=-1),
+        ), axis=1)
+        F = np.eye(4) + 0.5 * dt * omega
+        q = np.einsum("nij,nj->ni", F, q)
+        P = F @ self.P @ F.transpose(0, 2, 1) + np.eye(4) * (self.gyroNoise * dt / 2.0) ** 2
+
+        a, accValid = _unit(acc)
+        w, x, y, z = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+        H = 2.0 * np.stack((
+            np.stack((-y, z, -w, x), axis=-1),
+            np.stack((x, w, z, y), axis=-1),
+            np.stack((zero, -2.0 * x, -2.0 * y, zero), axis=-1),
+        ), axis=1)
+        S = H @ P @ H.transpose(0, 2, 1) + np.eye(3) * self.accNoise ** 2
+        # P and S are symmetric, so K^T = S^-1 H P
+        K = np.linalg.solve(S, H @ P).transpose(0, 2, 1)
+        innovation = np.where(accValid[:, np.newaxis], a - _gravityDirection(q), 0.0)
+        q = q + np.einsum("nij,nj->ni", K, innovation)
+        corrected = np.eye(4) - K @ H
+        self.P = np.where(accValid[:, np.newaxis, np.newaxis], corrected @ P, P)
+        return q
+
+
+FILTERS = {
+    "madgwick": MadgwickFilter,
+    "mahony": MahonyFilter,
+    "ekf": EkfFilter,
+}
+
+
+class FusionEngine:
+    """
+    Runs one orientation filter for several sensors in lockstep
+
+    Samples are given as arrays with one row per sensor, e.g. from 0.1 SampleStore.read or the
+    resampled output of StreamAligner. Rows with NaN in the gyroscope data keep the previous
+    orientation of that sensor, rows with NaN or zero acceleration skip the correction.
+    """
+    def __init__(self, sensors, rate, filter="madgwick", gyroInDegrees=True, **gains):
+        """
+        Parameters:
+            sensors: The number of sensors
+            rate: The sample rate in Hz, the default time step
+            filter: "madgwick", "mahony" or "ekf"
+            gyroInDegrees: True if the angular velocities are in deg/s, as calibratedGyroscopeData
+            gains: Filter parameters, beta (madgwick), kp and ki (mahony), gyroNoise and accNoise (ekf)
+        """
+        if filter not in FILTERS:
+            raise ValueError(f"Unknown filter '{filter}', expected one of {', '.join(FILTERS)}")
+
+        self.__sensors = sensors
+        self.__dt = 1.0 / rate
+        self.__filterName = filter
+        self.__gains = gains
+        self.__gyroScale = np.pi / 180.0 if gyroInDegrees else 1.0
+        self.reset()
+
+    def reset(self, quat=None):
+        """
+        Restarts the filters
+
+        Parameters:
+            quat: The initial orientations, n×4, None initializes each sensor from its first acceleration
+        """
+        self.__filter = FILTERS[self.__filterName](self.__sensors, **self.__gains)
+        if quat is None:
+            self.__q = np.tile([1.0, 0.0, 0.0, 0.0], (self.__sensors, 1))
+            self.__initialized = np.zeros(self.__sensors, dtype=bool)
+        else:
+            self.__q = quatmath.normalize(np.asarray(quat, dtype=np.float64).reshape(self.__sensors, 4))
+            self.__initialized = np.ones(self.__sensors, dtype=bool)
+
+    def filterName(self):
+        """
+        Returns:
+             The name of the filter in use
+        """
+        return self.__filterName
+
+    def quaternions(self):
+        """
+        Returns:
+             The current orientation of every sensor, n×4
+        """
+        return self.__q.copy()
+
+    def update(self, gyro, acc, mag=None, dt=None):
+        """
+        Advances every sensor by one sample
+
+        Parameters:
+            gyro: The angular velocities, n×3
+            acc: The accelerations, n×3
+            mag: The magnetic fields, n×3, or None
+            dt: The time step in seconds, None uses 1 / rate
+        Returns:
+             The new orientations, n×4
+        """
+        gyro = np.asarray(gyro, dtype=np.float64).reshape(self.__sensors, 3) * self.__gyroScale
+        acc = np.asarray(acc, dtype=np.float64).reshape(self.__sensors, 3)
+        if mag is not None:
+            mag = np.asarray(mag, dtype=np.float64).reshape(self.__sensors, 3)
+        dt = self.__dt if dt is None else dt
+
+        valid = np.isfinite(gyro).all(axis=1)
+        if not self.__initialized.all():
+            start = ~self.__initialized & valid & np.isfinite(acc).all(axis=1) & (np.linalg.norm(acc, axis=1) > 0)
+            if start.any():
+                self.__q[start] = quaternionFromGravity(acc[start])
+                self.__initialized |= start
+            valid &= self.__initialized
+
+        q = quatmath.normalize(self.__filter.step(self.__q, np.where(valid[:, np.newaxis], gyro, 0.0), acc, mag, dt))
+        self.__q = np.where(valid[:, np.newaxis], q, self.__q)
+        return self.__q.copy()
+
+    def updateBlock(self, gyro, acc, mag=None, dt=None):
+        """
+        Advances every sensor by a block of T samples
+
+        Parameters:
+            gyro: The angular velocities, T×n×3
+            acc: The accelerations, T×n×3
+            mag: The magnetic fields, T×n×3, or None
+            dt: The time step in seconds, None uses 1 / rate
+        Returns:
+             The orientation after each sample, T×n×4
+        """
+        gyro = np.asarray(gyro, dtype=np.float64)
+        acc = np.asarray(acc, dtype=np.float64)
+        res = np.empty(gyro.shape[:-1] + (4,))
+        for t in range(len(gyro)):
+            res[t] = self.update(gyro[t], acc[t], None if mag is None else mag[t], dt)
+        return res
@@ -0,0 +1,174 @@
+#  Latency and jitter statistics for the live data path of the XdpcHandler.
+#
+#  The handler stamps every packet with the host time at which the SDK callback delivered it.
+#  When a consumer dequeues the packet, the age of the packet, the inter-arrival jitter and the
+#  depth of the packet channel are added to fixed-bin histograms, so the percentiles can be
+#  queried at any time without keeping the individual samples.
+#
+
+from bisect import bisect_left
+import json
+import time
+
+
+def logEdges(low, high, perDecade=20):
+    """
+    Parameters:
+        low: The upper edge of the first bin, values below it end up in the first bin
+        high: The upper edge of the last regular bin, values above it end up in the overflow bin
+        perDecade: The number of bins per factor 10
+    Returns:
+         A list with logarithmically spaced bin edges from low to high
+    """
+    edges = []
+    edge = low
+    factor = 10.0 ** (1.0 / perDecade)
+    while edge < high * factor ** 0.5:
+        edges.append(edge)
+        edge *= factor
+    return edges
+
+
+class Histogram:
+    """
+    Counts values in fixed bins, percentiles are resolved to the upper edge of a bin
+
+    Bin i counts the values v with edges[i - 1] < v <= edges[i], the last bin counts the values
+    above the last edge. The minimum, maximum and mean are tracked exactly.
+    """
+    def __init__(self, edges):
+        """
+        Parameters:
+            edges: The ascending upper edges of the bins
+        """
+        self.__edges = list(edges)
+        self.__counts = [0] * (len(self.__edges) + 1)
+        self.__count = 0
+        self.__sum = 0.0
+        self.__min = None
+        self.__max = None
+
+    def add(self, value):
+        """
+        Parameters:
+            value: The value to count
+        """
+        self.__counts[bisect_left(self.__edges, value)] += 1
+        self.__count += 1
+        self.__sum += value
+        if self.__min is None or value < self.__min:
+            self.__min = value
+        if self.__max is None or value > self.__max:
+            self.__max = value
+
+    def count(self):
+        """
+        Returns:
+             The number of counted values
+        """
+        return self.__count
+
+    def percentile(self, p):
+        """
+        Parameters:
+            p: The percentile, between 0 and 100
+        Returns:
+             The upper edge of the bin holding the p-th percentile (the maximum for the overflow bin),
+             None if no values were counted
+        """
+        if self.__count == 0:
+            return None
+        rank = p / 100.0 * self.__count
+        seen = 0
+        for i, n in enumerate(self.__counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.__edges[i], self.__max) if i < len(self.__edges) else self.__max
+        return self.__max
+
+    def summary(self, scale=1):
+        """
+        Parameters:
+            scale: Factor applied to the reported values, e.g. 1000 to report seconds in milliseconds
+        Returns:
+             A dict with the count, mean, min, p50, p95, p99 and max
+        """
+        def scaled(value):
+            return None if value is None else value * scale
+
+        return {
+            "count": self.__count,
+            "mean": scaled(self.__sum / self.__count if self.__count else None),
+            "min": scaled(self.__min),
+            "p50": scaled(self.percentile(50)),
+            "p95": scaled(self.percentile(95)),
+            "p99": scaled(self.percentile(99)),
+            "max": scaled(self.__max),
+        }
+
+
+class DeviceLatency:
+    """
+    Latency statistics of a single device
+
+    - latency: the time between the SDK callback and the dequeue of the packet [s]
+    - jitter: how much the host inter-arrival time differs from the sample interval given by
+      sampleTimeFine, i.e. the delay variation added by the BLE link and the SDK [s]
+    - queue depth: the number of packets waiting in the channel at each dequeue
+    """
+    def __init__(self, capacity):
+        """
+        Parameters:
+            capacity: The capacity of the packet channel of the device
+        """
+        self.latency = Histogram(logEdges(1e-6, 10.0))
+        self.jitter = Histogram(logEdges(1e-6, 10.0))
+        self.queueDepth = Histogram(range(capacity + 1))
+        self.__lastReceiveTime = None
+        self.__lastSampleTimeFine = None
+
+    def addPacket(self, receiveTime, sampleTimeFine, now):
+        """
+        Parameters:
+            receiveTime: The host time at which the SDK delivered the packet [s]
+            sampleTimeFine: The sampleTimeFine of the packet [µs], None if unknown
+            now: The host time of the dequeue [s]
+        """
+        self.latency.add(now - receiveTime)
+        if sampleTimeFine is not None:
+            if self.__lastSampleTimeFine is not None:
+                # sampleTimeFine is an unsigned 32 bit counter that wraps around
+                sampleInterval = ((sampleTimeFine - self.__lastSampleTimeFine) & 0xFFFFFFFF) * 1e-6
+                self.jitter.add(abs((receiveTime - self.__lastReceiveTime) - sampleInterval))
+            self.__lastSampleTimeFine = sampleTimeFine
+            self.__lastReceiveTime = receiveTime
+
+    def addQueueDepth(self, depth):
+        """
+        Parameters:
+            depth: The number of packets in the channel before a dequeue
+        """
+        self.queueDepth.add(depth)
+
+    def report(self):
+        """
+        Returns:
+             A dict with the latency and jitter summaries in milliseconds and the queue depth summary
+        """
+        return {
+            "latency_ms": self.latency.summary(1000.0),
+            "jitter_ms": self.jitter.summary(1000.0),
+            "queue_depth": self.queueDepth.summary(),
+        }
+
+
+def dumpReport(report, path):
+    """
+    Writes a latency report as JSON
+
+    Parameters:
+        report: A dict mapping the bluetooth address of each device to its DeviceLatency report
+        path: The file to write
+    """
+    with open(path, "w") as file:
+        json.dump({"time": time.strftime("%Y-%m-%d %H:%M:%S"), "devices": report}, file, indent=2)
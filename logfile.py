@@ -0,0 +1,320 @@
+#  Loader for the logfile_*.csv captures written by the Movella DOT SDK.
+#
+#  A capture starts with a metadata line ("DeviceTag: Brazo,FirmwareVersion: 3.0.0,...,
+#  OutputRate: 60,...,StartTime: ...") followed by the column header ("SampleTimeFine,Quat_W,...")
+#  and the samples. The metadata line has a different number of fields than the data, which is
+#  what breaks a plain pd.read_csv. The body is parsed by np.loadtxt straight into a structured array
+#  with one field per column, either at once or in chunks for multi-hour captures.
+#
+#  For random access a sparse time index (see timeindex.py) with the byte offset of every Nth
+#  sample is built on the first loadRange and kept next to the capture, later time range queries
+#  only parse the lines of the range.
+#
+
+from datetime import datetime
+import io
+
+import numpy as np
+
+import timeindex
+
+# Columns stored as integers, all other columns are float64
+INTEGER_COLUMNS = ("SampleTimeFine", "PacketCounter", "Status")
+
+# Bytes parsed per chunk by iterChunks
+CHUNK_BYTES = 16 << 20
+
+# Blocks with malformed lines are split until they are at most this large, then parsed line by line
+SLOW_PATH_BYTES = 4096
+
+# Samples between two anchors of the time index
+INDEX_EVERY = 1000
+
+SAMPLE_TIME_FINE_WRAP = 1 << 32
+
+# Metadata key in the capture -> attribute of LogfileHeader
+_METADATA_FIELDS = {
+    "DeviceTag": "deviceTag",
+    "FirmwareVersion": "firmwareVersion",
+    "AppVersion": "appVersion",
+    "SyncStatus": "syncStatus",
+    "OutputRate": "outputRate",
+    "FilterProfile": "filterProfile",
+    "Measurement Mode": "measurementMode",
+    "StartTime": "startTime",
+}
+
+
+class LogfileHeader:
+    """
+    The metadata and the columns of a capture
+    """
+    def __init__(self, metadata, columns):
+        """
+        Parameters:
+            metadata: A dict with the "key: value" fields of the metadata line
+            columns: The column names of the header line
+        """
+        self.deviceTag = metadata.get("DeviceTag", "")
+        self.firmwareVersion = metadata.get("FirmwareVersion", "")
+        self.appVersion = metadata.get("AppVersion", "")
+        self.syncStatus = metadata.get("SyncStatus", "")
+        self.filterProfile = metadata.get("FilterProfile", "")
+        self.measurementMode = metadata.get("Measurement Mode", "")
+        try:
+            self.outputRate = int(metadata.get("OutputRate", "0"))
+        except ValueError:
+            self.outputRate = 0
+        try:
+            self.startTime = datetime.strptime(metadata.get("StartTime", ""), "%Y-%m-%d %H:%M:%S.%f")
+        except ValueError:
+            self.startTime = None
+        # Fields this loader does not know, e.g. of a newer SDK version
+        self.extra = {key: value for key, value in metadata.items() if key not in _METADATA_FIELDS}
+        self.columns = list(columns)
+        self.dtype = np.dtype([(name, np.int64 if name in INTEGER_COLUMNS else np.float64) for name in self.columns])
+
+    def __repr__(self):
+        return (f"LogfileHeader(deviceTag={self.deviceTag!r}, firmwareVersion={self.firmwareVersion!r}, "
+                f"outputRate={self.outputRate}, startTime={self.startTime}, columns={self.columns})")
+
+
+def parseMetadata(line):
+    """
+    Parameters:
+        line: The first line of a capture
+    Returns:
+         A dict with its "key: value" fields, fields without a key (the copyright notice) are skipped
+    """
+    metadata = dict()
+    for field in line.strip().split(","):
+        key, separator, value = field.partition(": ")
+        if separator:
+            metadata[key.strip()] = value.strip()
+    return metadata
+
+
+def readHeader(path):
+    """
+    Parameters:
+        path: The capture to read
+    Returns:
+         The LogfileHeader of the capture, its columns are empty for a capture without samples
+    """
+    with open(path, "rb") as file:
+        return _readHeader(file)
+
+
+def load(path):
+    """
+    Reads a whole capture
+
+    Parameters:
+        path: The capture to read
+    Returns:
+         A tuple (header, samples): the LogfileHeader and a structured array with one field per column,
+         e.g. samples["SampleTimeFine"] or samples["Quat_W"]
+    """
+    header = readHeader(path)
+    chunks = list(iterChunks(path))
+    if not chunks:
+        return header, np.zeros(0, dtype=header.dtype)
+    return header, np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+
+
+def iterChunks(path, chunkBytes=CHUNK_BYTES):
+    """
+    Streams the samples of a capture, so multi-hour captures do not have to fit in memory at once
+
+    Parameters:
+        path: The capture to read
+        chunkBytes: The approximate number of bytes parsed per chunk
+    Returns:
+         A generator of structured arrays (see load), oldest samples first
+    """
+    with open(path, "rb") as file:
+        header = _readHeader(file)
+        if not header.columns:
+            return
+        rest = b""
+        while True:
+            block = file.read(chunkBytes)
+            if not block:
+                break
+            block = rest + block
+            end = block.rfind(b"\n") + 1
+            if end == 0:
+                rest = block
+                continue
+            rest = block[end:]
+            samples = _parse(block[:end], header)
+            if len(samples):
+                yield samples
+        if rest.strip():
+            # The last line has no line end, e.g. when the capture was cut off
+            samples = _parse(rest, header)
+            if len(samples):
+                yield samples
+
+
+def buildIndex(path, every=INDEX_EVERY, timeColumn="SampleTimeFine"):
+    """
+    Builds the sparse time index of a capture in one pass, parsing only every Nth line
+
+    Parameters:
+        path: The capture
+        every: The number of samples between two anchors
+        timeColumn: The column with the sampleTimeFine [µs]
+    Returns:
+         A TimeIndex with the unwrapped sampleTimeFine of the anchors in µs since the first sample
+    """
+    if every < 1:
+        raise ValueError(f"every must be at least 1, got {every}")
+    size, mtime = timeindex.statSource(path)
+    with open(path, "rb") as file:
+        header = _readHeader(file)
+        if not header.columns:
+            # A capture without samples
+            return timeindex.TimeIndex([], [], every, size, mtime, {"unit": "us", "timeColumn": timeColumn, "first": None})
+        if timeColumn not in header.columns:
+            raise KeyError(f"{path} has no column {timeColumn}")
+        column = header.columns.index(timeColumn)
+
+        # The byte offsets of every Nth line start, found with NumPy on whole chunks
+        position = file.tell()
+        starts = [np.array([position], dtype=np.int64)] if position < size else []
+        lines = len(starts)
+        while True:
+            block = file.read(CHUNK_BYTES)
+            if not block:
+                break
+            lineStarts = position + np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10) + 1
+            lineStarts = lineStarts[lineStarts < size]
+            # Line number lines + k is an anchor if it is a multiple of every
+            starts.append(lineStarts[(-lines) % every::every])
+            lines += len(lineStarts)
+            position += len(block)
+        offsets = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+
+        anchors = []
+        raw = []
+        for offset in offsets.tolist():
+            file.seek(offset)
+            fields = file.readline().split(b",", column + 1)
+            try:
+                raw.append(int(fields[column]))
+                anchors.append(offset)
+            except (ValueError, IndexError):
+                # A malformed line is not used as anchor, the previous anchor covers its range
+                continue
+
+    raw = np.array(raw, dtype=np.int64)
+    keys = np.concatenate(([0], np.cumsum(np.diff(raw) % SAMPLE_TIME_FINE_WRAP))) if len(raw) else raw
+    metadata = {"unit": "us", "timeColumn": timeColumn, "first": int(raw[0]) if len(raw) else None}
+    return timeindex.TimeIndex(keys, anchors, every, size, mtime, metadata)
+
+
+def openIndex(path, every=INDEX_EVERY):
+    """
+    Returns the time index of a capture: the sidecar file if it is up to date, else a new index
+    that is saved as sidecar file for the next time
+
+    Parameters:
+        path: The capture
+        every: The number of samples between two anchors of a new index
+    Returns:
+         The TimeIndex, see buildIndex
+    """
+    index = timeindex.loadFresh(path)
+    if index is None:
+        index = buildIndex(path, every)
+        timeindex.trySave(index, path)
+    return index
+
+
+def loadRange(path, start, stop, index=None):
+    """
+    Reads the samples of a time range without parsing the rest of the capture
+
+    Parameters:
+        path: The capture
+        start: The start of the range in seconds since the first sample
+        stop: The end of the range (exclusive) in seconds since the first sample
+        index: The TimeIndex of the capture, None uses openIndex
+    Returns:
+         A tuple (header, samples) as returned by load, with the samples of the range
+    """
+    if index is None:
+        index = openIndex(path)
+    header = readHeader(path)
+    if len(index) == 0 or stop <= start:
+        return header, np.zeros(0, dtype=header.dtype)
+
+    startKey = start * 1e6
+    stopKey = stop * 1e6
+    first = index.locate(startKey)
+    last = index.after(stopKey)
+    with open(path, "rb") as file:
+        file.seek(int(index.offsets[first]))
+        block = file.read() if last >= len(index) else file.read(int(index.offsets[last] - index.offsets[first]))
+    samples = _parse(block, header)
+    if not len(samples):
+        return header, samples
+
+    # Unwrap the slice from its anchor, small backward steps (reordered samples) stay negative
+    anchorRaw = (index.metadata["first"] + int(index.keys[first])) % SAMPLE_TIME_FINE_WRAP
+    timeFine = samples[index.metadata["timeColumn"]]
+    steps = np.diff(np.concatenate(([anchorRaw], timeFine))) % SAMPLE_TIME_FINE_WRAP
+    steps[steps >= SAMPLE_TIME_FINE_WRAP // 2] -= SAMPLE_TIME_FINE_WRAP
+    keys = index.keys[first] + np.cumsum(steps)
+    return header, samples[(keys >= startKey) & (keys < stopKey)]
+
+
+def _readHeader(file):
+    """
+    Reads the metadata and column lines from the start of a binary file
+    """
+    metadata = parseMetadata(file.readline().decode("utf-8", errors="replace"))
+    columns = file.readline().decode("utf-8", errors="replace").strip()
+    return LogfileHeader(metadata, [name.strip() for name in columns.split(",")] if columns else [])
+
+
+def _parse(block, header):
+    """
+    Parses complete lines of samples into a structured array
+    A block with malformed lines is split in halves at a line end until the parts that fail are small,
+    so a single bad line costs about one more pass of np.loadtxt instead of parsing the block in Python
+    """
+    try:
+        # The C parser of np.loadtxt fills the structured array directly
+        return np.loadtxt(io.BytesIO(block), delimiter=",", dtype=header.dtype, ndmin=1, encoding="ascii")
+    except ValueError:
+        pass
+
+    if len(block) > SLOW_PATH_BYTES:
+        middle = block.rfind(b"\n", 0, len(block) // 2) + 1 or block.find(b"\n", len(block) // 2) + 1
+        if 0 < middle < len(block):
+            parts = [_parse(part, header) for part in (block[:middle], block[middle:]) if part.strip()]
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=header.dtype)
+
+    values = _parseLines(block, len(header.columns))
+    samples = np.empty(len(values), dtype=header.dtype)
+    for i, name in enumerate(header.columns):
+        samples[name] = values[:, i]
+    return samples
+
+
+def _parseLines(block, columnCount):
+    """
+    Slow path for blocks with malformed lines: parses line by line and skips the lines that do not fit
+    """
+    rows = []
+    for line in block.decode("ascii", errors="replace").splitlines():
+        fields = line.strip().split(",")
+        if len(fields) != columnCount:
+            continue
+        try:
+            rows.append([float(field) for field in fields])
+        except ValueError:
+            continue
+    return np.array(rows, dtype=np.float64).reshape(-1, columnCount)
@@ -32,6 +32,10 @@
 # pip install movelladot_pc_sdk-202x.x.x-cp39-none-win_amd64.whl
 
 from xdpchandler import *
+from usbexport import ExportOrchestrator, formatSummary
+
+# Number of docked devices exporting at the same time
+maxConcurrentExports = 4
 
 
 if __name__ == "__main__":
@@ -62,42 +66,27 @@ if __name__ == "__main__":
     exportData.push_back(movelladot_pc_sdk.RecordingData_MagneticField);
     exportData.push_back(movelladot_pc_sdk.RecordingData_Status);
 
-    device = xdpcHandler.connectedUsbDots()[0]
-
-    recordingIndex = device.recordingCount()
-    recInfo = device.getRecordingInfo(recordingIndex)
-    if recInfo.empty():
-        print(f'Could not get recording info. Reason: {device.lastResultText()}')
-    else:
-        print(f'Recording [{recordingIndex}], Storage Size: {recInfo.storageSize()} bytes')
-        print(f'Recording [{recordingIndex}], Recording Time: {recInfo.totalRecordingTime()} seconds')
-
-    csvFilename = f'device_{device.deviceId().toXsString()}_{recordingIndex}.csv'
-    print(f'Exporting recording {recordingIndex} to file {csvFilename}')
-
-    if not device.selectExportData(exportData):
-        print(f'Could not select export data. Reason: {device.lastResultText()}')
-    elif not device.enableLogging(csvFilename):
-        print(f'Could not open logfile for data export. Reason: {device.lastResultText()}')
-    elif not device.startExportRecording(recordingIndex):
-        print(f'Could not export recording. Reason: {device.lastResultText()}')
-    else:
-        # Sleeping for max 10 seconds...
-        startTime = movelladot_pc_sdk.XsTimeStamp_nowMs()
-        while not xdpcHandler.exportDone() and movelladot_pc_sdk.XsTimeStamp_nowMs() - startTime <= 10000:
-            time.sleep(0.1)
-
-        if xdpcHandler.exportDone():
-            print('File export finished!')
-        else:
-            print('Done sleeping, aborting export for demonstration purposes.')
-            if not device.stopExportRecording():
-                print(f'Device stop export failed. Reason: {device.lastResultText()}')
+    for device in xdpcHandler.connectedUsbDots():
+        deviceId = device.deviceId().toXsString()
+        for recordingIndex in range(1, device.recordingCount() + 1):
+            recInfo = device.getRecordingInfo(recordingIndex)
+            if recInfo.empty():
+                print(f'{deviceId} could not get recording info. Reason: {device.lastResultText()}')
             else:
-                print('Device export stopped')
-
-        print(f'Received {xdpcHandler.packetsReceived()} data packets from the recording.')
-
-    device.disableLogging()
+                print(f'{deviceId} Recording [{recordingIndex}], Storage Size: {recInfo.storageSize()} bytes, '
+                      f'Recording Time: {recInfo.totalRecordingTime()} seconds')
+
+    print(f'Exporting all recordings of {len(xdpcHandler.connectedUsbDots())} device(s), '
+          f'{maxConcurrentExports} at a time')
+    orchestrator = ExportOrchestrator(xdpcHandler, exportData, maxConcurrent=maxConcurrentExports)
+    try:
+        summary = orchestrator.run()
+    except KeyboardInterrupt:
+        print('\nExports stopped')
+        summary = orchestrator.summary()
+
+    print()
+    print(formatSummary(summary))
+    print(f'Received {xdpcHandler.packetsReceived()} data packets from the recordings.')
 
     xdpcHandler.cleanup()
@@ -32,6 +32,10 @@
 # pip install movelladot_pc_sdk-202x.x.x-cp39-none-win_amd64.whl
 
 from xdpchandler import *
+from frameassembler import FrameAssembler
+
+# Output rate set on all devices, also the rate the FrameAssembler expects the frames at
+OUTPUT_RATE = 20
 
 
 if __name__ == "__main__":
@@ -61,8 +65,8 @@ if __name__ == "__main__":
         else:
             print("Setting filter profile failed!")
 
-        if device.setOutputRate(20):
-            print("Successfully set output rate to 20 Hz")
+        if device.setOutputRate(OUTPUT_RATE):
+            print(f"Successfully set output rate to {OUTPUT_RATE} Hz")
         else:
             print("Setting output rate failed!")
 
@@ -101,22 +105,36 @@ if __name__ == "__main__":
         s += f"{device.portInfo().bluetoothAddress():27}"
     print("%s" % s, flush=True)
 
+    # Groups the packets of all devices by sampleTimeFine, so a lost packet shows up as a hole
+    # instead of shifting the rows of that device
+    assembler = FrameAssembler(xdpcHandler.connectedAddresses(), outputRate=OUTPUT_RATE)
+    rootAddress = xdpcHandler.connectedAddresses()[-1]
+
     startTime = movelladot_pc_sdk.XsTimeStamp_nowMs()
     while movelladot_pc_sdk.XsTimeStamp_nowMs() - startTime <= 2000:
-        if xdpcHandler.packetsAvailable():
-            s = ""
-            for device in xdpcHandler.connectedDots():
-                # Retrieve a packet
-                packet = xdpcHandler.getNextPacket(device.portInfo().bluetoothAddress())
-
-                if packet.containsOrientation():
-                    euler = packet.orientationEuler()
-                    s += f"TS:{packet.sampleTimeFine():8d}, Roll:{euler.x():7.2f}| "
-
-            print("%s" % s, flush=True)
+        # Frames are emitted at the pace of the root node
+        if xdpcHandler.waitForPacket(rootAddress, timeout=0.1):
+            for frame in assembler.addPackets(xdpcHandler.drainAll()):
+                s = ""
+                for address in assembler.addresses():
+                    packet = frame.packets[address]
+                    if packet is None:
+                        s += f"TS:{frame.timestamp:8d}, {'missing':>12}| "
+                    elif packet.containsOrientation():
+                        euler = packet.orientationEuler()
+                        s += f"TS:{packet.sampleTimeFine():8d}, Roll:{euler.x():7.2f}| "
+
+                print("%s" % s, flush=True)
 
     print("\n-----------------------------------------", end="", flush=True)
 
+    frameStats = assembler.stats()
+    print(f"\nFrames: {frameStats['frames']}, complete: {frameStats['complete']}, with holes: {frameStats['with_holes']}")
+    print("Sample loss per device (from sampleTimeFine):")
+    for address, stats in xdpcHandler.sequenceStats().items():
+        print(f"{address}: received {stats['received']}, lost {stats['lost']} ({stats['loss_pct']:.1f}%), "
+              f"{stats['throughput_hz']:.1f} Hz of {stats['output_rate']} Hz, stalls {stats['stalls']}")
+
     print("\nStopping measurement...")
     for device in xdpcHandler.connectedDots():
         if not device.stopMeasurement():
@@ -46,6 +46,8 @@ class XsensApp:
         for device in self.xdpcHandler.connectedDots():
             device.setLogOptions(movelladot_pc_sdk.XsLogOptions_Quaternion)
             device.startMeasurement(movelladot_pc_sdk.XsPayloadMode_ExtendedEuler)
+        # Reconecta los sensores que se desconecten y reinicia su medición
+        self.xdpcHandler.startSupervisor(movelladot_pc_sdk.XsPayloadMode_ExtendedEuler)
 
         self.status_label.config(text="Connected! Streaming live data...")
         self.running = True
@@ -61,22 +63,12 @@ class XsensApp:
         """Hilo para leer paquetes continuamente"""
         while self.running:
             try:
-                for device in self.xdpcHandler.connectedDots():
-                    if not device.isConnected():
-                        # Intentar reconexión
-                        try:
-                            device.reconnect()
-                        except Exception as e:
-                            with self.data_lock:
-                                self.data_text.insert(tk.END, f"{device.bluetoothAddress()} → Reconnection failed\n")
-                        continue
-
-                    # Leer todos los paquetes disponibles
-                    while self.xdpcHandler.packetsAvailable():
-                        packet = self.xdpcHandler.getNextPacket(device.portInfo().bluetoothAddress())
+                for address in self.xdpcHandler.connectedAddresses():
+                    # Leer todos los paquetes disponibles, el supervisor se encarga de las reconexiones
+                    for packet in self.xdpcHandler.getPackets(address):
                         if packet.containsOrientation():
                             euler = packet.orientationEuler()
-                            line = f"{device.bluetoothAddress()} → Roll:{euler.x():.2f}, Pitch:{euler.y():.2f}, Yaw:{euler.z():.2f}\n"
+                            line = f"{address} → Roll:{euler.x():.2f}, Pitch:{euler.y():.2f}, Yaw:{euler.z():.2f}\n"
                             with self.data_lock:
                                 self.data_text.insert(tk.END, line)
 
@@ -50,13 +50,18 @@ class XsensApp:
         if not self.running:
             return
 
-        if self.xdpcHandler.packetsAvailable():
+        # Take everything that arrived since the last tick in one go and show the newest sample per device
+        pending = self.xdpcHandler.drainAll()
+        if any(pending.values()):
             self.data_text.delete(1.0, tk.END)
-            for device in self.xdpcHandler.connectedDots():
-                packet = self.xdpcHandler.getNextPacket(device.portInfo().bluetoothAddress())
+            for address in self.xdpcHandler.connectedAddresses():
+                packets = pending.get(address)
+                if not packets:
+                    continue
+                packet = packets[-1]
                 if packet.containsOrientation():
                     euler = packet.orientationEuler()
-                    line = f"{device.bluetoothAddress()} → Roll:{euler.x():.2f}, Pitch:{euler.y():.2f}, Yaw:{euler.z():.2f}\n"
+                    line = f"{address} → Roll:{euler.x():.2f}, Pitch:{euler.y():.2f}, Yaw:{euler.z():.2f}\n"
                     self.data_text.insert(tk.END, line)
 
         # Repeat the function every 50ms
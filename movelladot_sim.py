@@ -0,0 +1,1127 @@
+#  Hardware-free stand-in for the movelladot_pc_sdk module.
+#
+#  Implements the part of the Movella DOT PC SDK used by the XdpcHandler and the scripts in
+#  this repository (connection manager, XsPortInfo, XsDotDevice, XsDataPacket, callbacks), so
+#  they can run and be benchmarked without physical sensors. Live data is either replayed from
+#  logfile_*.csv captures or generated as a synthetic IMU signal, and delivered on a dedicated
+#  callback thread with configurable output rate, sensor count, jitter and packet loss.
+#
+#  Usage, before anything imports movelladot_pc_sdk:
+#
+#      import movelladot_sim
+#      movelladot_sim.configure(sensors=5, output_rate=120)
+#      movelladot_sim.install()
+#
+#      from xdpchandler import *
+#
+
+import glob
+import heapq
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+import logfile
+
+GRAVITY = 9.81
+
+# Payload modes, values are arbitrary but unique
+XsPayloadMode_HighFidelitywMag = 0
+XsPayloadMode_ExtendedQuaternion = 1
+XsPayloadMode_CompleteQuaternion = 2
+XsPayloadMode_OrientationEuler = 3
+XsPayloadMode_OrientationQuaternion = 4
+XsPayloadMode_FreeAcceleration = 5
+XsPayloadMode_ExtendedEuler = 6
+XsPayloadMode_CompleteEuler = 16
+XsPayloadMode_HighFidelity = 17
+XsPayloadMode_DeltaQuantitieswMag = 18
+XsPayloadMode_DeltaQuantities = 19
+XsPayloadMode_RateQuantitieswMag = 20
+XsPayloadMode_RateQuantities = 21
+XsPayloadMode_CustomMode1 = 22
+XsPayloadMode_CustomMode2 = 23
+XsPayloadMode_CustomMode3 = 24
+XsPayloadMode_CustomMode4 = 25
+XsPayloadMode_CustomMode5 = 26
+XsPayloadMode_Euler = XsPayloadMode_OrientationEuler
+
+XsLogOptions_Quaternion = 0
+XsLogOptions_Euler = 1
+
+# Device states
+XDS_Initial = 0
+XDS_Measurement = 1
+XDS_Destructing = 2
+
+# Result values
+XRV_OK = 0
+XRV_ERROR = 1
+XRV_TIMEOUT = 2
+XRV_SYNC_COULD_NOT_START = 3
+
+_RESULT_TEXT = {
+    XRV_OK: "XRV_OK",
+    XRV_ERROR: "XRV_ERROR",
+    XRV_TIMEOUT: "XRV_TIMEOUT",
+    XRV_SYNC_COULD_NOT_START: "XRV_SYNC_COULD_NOT_START",
+}
+
+# Output rates supported by the Movella DOT
+OUTPUT_RATES = (1, 4, 10, 12, 15, 20, 30, 60, 120)
+
+# Recording export data selection, used by movelladot_pc_sdk_data_export.py
+RecordingData_Timestamp = 0
+RecordingData_Euler = 1
+RecordingData_Quaternion = 2
+RecordingData_Acceleration = 3
+RecordingData_AngularVelocity = 4
+RecordingData_MagneticField = 5
+RecordingData_Status = 6
+
+
+class SimulationConfig:
+    """
+    Parameters of the simulated sensors, see configure()
+    """
+    def __init__(self):
+        self.sensors = 5
+        self.output_rate = 60
+        self.source = "synthetic"
+        self.jitter_ms = 1.0
+        self.loss_rate = 0.0
+        self.connect_delay_s = 0.05
+        self.connect_failure_rate = 0.0
+        self.connect_slots = None
+        self.advertisement_delay_s = 0.2
+        self.advertisement_repeat_s = None
+        self.sync_delay_s = 0.0
+        self.start_time_fine = None
+        self.seed = None
+        self.usb_devices = 0
+        self.recordings = 2
+        self.recording_seconds = 60.0
+        self.export_rate = 2000
+
+
+config = SimulationConfig()
+
+
+def configure(**kwargs):
+    """
+    Changes the simulation parameters, affects managers created afterwards
+
+    Parameters:
+        sensors: The number of simulated Movella DOTs (1-20)
+        output_rate: The initial output rate in Hz, devices accept setOutputRate() as usual
+        source: "synthetic", "replay" (the logfile_*.csv captures next to this module) or a list of capture paths
+        jitter_ms: Standard deviation of the delivery delay of a packet in milliseconds
+        loss_rate: Probability that a packet is lost (its sampleTimeFine is skipped)
+        connect_delay_s: Mean time openPort() takes
+        connect_failure_rate: Probability that openPort() fails
+        connect_slots: The number of openPort() calls the Bluetooth adapter serves at the same time, None for no limit
+        advertisement_delay_s: Maximum delay before a device is first advertised after enableDeviceDetection()
+        advertisement_repeat_s: Interval of repeated advertisements of a device, None advertises each device once
+        sync_delay_s: Time startSync() takes, the real devices need at least 14 seconds
+        start_time_fine: sampleTimeFine of the first sample, None picks a random value per device
+        seed: Seed for the random generators, None for a random seed
+        usb_devices: The number of Movella DOTs docked over USB (0-20), returned by detectUsbDevices()
+        recordings: The number of onboard recordings on each USB device
+        recording_seconds: The duration of each onboard recording, recorded at output_rate
+        export_rate: The number of recorded packets per second a USB device delivers while exporting
+    """
+    for key, value in kwargs.items():
+        if not hasattr(config, key):
+            raise TypeError(f"Unknown simulation parameter '{key}'")
+        setattr(config, key, value)
+    if not 1 <= config.sensors <= 20:
+        raise ValueError(f"The simulation supports 1 to 20 sensors, got {config.sensors}")
+    if not 0 <= config.usb_devices <= 20:
+        raise ValueError(f"The simulation supports 0 to 20 USB devices, got {config.usb_devices}")
+    if config.output_rate not in OUTPUT_RATES:
+        raise ValueError(f"Unsupported output rate {config.output_rate}, expected one of {OUTPUT_RATES}")
+
+
+def install():
+    """
+    Registers this module as movelladot_pc_sdk, so `import movelladot_pc_sdk` picks up the simulation
+    """
+    sys.modules["movelladot_pc_sdk"] = sys.modules[__name__]
+
+
+def XsTimeStamp_nowMs():
+    return int(time.time() * 1000)
+
+
+def XsResultValueToString(result):
+    return _RESULT_TEXT.get(result, f"XRV_{result}")
+
+
+def XsDotFirmwareUpdateResultToString(result):
+    return "Success" if result == XRV_OK else "Failed"
+
+
+class XsString(str):
+    def toXsString(self):
+        return str(self)
+
+
+class XsVersion:
+    def __init__(self, major=2023, minor=6, revision=0):
+        self.__text = f"{major}.{minor}.{revision}-sim"
+
+    def _set(self, text):
+        self.__text = text
+
+    def toXsString(self):
+        return self.__text
+
+
+def xsdotsdkDllVersion(version):
+    version._set("2023.6.0-sim")
+
+
+class XsIntArray(list):
+    def push_back(self, value):
+        self.append(value)
+
+
+class XsEuler:
+    def __init__(self, roll, pitch, yaw):
+        self.__values = (roll, pitch, yaw)
+
+    def x(self):
+        return self.__values[0]
+
+    def y(self):
+        return self.__values[1]
+
+    def z(self):
+        return self.__values[2]
+
+    def __getitem__(self, index):
+        return self.__values[index]
+
+
+class XsDeviceId:
+    def __init__(self, value):
+        self.__value = value
+
+    def toXsString(self):
+        return self.__value
+
+    def __eq__(self, other):
+        return isinstance(other, XsDeviceId) and other.toXsString() == self.__value
+
+    def __hash__(self):
+        return hash(self.__value)
+
+
+class XsFilterProfile:
+    def __init__(self, label):
+        self.__label = label
+
+    def label(self):
+        return XsString(self.__label)
+
+    def type(self):
+        return 0
+
+
+class XsPortInfo:
+    """
+    Information on a detected device, as passed to onAdvertisementFound
+    """
+    def __init__(self, address="", deviceId=None, rssi=-60, portName=""):
+        self.__address = address
+        self.__deviceId = deviceId if deviceId is not None else XsDeviceId(address.replace(":", ""))
+        self.__rssi = rssi
+        self.__portName = portName
+
+    def isBluetooth(self):
+        return bool(self.__address)
+
+    def bluetoothAddress(self):
+        return self.__address
+
+    def deviceId(self):
+        return self.__deviceId
+
+    def portName(self):
+        return self.__portName
+
+    def baudrate(self):
+        return 0
+
+    def rssi(self):
+        return self.__rssi
+
+    def empty(self):
+        return not self.__address and not self.__portName
+
+
+class XsRecordingInfo:
+    """
+    Information on an onboard recording of a USB device, see XsDotUsbDevice.getRecordingInfo
+    """
+    def __init__(self, storageSize=0, totalRecordingTime=0):
+        self.__storageSize = storageSize
+        self.__totalRecordingTime = totalRecordingTime
+
+    def storageSize(self):
+        return self.__storageSize
+
+    def totalRecordingTime(self):
+        return self.__totalRecordingTime
+
+    def empty(self):
+        return self.__storageSize == 0
+
+
+class XsDataPacket:
+    """
+    A live data packet, XsDataPacket(other) makes a copy as in the SDK
+    """
+    __slots__ = ("_sampleTimeFine", "_quat", "_freeAcc", "_acc", "_gyro")
+
+    def __init__(self, other=None, sampleTimeFine=0, quat=(1.0, 0.0, 0.0, 0.0), freeAcc=(0.0, 0.0, 0.0),
+                 acc=(0.0, 0.0, GRAVITY), gyro=(0.0, 0.0, 0.0)):
+        if other is not None:
+            sampleTimeFine, quat, freeAcc, acc, gyro = other._sampleTimeFine, other._quat, other._freeAcc, other._acc, other._gyro
+        self._sampleTimeFine = sampleTimeFine
+        self._quat = quat
+        self._freeAcc = freeAcc
+        self._acc = acc
+        self._gyro = gyro
+
+    def sampleTimeFine(self):
+        return self._sampleTimeFine
+
+    def containsSampleTimeFine(self):
+        return True
+
+    def containsOrientation(self):
+        return True
+
+    def containsFreeAcceleration(self):
+        return True
+
+    def containsCalibratedAcceleration(self):
+        return True
+
+    def containsCalibratedGyroscopeData(self):
+        return True
+
+    def containsCalibratedMagneticField(self):
+        # The simulated payload modes do not include the magnetometer
+        return False
+
+    def orientationQuaternion(self):
+        return self._quat
+
+    def orientationEuler(self):
+        w, x, y, z = self._quat
+        roll = math.atan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+        pitch = math.asin(max(-1.0, min(1.0, 2 * (w * y - z * x))))
+        yaw = math.atan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+        return XsEuler(math.degrees(roll), math.degrees(pitch), math.degrees(yaw))
+
+    def freeAcceleration(self):
+        return self._freeAcc
+
+    def calibratedAcceleration(self):
+        return self._acc
+
+    def calibratedGyroscopeData(self):
+        return self._gyro
+
+    def calibratedMagneticField(self):
+        return (0.0, 0.0, 0.0)
+
+
+class XsDotCallback:
+    """
+    Base class of the callback handler, all callbacks default to doing nothing
+    """
+    def __init__(self):
+        pass
+
+    def onAdvertisementFound(self, port_info):
+        pass
+
+    def onBatteryUpdated(self, device, batteryLevel, chargingStatus):
+        pass
+
+    def onError(self, result, errorString):
+        pass
+
+    def onLiveDataAvailable(self, device, packet):
+        pass
+
+    def onProgressUpdated(self, device, current, total, identifier):
+        pass
+
+    def onDeviceUpdateDone(self, portInfo, result):
+        pass
+
+    def onRecordingStopped(self, device):
+        pass
+
+    def onDeviceStateChanged(self, device, newState, oldState):
+        pass
+
+    def onButtonClicked(self, device, timestamp):
+        pass
+
+    def onRecordedDataAvailable(self, device, packet):
+        pass
+
+    def onRecordedDataDone(self, device):
+        pass
+
+
+def _quatMultiply(a, b):
+    w1, x1, y1, z1 = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    w2, x2, y2, z2 = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    return np.stack([w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+                     w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+                     w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+                     w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2], axis=-1)
+
+
+def _rotateToSensor(quat, vectors):
+    """
+    Rotates world frame vectors into the sensor frame of the orientations quat (N×4, N×3)
+    """
+    conj = quat * np.array([1.0, -1.0, -1.0, -1.0])
+    v = np.concatenate([np.zeros((len(vectors), 1)), vectors], axis=1)
+    return _quatMultiply(_quatMultiply(conj, v), quat)[:, 1:]
+
+
+def _gyroFromQuaternions(quat, dt):
+    """
+    Angular velocity in the sensor frame [deg/s] from consecutive orientations that are dt seconds apart
+    """
+    conj = quat[:-1] * np.array([1.0, -1.0, -1.0, -1.0])
+    delta = _quatMultiply(conj, quat[1:])
+    delta *= np.sign(delta[:, :1] + 1e-12)
+    angle = 2.0 * np.arccos(np.clip(delta[:, 0], -1.0, 1.0))
+    sinHalf = np.sqrt(np.maximum(1.0 - delta[:, 0] ** 2, 1e-18))
+    axis = delta[:, 1:] / sinHalf[:, None]
+    gyro = np.degrees(axis * (angle / dt)[:, None])
+    return np.concatenate([gyro, gyro[-1:]], axis=0)
+
+
+def _syntheticSignal(rate, seconds, rng):
+    """
+    A smooth random rotation with sensor noise: returns quat (N×4), free acceleration,
+    calibrated acceleration, gyroscope (N×3) and which samples are present (all of them)
+    """
+    n = int(rate * seconds)
+    t = np.arange(n) / rate
+    # Angular velocity as a sum of slow sinusoids per axis [rad/s]
+    omega = np.zeros((n, 3))
+    for axis in range(3):
+        for _ in range(3):
+            omega[:, axis] += rng.uniform(0.1, 0.8) * np.sin(2 * np.pi * rng.uniform(0.05, 0.5) * t + rng.uniform(0, 2 * np.pi))
+
+    quat = np.empty((n, 4))
+    q = np.array([1.0, 0.0, 0.0, 0.0])
+    for i in range(n):
+        quat[i] = q
+        angle = np.linalg.norm(omega[i]) / rate
+        if angle > 0:
+            axis = omega[i] / np.linalg.norm(omega[i])
+            dq = np.concatenate([[math.cos(angle / 2)], axis * math.sin(angle / 2)])
+            q = _quatMultiply(q, dq)
+            q /= np.linalg.norm(q)
+
+    freeAcc = 0.3 * np.sin(2 * np.pi * 0.7 * t)[:, None] * rng.normal(size=(1, 3)) + rng.normal(0, 0.02, (n, 3))
+    acc = _rotateToSensor(quat, freeAcc + np.array([0.0, 0.0, GRAVITY])) + rng.normal(0, 0.05, (n, 3))
+    gyro = np.degrees(omega) + rng.normal(0, 0.1, (n, 3))
+    return quat, freeAcc, acc, gyro, np.ones(n, dtype=bool)
+
+
+def _captureFiles():
+    return sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "logfile_*.csv")))
+
+
+def _replaySignal(path):
+    """
+    Reads a logfile_*.csv capture: returns (quat (N×4), free acceleration, calibrated acceleration,
+    gyroscope (N×3), which samples are present) and the output rate of the capture, or None if the
+    capture holds no samples
+
+    Samples that are missing in the capture (gaps in SampleTimeFine) are marked as not present,
+    so the replay loses the same packets as the original session.
+    """
+    header, samples = logfile.load(path)
+    if len(samples) < 2 or "Quat_W" not in header.columns:
+        return None
+
+    timestamps = samples["SampleTimeFine"].astype(np.float64)
+    step = np.median(np.diff(timestamps))
+    index = np.round((timestamps - timestamps[0]) / step).astype(np.int64)
+    data = np.stack([samples[name] for name in ("Quat_W", "Quat_X", "Quat_Y", "Quat_Z",
+                                                "FreeAcc_X", "FreeAcc_Y", "FreeAcc_Z")], axis=1)
+    quat = data[:, :4] / np.linalg.norm(data[:, :4], axis=1, keepdims=True)
+    freeAcc = data[:, 4:]
+    acc = _rotateToSensor(quat, freeAcc + np.array([0.0, 0.0, GRAVITY]))
+    # The capture rate follows from the OutputRate in the metadata, the gaps from the sample index
+    rate = header.outputRate or 60.0
+    gyro = _gyroFromQuaternions(quat, np.maximum(np.diff(index), 1) / rate)
+
+    n = index[-1] + 1
+    present = np.zeros(n, dtype=bool)
+    present[index] = True
+    signal = []
+    for values in (quat, freeAcc, acc, gyro):
+        full = np.zeros((n, values.shape[1]))
+        full[index] = values
+        signal.append(full)
+    return (signal[0], signal[1], signal[2], signal[3], present), rate
+
+
+def _resample(signal, captureRate, rate):
+    """
+    Resamples a capture from captureRate to the output rate of the device, so it replays in real time
+    Linear between the neighbouring capture samples (the quaternions normalized again), a sample is
+    present only if the capture samples it is made of are
+    """
+    quat, freeAcc, acc, gyro, present = signal
+    if rate == captureRate:
+        return signal
+    n = int((len(quat) - 1) * rate / captureRate) + 1
+    position = np.arange(n) * (captureRate / rate)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, len(quat) - 1)
+    weight = (position - lower)[:, None]
+
+    # q and -q are the same orientation, interpolate towards the nearer one
+    sign = np.where(np.sum(quat[lower] * quat[upper], axis=1, keepdims=True) < 0, -1.0, 1.0)
+    resampledQuat = quat[lower] * (1.0 - weight) + quat[upper] * sign * weight
+    norm = np.linalg.norm(resampledQuat, axis=1, keepdims=True)
+    resampledQuat /= np.where(norm > 0, norm, 1.0)
+    resampled = [resampledQuat]
+    for values in (freeAcc, acc, gyro):
+        resampled.append(values[lower] * (1.0 - weight) + values[upper] * weight)
+    resampledPresent = present[lower] & ((weight[:, 0] == 0) | present[upper])
+    return resampled[0], resampled[1], resampled[2], resampled[3], resampledPresent
+
+
+class XsDotDevice:
+    """
+    A simulated Movella DOT connected over Bluetooth
+    """
+    def __init__(self, manager, portInfo, index, rng):
+        self.__manager = manager
+        self.__portInfo = portInfo
+        self.__index = index
+        self.__rng = rng
+        self.__tagName = f"DOT{index + 1}"
+        self.__outputRate = config.output_rate
+        self.__filterProfile = "General"
+        self.__connected = True
+        self.__measuring = False
+        self.__lastResult = XRV_OK
+        self.__signal = None
+        self.__sample = 0
+        start = config.start_time_fine
+        self.__timeFineStart = rng.randrange(1 << 32) if start is None else start
+        # (perf_counter time, sampleTimeFine) of the common clock while the device is synchronized
+        self.__sync = None
+        # The device clock keeps running while it does not measure: perf_counter time it stopped,
+        # and until when a dropped connection can not be restored
+        self.__stoppedAt = None
+        self.__reachableAt = 0.0
+        # Until this perf_counter time the device measures without sending packets, see simulateSilence
+        self.__silentUntil = 0.0
+        # Incremented by every startMeasurement, so the streamer drops the schedule of an earlier measurement
+        self._generation = 0
+        # Stands in for the SWIG pointer that XdpcHandler uses as identity
+        self.this = id(self)
+
+    def bluetoothAddress(self):
+        return self.__portInfo.bluetoothAddress()
+
+    def portInfo(self):
+        return self.__portInfo
+
+    def deviceId(self):
+        return self.__portInfo.deviceId()
+
+    def deviceTagName(self):
+        return self.__tagName
+
+    def setDeviceTagName(self, name):
+        self.__tagName = name
+        return True
+
+    def productCode(self):
+        return "XS-T01"
+
+    def firmwareVersion(self):
+        return XsString("3.0.0")
+
+    def lastResult(self):
+        return self.__lastResult
+
+    def lastResultText(self):
+        return XsResultValueToString(self.__lastResult)
+
+    def isConnected(self):
+        return self.__connected
+
+    def reconnect(self):
+        if not self._reachable():
+            self.__lastResult = XRV_TIMEOUT
+            return False
+        self.__connected = True
+        return True
+
+    def outputRate(self):
+        return self.__outputRate
+
+    def setOutputRate(self, rate):
+        # The device rejects settings changes while it measures
+        if self.__measuring or rate not in OUTPUT_RATES:
+            self.__lastResult = XRV_ERROR
+            return False
+        self.__outputRate = rate
+        self.__signal = None
+        return True
+
+    def onboardFilterProfile(self):
+        return XsFilterProfile(self.__filterProfile)
+
+    def setOnboardFilterProfile(self, profile):
+        if not isinstance(profile, str):
+            # SWIG only converts a label string, e.g. not the XsFilterProfile onboardFilterProfile returns
+            raise TypeError("in method 'XsDotDevice_setOnboardFilterProfile', argument 2 of type 'XsString const &'")
+        if self.__measuring:
+            self.__lastResult = XRV_ERROR
+            return False
+        self.__filterProfile = profile
+        return True
+
+    def setLogOptions(self, options):
+        return True
+
+    def enableLogging(self, filename):
+        return True
+
+    def disableLogging(self):
+        return True
+
+    def isMeasuring(self):
+        return self.__measuring
+
+    def startMeasurement(self, payloadMode):
+        if not self.__connected or self.__measuring:
+            self.__lastResult = XRV_ERROR
+            return False
+        if self.__signal is None:
+            self.__signal = self.__manager._signalFor(self.__index, self.__outputRate)
+        start = None
+        if self.__sync is not None:
+            # Synchronized devices sample on the grid of the common clock and share its sampleTimeFine
+            epoch, timeFine = self.__sync
+            k = math.ceil((time.perf_counter() - epoch) * self.__outputRate)
+            self.__timeFineStart = (timeFine + round(k * 1000000 / self.__outputRate)) & 0xFFFFFFFF
+            self.__sample = 0
+            start = epoch + k / self.__outputRate
+        elif self.__stoppedAt is not None:
+            self.__sample += round((time.perf_counter() - self.__stoppedAt) * self.__outputRate)
+        self.__stoppedAt = None
+        self.__measuring = True
+        self._generation += 1
+        self.__manager._streamer().add(self, start)
+        return True
+
+    def stopMeasurement(self):
+        if self.__measuring:
+            self.__stoppedAt = time.perf_counter()
+        self.__measuring = False
+        # Restarting the measurement brings a silent device back
+        self.__silentUntil = 0.0
+        return True
+
+    def _sync(self, clock):
+        self.__sync = clock
+
+    def _disconnect(self, unreachableSeconds=0.0):
+        if self.__measuring:
+            self.__stoppedAt = time.perf_counter()
+        self.__connected = False
+        self.__measuring = False
+        self.__reachableAt = time.perf_counter() + unreachableSeconds
+
+    def _reachable(self):
+        return time.perf_counter() >= self.__reachableAt
+
+    def _silence(self, seconds):
+        self.__silentUntil = time.perf_counter() + seconds
+
+    def _nextPacket(self):
+        """
+        Produces the next sample, returns None if it is lost on the simulated radio link
+        """
+        quat, freeAcc, acc, gyro, present = self.__signal
+        i = self.__sample % len(quat)
+        # sampleTimeFine counts microseconds and wraps around at 32 bits
+        timeFine = (self.__timeFineStart + round(self.__sample * 1000000 / self.__outputRate)) & 0xFFFFFFFF
+        self.__sample += 1
+        if time.perf_counter() < self.__silentUntil:
+            return None
+        if not present[i] or (config.loss_rate and self.__rng.random() < config.loss_rate):
+            return None
+        return XsDataPacket(sampleTimeFine=timeFine, quat=tuple(quat[i]), freeAcc=tuple(freeAcc[i]),
+                            acc=tuple(acc[i]), gyro=tuple(gyro[i]))
+
+
+class XsDotUsbDevice:
+    """
+    A simulated Movella DOT docked over USB, exports its onboard recordings on its own thread
+    """
+    # Flash storage taken by one recorded sample
+    RECORDED_BYTES_PER_SAMPLE = 40
+
+    _EXPORT_COLUMNS = {
+        RecordingData_Timestamp: ("SampleTimeFine",),
+        RecordingData_Euler: ("Euler_X", "Euler_Y", "Euler_Z"),
+        RecordingData_Quaternion: ("Quat_W", "Quat_X", "Quat_Y", "Quat_Z"),
+        RecordingData_Acceleration: ("Acc_X", "Acc_Y", "Acc_Z"),
+        RecordingData_AngularVelocity: ("Gyr_X", "Gyr_Y", "Gyr_Z"),
+        RecordingData_MagneticField: ("Mag_X", "Mag_Y", "Mag_Z"),
+        RecordingData_Status: ("Status",),
+    }
+
+    def __init__(self, manager, portInfo, index):
+        self.__manager = manager
+        self.__portInfo = portInfo
+        self.__index = index
+        self.__recordingSamples = [int(config.recording_seconds * config.output_rate)] * config.recordings
+        self.__exportData = []
+        self.__logPath = None
+        self.__lastResult = XRV_OK
+        self.__exporter = None
+        self.__exporting = False
+        self.__stopExport = threading.Event()
+        self.this = id(self)
+
+    def deviceId(self):
+        return self.__portInfo.deviceId()
+
+    def productCode(self):
+        return "XS-T01"
+
+    def portInfo(self):
+        return self.__portInfo
+
+    def lastResult(self):
+        return self.__lastResult
+
+    def lastResultText(self):
+        return XsResultValueToString(self.__lastResult)
+
+    def recordingCount(self):
+        return len(self.__recordingSamples)
+
+    def getRecordingInfo(self, recordingIndex):
+        if not 1 <= recordingIndex <= len(self.__recordingSamples):
+            self.__lastResult = XRV_ERROR
+            return XsRecordingInfo()
+        samples = self.__recordingSamples[recordingIndex - 1]
+        return XsRecordingInfo(samples * self.RECORDED_BYTES_PER_SAMPLE, samples // config.output_rate)
+
+    def selectExportData(self, exportData):
+        self.__exportData = [data for data in exportData if data in self._EXPORT_COLUMNS]
+        return True
+
+    def enableLogging(self, filename):
+        self.__logPath = filename
+        return True
+
+    def disableLogging(self):
+        self.__logPath = None
+        return True
+
+    def startExportRecording(self, recordingIndex):
+        if self.__exporting:
+            self.__lastResult = XRV_ERROR
+            return False
+        if not 1 <= recordingIndex <= len(self.__recordingSamples):
+            self.__lastResult = XRV_ERROR
+            return False
+        self.__stopExport.clear()
+        self.__exporting = True
+        self.__exporter = threading.Thread(target=self.__export, args=(recordingIndex, self.__logPath),
+                                           name=f"movelladot_sim export {self.deviceId().toXsString()}", daemon=True)
+        self.__exporter.start()
+        self.__lastResult = XRV_OK
+        return True
+
+    def stopExportRecording(self):
+        self.__stopExport.set()
+        return True
+
+    def _close(self):
+        self.__stopExport.set()
+        if self.__exporter is not None:
+            self.__exporter.join()
+            self.__exporter = None
+
+    def __export(self, recordingIndex, logPath):
+        """
+        Delivers the recorded packets in batches at export_rate, writing the selected columns to logPath
+        """
+        quat, freeAcc, acc, gyro, _ = self.__manager._signalFor(self.__index, config.output_rate)
+        total = self.__recordingSamples[recordingIndex - 1]
+        columns = [name for data in self.__exportData for name in self._EXPORT_COLUMNS[data]]
+        log = open(logPath, "w") if logPath else None
+        if log is not None:
+            log.write("PacketCounter," + ",".join(columns) + "\n")
+        batch = max(1, config.export_rate // 100)
+        start = time.perf_counter()
+        sample = 0
+        while sample < total and not self.__stopExport.is_set():
+            delay = start + sample / config.export_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            rows = []
+            for n in range(sample, min(sample + batch, total)):
+                i = n % len(quat)
+                packet = XsDataPacket(sampleTimeFine=round(n * 1000000 / config.output_rate) & 0xFFFFFFFF,
+                                      quat=tuple(quat[i]), freeAcc=tuple(freeAcc[i]), acc=tuple(acc[i]),
+                                      gyro=tuple(gyro[i]))
+                for handler in self.__manager._handlers():
+                    handler.onRecordedDataAvailable(self, packet)
+                if log is not None:
+                    rows.append(self.__row(n, packet))
+            sample = min(sample + batch, total)
+            if log is not None:
+                log.writelines(rows)
+            for handler in self.__manager._handlers():
+                handler.onProgressUpdated(self, sample, total, logPath)
+        if log is not None:
+            log.close()
+        # The next export can be started from the done callback
+        self.__exporting = False
+        for handler in self.__manager._handlers():
+            handler.onRecordedDataDone(self)
+
+    def __row(self, counter, packet):
+        values = [counter]
+        for data in self.__exportData:
+            if data == RecordingData_Timestamp:
+                values.append(packet.sampleTimeFine())
+            elif data == RecordingData_Euler:
+                euler = packet.orientationEuler()
+                values.extend((euler.x(), euler.y(), euler.z()))
+            elif data == RecordingData_Quaternion:
+                values.extend(packet.orientationQuaternion())
+            elif data == RecordingData_Acceleration:
+                values.extend(packet.calibratedAcceleration())
+            elif data == RecordingData_AngularVelocity:
+                values.extend(packet.calibratedGyroscopeData())
+            elif data == RecordingData_MagneticField:
+                values.extend(packet.calibratedMagneticField())
+            else:
+                values.append(0)
+        return ",".join(f"{value:.6f}" if isinstance(value, float) else str(value) for value in values) + "\n"
+
+
+class _Streamer(threading.Thread):
+    """
+    The callback thread: delivers the live packets of all measuring devices in time order
+    """
+    def __init__(self, manager, rng):
+        threading.Thread.__init__(self, name="movelladot_sim callbacks", daemon=True)
+        self.__manager = manager
+        self.__rng = rng
+        self.__condition = threading.Condition()
+        self.__queue = []
+        self.__sequence = 0
+        self.__running = True
+
+    def add(self, device, start=None):
+        with self.__condition:
+            if start is None:
+                start = time.perf_counter()
+            self.__push(start, start, 0, device, device._generation)
+            self.__condition.notify()
+
+    def stop(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+
+    def __push(self, delivery, start, sample, device, generation):
+        self.__sequence += 1
+        heapq.heappush(self.__queue, (delivery, self.__sequence, start, sample, device, generation))
+
+    def run(self):
+        while True:
+            with self.__condition:
+                while self.__running and not self.__queue:
+                    self.__condition.wait()
+                if not self.__running:
+                    return
+                delivery, _, start, sample, device, generation = self.__queue[0]
+                delay = delivery - time.perf_counter()
+                if delay > 0:
+                    self.__condition.wait(delay)
+                    continue
+                heapq.heappop(self.__queue)
+                if not device.isMeasuring() or generation != device._generation:
+                    continue
+                # Schedule the next sample: nominal time plus a positive delivery delay,
+                # never before the previous delivery so the order per device is kept
+                nominal = start + (sample + 1) / device.outputRate()
+                jitter = abs(self.__rng.gauss(0.0, config.jitter_ms / 1000.0)) if config.jitter_ms else 0.0
+                self.__push(max(nominal + jitter, delivery), start, sample + 1, device, generation)
+
+            packet = device._nextPacket()
+            if packet is not None:
+                for handler in self.__manager._handlers():
+                    handler.onLiveDataAvailable(device, packet)
+
+
+class XsDotConnectionManager:
+    """
+    Discovers and connects the simulated devices
+    """
+    def __init__(self):
+        self.__rng = random.Random(config.seed)
+        self.__callbackHandlers = list()
+        self.__ports = [XsPortInfo(f"D4:22:CD:00:{0x7C + i // 256:02X}:{i % 256:02X}", rssi=self.__rng.randint(-90, -40))
+                        for i in range(config.sensors)]
+        self.__usbPorts = [XsPortInfo(deviceId=XsDeviceId(f"D422CD01{i:04X}"), portName=f"COM{i + 3}")
+                           for i in range(config.usb_devices)]
+        self.__devices = dict()
+        self.__usbDevices = dict()
+        # Device ID -> perf_counter time until which a powered down device can not be opened
+        self.__unreachable = dict()
+        self.__signals = dict()
+        # (signal, output rate) of each capture to replay, parsed once on first use
+        self.__captures = None
+        self.__signalLock = threading.Lock()
+        self.__lastResult = XRV_OK
+        self.__connectSlots = threading.Semaphore(config.connect_slots) if config.connect_slots else None
+        self.__stopDetection = threading.Event()
+        self.__detector = None
+        self.__streamerThread = None
+
+    def _handlers(self):
+        return list(self.__callbackHandlers)
+
+    def _streamer(self):
+        if self.__streamerThread is None:
+            self.__streamerThread = _Streamer(self, random.Random(self.__rng.random()))
+            self.__streamerThread.start()
+        return self.__streamerThread
+
+    def _signalFor(self, index, rate):
+        key = (index, rate)
+        # Devices start measuring from several threads (the supervisor, the USB exports)
+        with self.__signalLock:
+            if key not in self.__signals:
+                if config.source == "synthetic":
+                    rng = np.random.default_rng(None if config.seed is None else config.seed + index)
+                    self.__signals[key] = _syntheticSignal(rate, 60, rng)
+                else:
+                    captures = self.__replayCaptures()
+                    signal, captureRate = captures[index % len(captures)]
+                    self.__signals[key] = _resample(signal, captureRate, rate)
+            return self.__signals[key]
+
+    def __replayCaptures(self):
+        if self.__captures is None:
+            files = _captureFiles() if config.source == "replay" else list(config.source)
+            captures = [capture for capture in (_replaySignal(path) for path in files) if capture is not None]
+            if not captures:
+                raise ValueError("No capture with samples found to replay")
+            self.__captures = captures
+        return self.__captures
+
+    def addXsDotCallbackHandler(self, handler):
+        self.__callbackHandlers.append(handler)
+
+    def removeXsDotCallbackHandler(self, handler):
+        self.__callbackHandlers.remove(handler)
+
+    def lastResult(self):
+        return self.__lastResult
+
+    def lastResultText(self):
+        return XsResultValueToString(self.__lastResult)
+
+    def enableDeviceDetection(self):
+        self.__stopDetection.clear()
+        self.__detector = threading.Thread(target=self.__advertise, name="movelladot_sim advertisements", daemon=True)
+        self.__detector.start()
+        return True
+
+    def disableDeviceDetection(self):
+        self.__stopDetection.set()
+        if self.__detector is not None:
+            self.__detector.join()
+            self.__detector = None
+
+    def __advertise(self):
+        # Every device advertises for the first time after a random delay, and optionally repeats it
+        start = time.perf_counter()
+        nextAdvertisement = [self.__rng.uniform(0.0, config.advertisement_delay_s) for _ in self.__ports]
+        while not self.__stopDetection.wait(0.01):
+            now = time.perf_counter() - start
+            for i, port in enumerate(self.__ports):
+                if nextAdvertisement[i] is None or now < nextAdvertisement[i]:
+                    continue
+                nextAdvertisement[i] = None if config.advertisement_repeat_s is None else now + config.advertisement_repeat_s
+                for handler in self._handlers():
+                    handler.onAdvertisementFound(port)
+
+    def detectUsbDevices(self):
+        return list(self.__usbPorts)
+
+    def openPort(self, portInfo):
+        if not portInfo.isBluetooth():
+            return self.__openUsb(portInfo)
+        if self.__connectSlots is not None:
+            with self.__connectSlots:
+                return self.__openBluetooth(portInfo)
+        return self.__openBluetooth(portInfo)
+
+    def __openBluetooth(self, portInfo):
+        time.sleep(max(0.0, self.__rng.gauss(config.connect_delay_s, config.connect_delay_s / 4)))
+        if self.__rng.random() < config.connect_failure_rate:
+            self.__lastResult = XRV_TIMEOUT
+            return False
+
+        key = portInfo.deviceId().toXsString()
+        index = next((i for i, port in enumerate(self.__ports) if port.deviceId().toXsString() == key), None)
+        if index is None:
+            self.__lastResult = XRV_ERROR
+            return False
+        if time.perf_counter() < self.__unreachable.get(key, 0.0):
+            self.__lastResult = XRV_TIMEOUT
+            return False
+        device = self.__devices.get(key)
+        if device is None:
+            self.__devices[key] = XsDotDevice(self, self.__ports[index], index, random.Random(self.__rng.random()))
+        elif not device.reconnect():
+            self.__lastResult = XRV_TIMEOUT
+            return False
+        self.__lastResult = XRV_OK
+        return True
+
+    def __openUsb(self, portInfo):
+        key = portInfo.deviceId().toXsString()
+        index = next((i for i, port in enumerate(self.__usbPorts) if port.deviceId().toXsString() == key), None)
+        if index is None:
+            self.__lastResult = XRV_ERROR
+            return False
+        if key not in self.__usbDevices:
+            # Signals after the ones of the Bluetooth devices, so docked and live devices do not share one
+            self.__usbDevices[key] = XsDotUsbDevice(self, self.__usbPorts[index], len(self.__ports) + index)
+        self.__lastResult = XRV_OK
+        return True
+
+    def device(self, deviceId):
+        return self.__devices.get(deviceId.toXsString())
+
+    def usbDevice(self, deviceId):
+        return self.__usbDevices.get(deviceId.toXsString())
+
+    def startSync(self, rootAddress):
+        time.sleep(config.sync_delay_s)
+        clock = (time.perf_counter(), self.__rng.randrange(1 << 32))
+        for device in self.__devices.values():
+            device._sync(clock)
+        self.__lastResult = XRV_OK
+        return True
+
+    def stopSync(self):
+        for device in self.__devices.values():
+            device._sync(None)
+        return True
+
+    def close(self):
+        if self.__streamerThread is not None:
+            self.__streamerThread.stop()
+            self.__streamerThread.join()
+            self.__streamerThread = None
+        for device in self.__devices.values():
+            device.stopMeasurement()
+            for handler in self._handlers():
+                handler.onDeviceStateChanged(device, XDS_Destructing, XDS_Measurement)
+            device._disconnect()
+        self.__devices.clear()
+        for device in self.__usbDevices.values():
+            device._close()
+        self.__usbDevices.clear()
+
+    def simulateDisconnect(self, address, seconds=0.0, powerDown=False):
+        """
+        Simulation only: drops the connection of a device as if it went out of range
+
+        Parameters:
+            address: The bluetooth address of the device
+            seconds: The time until the device can be reached again (reconnect() and openPort() fail before)
+            powerDown: Report XDS_Destructing and forget the device, as when it is switched off, openPort()
+                       then creates a new device object
+        """
+        for key, device in list(self.__devices.items()):
+            if device.bluetoothAddress() == address:
+                device._disconnect(seconds)
+                if powerDown:
+                    del self.__devices[key]
+                    self.__unreachable[key] = time.perf_counter() + seconds
+                newState = XDS_Destructing if powerDown else XDS_Initial
+                for handler in self._handlers():
+                    handler.onDeviceStateChanged(device, newState, XDS_Measurement)
+
+    def simulateSilence(self, address, seconds):
+        """
+        Simulation only: the device stays connected and measuring but sends no packets for seconds,
+        or until its measurement is restarted
+
+        Parameters:
+            address: The bluetooth address of the device
+            seconds: The duration of the silence
+        """
+        for device in list(self.__devices.values()):
+            if device.bluetoothAddress() == address:
+                device._silence(seconds)
+
+if __name__ == "__main__":
+    # Runs one of the scripts of this repository against the simulation, e.g.
+    #   python movelladot_sim.py --sensors 5 --rate 120 movelladot_pc_sdk_synchronization.py
+    import argparse
+    import runpy
+
+    parser = argparse.ArgumentParser(description="Run a script against simulated Movella DOTs")
+    parser.add_argument("--sensors", type=int, default=config.sensors)
+    parser.add_argument("--rate", type=int, default=config.output_rate, choices=OUTPUT_RATES)
+    parser.add_argument("--source", default=config.source, help="synthetic, replay or a capture file")
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--loss-rate", type=float, default=config.loss_rate)
+    parser.add_argument("--seed", type=int, default=config.seed)
+    parser.add_argument("--usb-devices", type=int, default=config.usb_devices)
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    options = parser.parse_args()
+
+    source = options.source if options.source in ("synthetic", "replay") else [options.source]
+    configure(sensors=options.sensors, output_rate=options.rate, source=source, jitter_ms=options.jitter_ms,
+              loss_rate=options.loss_rate, seed=options.seed, usb_devices=options.usb_devices)
+    install()
+
+    sys.argv = [options.script] + options.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(options.script)))
+    runpy.run_path(options.script, run_name="__main__")
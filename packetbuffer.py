@@ -0,0 +1,117 @@
+#  Lock-free packet channel between the SDK callback thread and the readers of the XdpcHandler.
+#
+#  The SDK delivers live data on its own callback thread at the output rate of every connected
+#  Movella DOT. Each device gets a fixed capacity SpscChannel: the callback publishes a packet
+#  without taking a lock and without waiting for the reader, and when the reader falls behind the
+#  oldest packets are overwritten and counted as dropped.
+#
+
+
+class SpscChannel:
+    """
+    Single producer, single consumer ring buffer that needs no lock
+
+    Meant for the path from the SDK callback thread (the only producer) to the thread that
+    reads the packets (the only consumer). Publishing never waits for the reader.
+
+    Only operations CPython performs atomically are used: storing a tuple in a list slot
+    and rebinding an integer attribute. The producer writes (sequence number, item) into a
+    slot and then publishes it by advancing the write index, the consumer only advances the
+    read index. When the producer laps the consumer the oldest items are overwritten
+    (drop-oldest). The consumer notices this from the write index, skips ahead and counts
+    the lost items as dropped; a slot whose sequence number shows that it is being
+    overwritten ends the read, the consumer never waits for the producer.
+
+    Consumed slots are not cleared, because the consumer may not write to slots. A channel
+    therefore keeps up to capacity items alive.
+    """
+    def __init__(self, capacity):
+        """
+        Parameters:
+            capacity: The maximum number of items held by the channel, must be at least 1
+        """
+        if capacity < 1:
+            raise ValueError(f"Channel capacity must be at least 1, got {capacity}")
+
+        self.__slots = [None] * capacity
+        self.__capacity = capacity
+        self.__writeIndex = 0   # written by the producer only
+        self.__readIndex = 0    # written by the consumer only
+        self.__dropped = 0      # written by the consumer only
+
+    def __len__(self):
+        pending = self.__writeIndex - self.__readIndex
+        return pending if pending < self.__capacity else self.__capacity
+
+    def capacity(self):
+        """
+        Returns:
+             The maximum number of items the channel can hold
+        """
+        return self.__capacity
+
+    def dropped(self):
+        """
+        Returns:
+             The number of items the consumer lost because the producer overwrote them
+        """
+        # Items that are overwritten but not yet skipped by the consumer count as well
+        overrun = self.__writeIndex - self.__readIndex - self.__capacity
+        return self.__dropped + (overrun if overrun > 0 else 0)
+
+    def push(self, item):
+        """
+        Publishes an item, producer side only
+
+        Parameters:
+            item: The item to publish
+        """
+        index = self.__writeIndex
+        self.__slots[index % self.__capacity] = (index, item)
+        self.__writeIndex = index + 1
+
+    def pop(self):
+        """
+        Takes the oldest item, consumer side only
+
+        Returns:
+             The oldest item, or None if the channel is empty
+        """
+        items = self.popMany(1)
+        return items[0] if items else None
+
+    def popMany(self, maxCount=None):
+        """
+        Takes up to maxCount of the oldest items, consumer side only
+
+        Parameters:
+            maxCount: The maximum number of items to take, None takes all published items
+        Returns:
+             A list with the items, oldest first
+        """
+        items = []
+        readIndex = self.__readIndex
+        while maxCount is None or len(items) < maxCount:
+            writeIndex = self.__writeIndex
+            if readIndex == writeIndex:
+                break
+            if writeIndex - readIndex > self.__capacity:
+                self.__dropped += writeIndex - self.__capacity - readIndex
+                readIndex = writeIndex - self.__capacity
+
+            sequence, item = self.__slots[readIndex % self.__capacity]
+            if sequence != readIndex:
+                # Overwritten between reading the write index and reading the slot, and the producer did
+                # not publish the newer item yet. Return what was read instead of spinning until it does,
+                # the next call skips the overwritten items and counts them as dropped
+                break
+            items.append(item)
+            readIndex += 1
+        self.__readIndex = readIndex
+        return items
+
+    def clear(self):
+        """
+        Discards all published items, consumer side only
+        """
+        self.popMany()
@@ -0,0 +1,157 @@
+#  Vectorized quaternion math.
+#
+#  Quaternions are stored as (w, x, y, z), the order used by the Movella DOT SDK and the
+#  logfile captures. Every function accepts a whole block of quaternions as an N×4 NumPy
+#  array (a single quaternion of shape (4,) works as well) and processes it without a
+#  Python loop per sample.
+#
+
+import numpy as np
+
+
+def normalize(q):
+    """
+    Parameters:
+        q: Quaternions, N×4
+    Returns:
+         The unit quaternions, N×4
+    """
+    q = np.asarray(q, dtype=np.float64)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def slerp(q0, q1, t):
+    """
+    Spherical linear interpolation between two blocks of unit quaternions
+
+    Parameters:
+        q0: The start quaternions, N×4
+        q1: The end quaternions, N×4
+        t: The interpolation fractions, N values (or a scalar) where 0 gives q0 and 1 gives q1
+    Returns:
+         The interpolated unit quaternions, N×4, along the shortest path
+    """
+    q0 = np.asarray(q0, dtype=np.float64)
+    q1 = np.asarray(q1, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)[..., np.newaxis]
+
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    # q and -q are the same rotation, flip q1 to interpolate along the shorter arc
+    q1 = np.where(dot < 0.0, -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sinTheta = np.sin(theta)
+    # Nearly identical quaternions: sin(theta) -> 0, fall back to linear interpolation
+    linear = sinTheta < 1e-6
+    safeSin = np.where(linear, 1.0, sinTheta)
+    w0 = np.where(linear, 1.0 - t, np.sin((1.0 - t) * theta) / safeSin)
+    w1 = np.where(linear, t, np.sin(t * theta) / safeSin)
+    return normalize(w0 * q0 + w1 * q1)
+
+
+def conjugate(q):
+    """
+    Parameters:
+        q: Quaternions, N×4
+    Returns:
+         The conjugated quaternions (the inverse rotations for unit quaternions), N×4
+    """
+    q = np.array(q, dtype=np.float64)
+    q[..., 1:] *= -1.0
+    return q
+
+
+def multiply(q1, q2):
+    """
+    Hamilton product q1 * q2, i.e. the rotation q2 followed by q1
+
+    Parameters:
+        q1: Quaternions, N×4
+        q2: Quaternions, N×4 (or a single quaternion applied to every q1)
+    Returns:
+         The products, N×4
+    """
+    q1 = np.asarray(q1, dtype=np.float64)
+    q2 = np.asarray(q2, dtype=np.float64)
+    w1, x1, y1, z1 = q1[..., 0], q1[..., 1], q1[..., 2], q1[..., 3]
+    w2, x2, y2, z2 = q2[..., 0], q2[..., 1], q2[..., 2], q2[..., 3]
+    return np.stack((
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ), axis=-1)
+
+
+def relativeRotation(qa, qb):
+    """
+    The orientation of sensor b expressed in the frame of sensor a, e.g. a joint angle between two segments
+
+    Parameters:
+        qa: The orientations of sensor a, N×4
+        qb: The orientations of sensor b, N×4
+    Returns:
+         conj(qa) * qb, N×4
+    """
+    return multiply(conjugate(qa), qb)
+
+
+def toEuler(q, degrees=True):
+    """
+    Converts quaternions to roll (about x), pitch (about y) and yaw (about z), the XsEuler convention
+
+    Parameters:
+        q: Quaternions, N×4
+        degrees: Return degrees instead of radians
+    Returns:
+         The angles as N×3 columns roll, pitch, yaw
+    """
+    q = np.asarray(q, dtype=np.float64)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    roll = np.arctan2(2.0 * (w * x + y * z), 1.0 - 2.0 * (x * x + y * y))
+    # Clipping gives ±90° at the gimbal lock, as copysign(pi / 2, sinp) in the scalar version
+    pitch = np.arcsin(np.clip(2.0 * (w * y - z * x), -1.0, 1.0))
+    yaw = np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+    euler = np.stack((roll, pitch, yaw), axis=-1)
+    return np.degrees(euler) if degrees else euler
+
+
+def toMatrix(q):
+    """
+    Converts unit quaternions to rotation matrices
+
+    Parameters:
+        q: Quaternions, N×4
+    Returns:
+         The rotation matrices, N×3×3, that rotate sensor frame vectors into the global frame
+    """
+    q = np.asarray(q, dtype=np.float64)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+    matrix = np.empty(q.shape[:-1] + (3, 3))
+    matrix[..., 0, 0] = 1.0 - 2.0 * (yy + zz)
+    matrix[..., 0, 1] = 2.0 * (xy - wz)
+    matrix[..., 0, 2] = 2.0 * (xz + wy)
+    matrix[..., 1, 0] = 2.0 * (xy + wz)
+    matrix[..., 1, 1] = 1.0 - 2.0 * (xx + zz)
+    matrix[..., 1, 2] = 2.0 * (yz - wx)
+    matrix[..., 2, 0] = 2.0 * (xz - wy)
+    matrix[..., 2, 1] = 2.0 * (yz + wx)
+    matrix[..., 2, 2] = 1.0 - 2.0 * (xx + yy)
+    return matrix
+
+
+def rotate(q, v):
+    """
+    Rotates vectors from the sensor frame into the global frame
+
+    Parameters:
+        q: Unit quaternions, N×4
+        v: Vectors, N×3 (or a single vector rotated by every q)
+    Returns:
+         The rotated vectors, N×3
+    """
+    return np.einsum("...ij,...j->...i", toMatrix(q), np.asarray(v, dtype=np.float64))
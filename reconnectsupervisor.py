@@ -0,0 +1,261 @@
+#  Automatic reconnection of Movella DOTs that drop out during a measurement.
+#
+#  A BLE dropout used to end the stream of a device for the rest of the session: the handler only
+#  removed a powered down device, and scripts hand-rolled device.reconnect() in their read loops.
+#  The ReconnectSupervisor watches the devices from its own thread (connection state, the state
+#  change callbacks and optionally data silence). A device that dropped out is reconnected on a
+#  separate thread, so the others keep streaming, retrying with exponential backoff; once it is
+#  back its filter profile, output rate and payload mode are applied again, the measurement is
+#  restarted and the gap is recorded (and flagged in a running session recording).
+#
+
+import threading
+import time
+
+from connectscheduler import Backoff
+
+STREAMING = "streaming"
+RECONNECTING = "reconnecting"
+FAILED = "failed"
+
+
+class _Watched:
+    """
+    The settings and reconnection state of one supervised device
+    """
+    def __init__(self, address, device, portInfo, outputRate, filterProfile):
+        self.address = address
+        # None while the SDK destroyed the device object (powered down), openPort creates a new one
+        self.device = device
+        self.portInfo = portInfo
+        self.outputRate = outputRate
+        self.filterProfile = filterProfile
+        self.state = STREAMING
+        self.disconnects = 0
+        self.reconnects = 0
+        self.attempts = 0
+        self.downtime = 0.0
+        self.lostAt = None
+        self.error = None
+
+    def asDict(self):
+        return {"state": self.state, "disconnects": self.disconnects, "reconnects": self.reconnects,
+                "attempts": self.attempts, "downtime_s": self.downtime, "error": self.error}
+
+
+class ReconnectSupervisor:
+    """
+    Detects devices that lost their connection and brings them back into measurement
+    """
+    def __init__(self, handler, manager, payloadMode, checkInterval=0.5, silenceTimeout=None, backoff=None,
+                 maxAttempts=None, log=print):
+        """
+        Parameters:
+            handler: The XdpcHandler, its rebindDevice is called when a device is back and reconnectFailed
+                     when a device is given up
+            manager: The XsDotConnectionManager
+            payloadMode: The payload mode the measurement is restarted with
+            checkInterval: The interval in seconds at which the connection state of the devices is checked
+            silenceTimeout: Seconds without a packet after which a connected device is restarted too, None to disable
+            backoff: The connectscheduler.Backoff between reconnection attempts, None for Backoff(0.5, 8.0)
+            maxAttempts: The number of attempts before a device is given up, None to retry indefinitely
+            log: Called with the progress messages, None to stay silent
+        """
+        self.__handler = handler
+        self.__manager = manager
+        self.__payloadMode = payloadMode
+        self.__checkInterval = checkInterval
+        self.__silenceTimeout = silenceTimeout
+        self.__backoff = backoff or Backoff(0.5, 8.0)
+        self.__maxAttempts = maxAttempts
+        self.__log = log
+        self.__logLock = threading.Lock()
+        self.__watched = dict()
+        self.__gaps = []
+        self.__lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__reconnectThreads = []
+
+    def watch(self, address, device, portInfo, outputRate, filterProfile):
+        """
+        Supervises a device, the current settings are the ones applied again after a reconnection
+
+        Parameters:
+            address: The bluetooth address
+            device: The XsDotDevice
+            portInfo: The XsPortInfo the device was opened with, used when the SDK destroyed the device
+            outputRate: The output rate to apply again
+            filterProfile: The label of the onboard filter profile to apply again, None to leave it
+        """
+        with self.__lock:
+            self.__watched[address] = _Watched(address, device, portInfo, outputRate, filterProfile)
+
+    def start(self):
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name="ReconnectSupervisor", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops supervising, running reconnection attempts end after their current attempt
+        """
+        self.__stop.set()
+        self.__wake.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        for thread in self.__reconnectThreads:
+            thread.join()
+        self.__reconnectThreads = []
+
+    def supervises(self, address):
+        return address in self.__watched
+
+    def notifyStateChanged(self, address, destroyed=False):
+        """
+        Called from the SDK callback thread when a supervised device changed its state, only marks it
+        so the supervisor thread checks it right away
+
+        Parameters:
+            address: The bluetooth address
+            destroyed: True if the SDK is destroying the device object (XDS_Destructing)
+        """
+        watched = self.__watched.get(address)
+        if watched is None:
+            return
+        if destroyed:
+            watched.device = None
+        self.__wake.set()
+
+    def report(self):
+        """
+        Returns:
+             A dict mapping each supervised address to its state, the number of disconnects, reconnects
+             and reconnection attempts, the total downtime in seconds and the last error
+        """
+        with self.__lock:
+            return {address: watched.asDict() for address, watched in self.__watched.items()}
+
+    def gaps(self):
+        """
+        Returns:
+             A list with a dict per outage: the address, the perf_counter times the device was lost and
+             back, and the duration in seconds
+        """
+        with self.__lock:
+            return list(self.__gaps)
+
+    def __run(self):
+        while not self.__stop.is_set():
+            self.__wake.wait(self.__checkInterval)
+            self.__wake.clear()
+            for watched in list(self.__watched.values()):
+                if self.__stop.is_set():
+                    return
+                if watched.state == STREAMING and self.__lost(watched):
+                    self.__startReconnect(watched)
+
+    def __lost(self, watched):
+        """
+        Returns True if the device lost its connection or stopped delivering packets
+        """
+        device = watched.device
+        if device is None:
+            return True
+        if not device.isConnected():
+            return True
+        if self.__silenceTimeout is not None:
+            lastReceive = self.__handler.lastReceiveTime(watched.address)
+            return lastReceive is not None and time.perf_counter() - lastReceive > self.__silenceTimeout
+        return False
+
+    def __startReconnect(self, watched):
+        watched.state = RECONNECTING
+        watched.disconnects += 1
+        watched.lostAt = time.perf_counter()
+        device = watched.device
+        if device is not None and device.isConnected():
+            # Lost to the silence timeout, the outage started with the last packet
+            watched.lostAt = self.__handler.lastReceiveTime(watched.address) or watched.lostAt
+            self.__message(f"{watched.address} sent no data for {self.__silenceTimeout} s, restarting...")
+        else:
+            self.__message(f"{watched.address} connection lost, reconnecting...")
+        thread = threading.Thread(target=self.__reconnect, args=(watched,), name=f"reconnect {watched.address}",
+                                  daemon=True)
+        self.__reconnectThreads = [other for other in self.__reconnectThreads if other.is_alive()] + [thread]
+        thread.start()
+
+    def __reconnect(self, watched):
+        attempt = 0
+        while not self.__stop.is_set():
+            attempt += 1
+            watched.attempts += 1
+            try:
+                resumed = self.__resume(watched)
+            except Exception as error:
+                # A failing SDK call must not end the thread, the device would stay RECONNECTING for good
+                watched.error = f"{type(error).__name__}: {error}"
+                resumed = False
+            if resumed:
+                now = time.perf_counter()
+                with self.__lock:
+                    self.__gaps.append({"address": watched.address, "lost": watched.lostAt, "restored": now,
+                                        "seconds": now - watched.lostAt})
+                watched.downtime += now - watched.lostAt
+                watched.reconnects += 1
+                watched.error = None
+                watched.state = STREAMING
+                self.__message(f"{watched.address} reconnected after {now - watched.lostAt:.2f} s "
+                               f"({attempt} attempt(s))")
+                return
+            if self.__maxAttempts is not None and attempt >= self.__maxAttempts:
+                watched.state = FAILED
+                self.__message(f"{watched.address} could not be reconnected: {watched.error}")
+                self.__handler.reconnectFailed(watched.address)
+                return
+            self.__stop.wait(self.__backoff.delay(attempt))
+
+    def __resume(self, watched):
+        """
+        One reconnection attempt: connects, applies the settings and restarts the measurement
+        """
+        device = watched.device
+        if device is not None:
+            try:
+                if device.isConnected():
+                    # Lost to the silence timeout: the device still measures and rejects settings changes
+                    device.stopMeasurement()
+                elif not device.reconnect():
+                    device = None
+            except RuntimeError:
+                # The SWIG object no longer has a device behind it
+                device = None
+        if device is None:
+            if not self.__manager.openPort(watched.portInfo):
+                watched.error = self.__manager.lastResultText()
+                return False
+            device = self.__manager.device(watched.portInfo.deviceId())
+            if device is None:
+                watched.error = "The connection manager has no device for the port"
+                return False
+        watched.device = device
+
+        # Rebound before the measurement starts, so its first packet is taken for the known device
+        self.__handler.rebindDevice(watched.address, device)
+        if watched.filterProfile is not None and not device.setOnboardFilterProfile(watched.filterProfile):
+            watched.error = f"Setting filter profile failed: {device.lastResultText()}"
+            return False
+        if not device.setOutputRate(watched.outputRate):
+            watched.error = f"Setting output rate failed: {device.lastResultText()}"
+            return False
+        if not device.startMeasurement(self.__payloadMode):
+            watched.error = f"Starting measurement failed: {device.lastResultText()}"
+            return False
+        return True
+
+    def __message(self, message):
+        if self.__log is not None:
+            with self.__logLock:
+                self.__log(message)
@@ -0,0 +1,110 @@
+#  Packet loss and gap detection for the live data of a Movella DOT.
+#
+#  A DOT samples at its output rate and stamps every sample with sampleTimeFine, a 32 bit
+#  microsecond counter that wraps around about every 71 minutes. Samples lost on the BLE link
+#  show up as a sampleTimeFine step of several sample intervals. After a BLE stall the delayed
+#  samples arrive in a burst, which is visible in the host receive times.
+#
+
+SAMPLE_TIME_FINE_WRAP = 1 << 32
+
+
+class SequenceTracker:
+    """
+    Counts received, lost and out of order samples of a single device
+
+    add() is meant to be called by the single thread that receives the samples (the SDK callback),
+    report() may be called from any thread: it reads plain integers and floats, at worst it misses
+    the sample that is being added.
+    """
+    def __init__(self, outputRate, stallFactor=3.0):
+        """
+        Parameters:
+            outputRate: The output rate of the device in Hz, 0 or None when unknown (loss is not counted)
+            stallFactor: A host inter-arrival time of more than stallFactor sample intervals is a stall
+        """
+        self.__outputRate = outputRate
+        self.__interval = 1e6 / outputRate if outputRate else None
+        self.__stallSeconds = stallFactor / outputRate if outputRate else None
+
+        self.__received = 0
+        self.__lost = 0
+        self.__gaps = 0
+        self.__longestGap = 0
+        self.__outOfOrder = 0
+        self.__stalls = 0
+        self.__bursts = 0
+        self.__longestBurst = 0
+        # Length of the burst following the latest stall, None when not directly after a stall
+        self.__burst = None
+
+        self.__lastSampleTimeFine = None
+        self.__firstReceiveTime = None
+        self.__lastReceiveTime = None
+
+    def add(self, sampleTimeFine, receiveTime):
+        """
+        Parameters:
+            sampleTimeFine: The sampleTimeFine of the received sample [µs]
+            receiveTime: The host time at which the sample was received [s]
+        """
+        self.__received += 1
+        last = self.__lastSampleTimeFine
+        if last is not None and self.__interval is not None:
+            delta = (sampleTimeFine - last) % SAMPLE_TIME_FINE_WRAP
+            if delta == 0 or delta >= SAMPLE_TIME_FINE_WRAP // 2:
+                # A repeated or older sample, keep the newest timestamp as reference
+                self.__outOfOrder += 1
+                sampleTimeFine = last
+            else:
+                missing = int(delta / self.__interval + 0.5) - 1
+                if missing > 0:
+                    self.__lost += missing
+                    self.__gaps += 1
+                    if missing > self.__longestGap:
+                        self.__longestGap = missing
+        self.__lastSampleTimeFine = sampleTimeFine
+
+        if self.__lastReceiveTime is None:
+            self.__firstReceiveTime = receiveTime
+        elif self.__stallSeconds is not None:
+            arrival = receiveTime - self.__lastReceiveTime
+            if arrival > self.__stallSeconds:
+                self.__stalls += 1
+                self.__burst = 0
+            elif self.__burst is not None and arrival < 0.5 / self.__outputRate:
+                # Samples arriving right after a stall, faster than the output rate, are its backlog being flushed
+                self.__burst += 1
+                if self.__burst == 1:
+                    self.__bursts += 1
+                if self.__burst > self.__longestBurst:
+                    self.__longestBurst = self.__burst
+            else:
+                self.__burst = None
+        self.__lastReceiveTime = receiveTime
+
+    def report(self):
+        """
+        Returns:
+             A dict with the output rate, the number of received, lost and out of order samples, the loss
+             percentage, the number of gaps and the longest gap in samples, the number of stalls, bursts
+             and the longest burst in samples, and the effective throughput in samples per second
+        """
+        received = self.__received
+        lost = self.__lost
+        first = self.__firstReceiveTime
+        last = self.__lastReceiveTime
+        elapsed = last - first if first is not None and last is not None else 0.0
+        return {
+            "output_rate": self.__outputRate,
+            "received": received,
+            "lost": lost,
+            "loss_pct": 100.0 * lost / (received + lost) if received + lost else 0.0,
+            "gaps": self.__gaps,
+            "longest_gap": self.__longestGap,
+            "out_of_order": self.__outOfOrder,
+            "stalls": self.__stalls,
+            "bursts": self.__bursts,
+            "longest_burst": self.__longestBurst,
+            "throughput_hz": (received - 1) / elapsed if elapsed > 0 else 0.0,
+        }
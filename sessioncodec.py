@@ -0,0 +1,220 @@
+#  Compressed block codec for recorded sessions.
+#
+#  Raw session records take 80 bytes per sample, while most of it is predictable: sampleTimeFine
+#  advances by a nearly constant step, the device and flags hardly change and the sensor values
+#  only need a fixed resolution. A compressed session stores each block as
+#      - sampleTimeFine and host time as delta-of-delta integers (host time rounded to 1 µs)
+#      - quaternion, accelerations, angular velocity and magnetic field as int16 fixed point,
+#        delta coded per component (a block falls back to float32 for a field that exceeds the range)
+#      - every array split into byte planes, then compressed together with zlib or lzma
+#  The decoded values differ from the recorded ones by at most half a quantization step, see
+#  Codec.tolerance(); NaN (field not measured) is kept.
+#
+
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+COMPRESSIONS = ("zlib", "lzma")
+
+# Quantization step per field and the unit of the values
+FIXED_POINT = {
+    "quat": 1.0 / 32767,    # unit quaternion components, [-1, 1]
+    "acc": 0.005,           # m/s², ±163 m/s² covers the ±16 g range
+    "gyro": 0.07,           # deg/s, ±2293 deg/s covers the ±2000 deg/s range
+    "freeAcc": 0.005,       # m/s²
+    "mag": 1.0 / 4096,      # a.u., ±8
+}
+HOST_TIME_STEP = 1e-6
+
+SAMPLE_TIME_FINE_WRAP = 1 << 32
+_INT16_NAN = -32768
+_FIXED = 0
+_FLOAT32 = 1
+
+# First and last sampleTimeFine and host time of the block, stored uncompressed in front of the
+# compressed data so a reader can index a block without decoding it
+_PREFIX = struct.Struct("<IIdd")
+PREFIX_BYTES = _PREFIX.size
+
+
+class Codec:
+    """
+    Encodes and decodes blocks of session records (sessionfile.RECORD_DTYPE)
+    """
+    def __init__(self, compression="zlib", level=None, quantize=True):
+        """
+        Parameters:
+            compression: "zlib" or "lzma"
+            level: The compression level (zlib 1-9, lzma preset 0-9), None for the default of 6
+            quantize: Store the sensor values as int16 fixed point and the host time in µs, False
+                      keeps them lossless (float32 and float64)
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}', expected one of {', '.join(COMPRESSIONS)}")
+        self.compression = compression
+        self.level = 6 if level is None else level
+        self.quantize = quantize
+
+    def describe(self):
+        """
+        Returns:
+             A dict with the codec settings, stored in the session header
+        """
+        return {"compression": self.compression, "level": self.level, "quantize": self.quantize}
+
+    def tolerance(self):
+        """
+        Returns:
+             A dict with the maximum absolute difference between a recorded and a decoded value per field:
+             half the quantization step, 0 for lossless fields. The float32 (float64 for the host time)
+             rounding of the decoded value comes on top
+        """
+        if not self.quantize:
+            return {"sampleTimeFine": 0, "hostTime": 0.0, **{name: 0.0 for name in FIXED_POINT}}
+        return {"sampleTimeFine": 0, "hostTime": HOST_TIME_STEP / 2,
+                **{name: step / 2 for name, step in FIXED_POINT.items()}}
+
+    def encode(self, records):
+        """
+        Parameters:
+            records: A structured array with sessionfile.RECORD_DTYPE, at least one record
+        Returns:
+             The encoded block as bytes
+        """
+        timeFine = records["sampleTimeFine"].astype(np.int64)
+        hostTime = records["hostTime"]
+        prefix = _PREFIX.pack(int(timeFine[0]), int(timeFine[-1]), float(hostTime[0]), float(hostTime[-1]))
+
+        # Signed steps of the wrapping counter, then their changes, mostly 0
+        steps = np.diff(timeFine) % SAMPLE_TIME_FINE_WRAP
+        steps[steps >= SAMPLE_TIME_FINE_WRAP // 2] -= SAMPLE_TIME_FINE_WRAP
+        planes = [_planes(records["device"]), _planes(records["flags"]), _planes(_deltaOfDelta(steps))]
+        if self.quantize:
+            micros = np.round((hostTime - hostTime[0]) / HOST_TIME_STEP).astype(np.int64)
+            planes.append(_planes(_deltaOfDelta(np.diff(micros))))
+        else:
+            planes.append(_planes(hostTime))
+
+        formats = bytearray()
+        for name, step in FIXED_POINT.items():
+            values = records[name]
+            fixed = self.__fixed(values, step) if self.quantize else None
+            if fixed is None:
+                formats.append(_FLOAT32)
+                planes.append(_planes(np.ascontiguousarray(values.T)))
+            else:
+                formats.append(_FIXED)
+                # Component by component, the differences of a smooth signal are small; int16 wraps, which
+                # the cumulative sum of the decoder undoes exactly
+                planes.append(_planes(np.diff(fixed.T, axis=1, prepend=np.int16(0)).astype(np.int16)))
+
+        body = bytes(formats) + b"".join(planes)
+        if self.compression == "zlib":
+            return prefix + zlib.compress(body, self.level)
+        return prefix + lzma.compress(body, preset=self.level)
+
+    def decode(self, payload, count, dtype):
+        """
+        Parameters:
+            payload: A block returned by encode
+            count: The number of records in the block
+            dtype: The record dtype, sessionfile.RECORD_DTYPE
+        Returns:
+             A structured array with the decoded records
+        """
+        firstTimeFine, _, firstHostTime, _ = _PREFIX.unpack_from(payload, 0)
+        compressed = bytes(payload[_PREFIX.size:])
+        body = zlib.decompress(compressed) if self.compression == "zlib" else lzma.decompress(compressed)
+
+        records = np.empty(count, dtype=dtype)
+        reader = _PlaneReader(body, len(FIXED_POINT))
+        formats = reader.formats
+        records["device"] = reader.read(np.uint16, count)
+        records["flags"] = reader.read(np.uint16, count)
+        steps = np.cumsum(reader.read(np.int64, count - 1))
+        records["sampleTimeFine"] = (firstTimeFine + np.concatenate(([0], np.cumsum(steps)))) % SAMPLE_TIME_FINE_WRAP
+        if self.quantize:
+            micros = np.concatenate(([0], np.cumsum(np.cumsum(reader.read(np.int64, count - 1)))))
+            records["hostTime"] = firstHostTime + micros * HOST_TIME_STEP
+        else:
+            records["hostTime"] = reader.read(np.float64, count)
+
+        for format, (name, step) in zip(formats, FIXED_POINT.items()):
+            width = dtype[name].shape[0]
+            if format == _FLOAT32:
+                records[name] = reader.read(np.float32, count * width).reshape(width, count).T
+                continue
+            fixed = np.cumsum(reader.read(np.int16, count * width).reshape(width, count), axis=1, dtype=np.int16).T
+            values = fixed.astype(np.float32) * np.float32(step)
+            values[fixed == _INT16_NAN] = np.nan
+            records[name] = values
+        return records
+
+    @staticmethod
+    def __fixed(values, step):
+        """
+        Returns the int16 fixed point values, None if a value does not fit
+        """
+        nan = np.isnan(values)
+        scaled = np.round(np.where(nan, 0.0, values.astype(np.float64)) / step)
+        if np.any(np.abs(scaled) > 32767):
+            return None
+        fixed = scaled.astype(np.int16)
+        fixed[nan] = _INT16_NAN
+        return fixed
+
+
+class _PlaneReader:
+    """
+    Reads the byte plane arrays of a decompressed block in order
+    """
+    def __init__(self, body, fields):
+        self.formats = body[:fields]
+        self.__body = body
+        self.__position = fields
+
+    def read(self, dtype, count):
+        dtype = np.dtype(dtype)
+        size = dtype.itemsize * count
+        planes = np.frombuffer(self.__body, dtype=np.uint8, count=size, offset=self.__position)
+        self.__position += size
+        return np.ascontiguousarray(planes.reshape(dtype.itemsize, count).T).view(dtype).reshape(count)
+
+
+def fromHeader(description):
+    """
+    Parameters:
+        description: The codec dict of a session header (see Codec.describe), may be None
+    Returns:
+         The Codec, None for an uncompressed session
+    """
+    if not description:
+        return None
+    return Codec(description["compression"], description["level"], description["quantize"])
+
+
+def blockEnds(data, offset=0):
+    """
+    Parameters:
+        data: A buffer with a block returned by Codec.encode, e.g. a memory map of the session
+        offset: The position of the block in data
+    Returns:
+         A tuple (first sampleTimeFine, last sampleTimeFine, first host time, last host time) of the block
+    """
+    return _PREFIX.unpack_from(data, offset)
+
+
+def _deltaOfDelta(steps):
+    return np.diff(steps, prepend=np.int64(0))
+
+
+def _planes(values):
+    """
+    Splits an array into byte planes (all first bytes, then all second bytes, ...), which compress
+    much better than interleaved multi-byte values
+    """
+    values = np.ascontiguousarray(values).reshape(-1)
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
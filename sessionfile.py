@@ -0,0 +1,914 @@
+#  Binary recording of live sessions.
+#
+#  Keeping a dict per sample in a list and writing a CSV on Ctrl+C costs hundreds of bytes per
+#  sample in RAM and loses the whole session when the process dies. The SessionWriter streams
+#  fixed-width records to disk from a background thread instead, in blocks with a checksum, and
+#  fsyncs periodically. A footer with the block index is appended when the session is closed;
+#  a session without footer (crash, power loss) is read by scanning the blocks up to the last
+#  intact one, so at most the last fsync interval is lost.
+#
+#  Every block holds the records of a single device, so the SessionReader can hand out the
+#  records of a device as zero-copy views into a memory map of the file. Optionally the blocks
+#  are compressed (see sessioncodec.py), the reader then decodes the blocks it needs.
+#
+#  File layout, little endian:
+#      "DOTSESS1", uint32 length, JSON header (devices, output rate, start time, record dtype)
+#      blocks: "DBLK", uint32 records, uint32 payload bytes, uint32 crc32, float64 first and
+#              last host time, payload (records as RECORD_DTYPE, or encoded by the header's codec)
+#      JSON footer (block index with the slot per block, records per device), uint64 footer offset, "DOTSEND1"
+#
+
+import csv
+from datetime import datetime
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+import numpy as np
+
+import sessioncodec
+import timeindex
+
+FILE_MAGIC = b"DOTSESS1"
+BLOCK_MAGIC = b"DBLK"
+END_MAGIC = b"DOTSEND1"
+FORMAT_VERSION = 1
+
+# Fields present in a record, unset fields are NaN
+HAS_QUAT = 0x01
+HAS_ACC = 0x02
+HAS_GYRO = 0x04
+HAS_FREE_ACC = 0x08
+HAS_MAG = 0x10
+# The first record of a device after its connection was lost and restored, the samples since its
+# previous record were not received
+AFTER_GAP = 0x8000
+
+RECORD_DTYPE = np.dtype([
+    ("device", "<u2"),          # slot of the device in the header's device list
+    ("flags", "<u2"),           # HAS_* and AFTER_GAP bits
+    ("sampleTimeFine", "<u4"),  # device clock [µs], wraps at 32 bits
+    ("hostTime", "<f8"),        # host receive time, seconds since the epoch
+    ("quat", "<f4", (4,)),      # orientation (w, x, y, z)
+    ("acc", "<f4", (3,)),       # calibrated acceleration [m/s²]
+    ("gyro", "<f4", (3,)),      # calibrated angular velocity [deg/s]
+    ("freeAcc", "<f4", (3,)),   # free acceleration [m/s²]
+    ("mag", "<f4", (3,)),       # calibrated magnetic field [a.u.]
+])
+
+_LENGTH = struct.Struct("<I")
+_BLOCK_HEADER = struct.Struct("<4sIIIdd")
+_TRAILER = struct.Struct("<Q8s")
+SAMPLE_TIME_FINE_WRAP = 1 << 32
+_NAN3 = (np.nan, np.nan, np.nan)
+_NAN4 = (np.nan, np.nan, np.nan, np.nan)
+
+
+class SessionWriter:
+    """
+    Appends the samples of several devices to a session file from a background thread
+
+    addPacket, addSample and addRecords only append to a deque and never touch the file, so they
+    can be called from the SDK callback thread. The writer thread turns the queued samples into
+    blocks of at most blockRecords records of one device every flushInterval seconds and fsyncs
+    every fsyncInterval.
+    """
+    def __init__(self, path, devices, outputRate=None, metadata=None, blockRecords=4096,
+                 flushInterval=0.25, fsyncInterval=1.0, codec=None):
+        """
+        Parameters:
+            path: The session file to create, an existing file is overwritten
+            devices: A dict mapping the slot of each device to its bluetooth address, or a list of addresses
+            outputRate: The output rate of the devices in Hz, stored in the header
+            metadata: A dict with additional JSON serializable header fields, e.g. the payload mode
+            blockRecords: The maximum number of records per block
+            flushInterval: The time in seconds between two writes of the queued samples
+            fsyncInterval: The maximum time in seconds the written data may stay in the OS cache
+            codec: A sessioncodec.Codec to compress the blocks, None writes raw records
+        """
+        if blockRecords < 1:
+            raise ValueError(f"blockRecords must be at least 1, got {blockRecords}")
+        if not isinstance(devices, dict):
+            devices = dict(enumerate(devices))
+
+        self.__path = path
+        self.__devices = dict(devices)
+        self.__blockRecords = blockRecords
+        self.__flushInterval = flushInterval
+        self.__fsyncInterval = fsyncInterval
+        self.__codec = codec
+        # Host receive times are time.perf_counter() values, stored as wall clock time
+        self.__wallOffset = time.time() - time.perf_counter()
+
+        # (slot, receiveTime, packet) for addPacket, a complete record tuple for addSample,
+        # a structured array for addRecords and a _GapMarker for markGap
+        self.__queue = deque()
+        # Slots whose next record gets AFTER_GAP
+        self.__gapSlots = set()
+        self.__index = list()
+        self.__deviceRecords = dict()
+        self.__records = 0
+        self.__lastSync = time.perf_counter()
+
+        self.__file = open(path, "wb")
+        header = {
+            "version": FORMAT_VERSION,
+            "devices": {str(slot): address for slot, address in self.__devices.items()},
+            "outputRate": outputRate,
+            "startTime": time.time(),
+            "dtype": RECORD_DTYPE.descr,
+            "metadata": metadata or dict(),
+            "codec": codec.describe() if codec is not None else None,
+        }
+        encoded = json.dumps(header).encode("utf-8")
+        # Pad the header so the blocks (and the records in them) start 8 byte aligned
+        encoded += b" " * (-(len(FILE_MAGIC) + _LENGTH.size + len(encoded)) % 8)
+        self.__file.write(FILE_MAGIC + _LENGTH.pack(len(encoded)) + encoded)
+        self.__sync()
+
+        self.__stop = threading.Event()
+        self.__error = None
+        self.__thread = threading.Thread(target=self.__run, name="SessionWriter", daemon=True)
+        self.__thread.start()
+
+    def path(self):
+        """
+        Returns:
+             The path of the session file
+        """
+        return self.__path
+
+    def setDevice(self, slot, address):
+        """
+        Adds a device that connected after the session was started
+
+        Parameters:
+            slot: The slot used for its samples
+            address: The bluetooth address of the device
+        """
+        self.__devices[slot] = address
+
+    def addPacket(self, slot, receiveTime, packet):
+        """
+        Queues a live data packet, its fields are read by the writer thread
+
+        Parameters:
+            slot: The slot of the device that sent the packet
+            receiveTime: The host receive time, a time.perf_counter() value
+            packet: The XsDataPacket, it must not be modified afterwards (pass a copy)
+        """
+        self.__queue.append((slot, receiveTime, packet))
+
+    def addSample(self, slot, sampleTimeFine, hostTime, quat=None, acc=None, gyro=None, freeAcc=None, mag=None):
+        """
+        Queues a sample whose fields were already read, e.g. from a realtime queue dict
+
+        Parameters:
+            slot: The slot of the device that sent the sample
+            sampleTimeFine: The sampleTimeFine of the sample [µs]
+            hostTime: The host receive time in seconds since the epoch (time.time())
+            quat: The orientation (w, x, y, z), None if not measured
+            acc: The calibrated acceleration, None if not measured
+            gyro: The calibrated angular velocity, None if not measured
+            freeAcc: The free acceleration, None if not measured
+            mag: The calibrated magnetic field, None if not measured
+        """
+        flags = ((HAS_QUAT if quat is not None else 0) | (HAS_ACC if acc is not None else 0)
+                 | (HAS_GYRO if gyro is not None else 0) | (HAS_FREE_ACC if freeAcc is not None else 0)
+                 | (HAS_MAG if mag is not None else 0))
+        self.__queue.append((slot, flags, sampleTimeFine, hostTime, _NAN4 if quat is None else tuple(quat),
+                             _NAN3 if acc is None else tuple(acc), _NAN3 if gyro is None else tuple(gyro),
+                             _NAN3 if freeAcc is None else tuple(freeAcc), _NAN3 if mag is None else tuple(mag)))
+
+    def markGap(self, slot):
+        """
+        Flags the next record of a device with AFTER_GAP, e.g. after it reconnected
+
+        Parameters:
+            slot: The slot of the device
+        """
+        self.__queue.append(_GapMarker(slot))
+
+    def addRecords(self, records):
+        """
+        Queues a block of complete records, e.g. when converting a capture to a session
+
+        Parameters:
+            records: A structured array with RECORD_DTYPE, it must not be modified afterwards
+        """
+        if records.dtype != RECORD_DTYPE:
+            raise ValueError(f"Records must have the session record dtype, got {records.dtype}")
+        if len(records):
+            self.__queue.append(records)
+
+    def stats(self):
+        """
+        Returns:
+             A dict with the number of written records and blocks, the records still queued,
+             the file size in bytes and the number of records per device address
+        """
+        return {
+            "records": self.__records,
+            "blocks": len(self.__index),
+            "queued": len(self.__queue),
+            "bytes": self.__file.tell() if not self.__file.closed else os.path.getsize(self.__path),
+            "devices": {self.__devices.get(slot, str(slot)): count for slot, count in list(self.__deviceRecords.items())},
+        }
+
+    def close(self):
+        """
+        Writes the queued samples and the footer, and closes the file
+
+        Returns:
+             The final stats(), see there
+        """
+        if self.__thread is not None:
+            self.__stop.set()
+            self.__thread.join()
+            self.__thread = None
+        if self.__file.closed:
+            return self.stats()
+        try:
+            self.__writeQueued()
+            footerOffset = self.__file.tell()
+            footer = {
+                "devices": {str(slot): address for slot, address in self.__devices.items()},
+                "endTime": time.time(),
+                "records": self.__records,
+                "deviceRecords": {str(slot): count for slot, count in self.__deviceRecords.items()},
+                "blocks": self.__index,
+            }
+            self.__file.write(json.dumps(footer).encode("utf-8"))
+            self.__file.write(_TRAILER.pack(footerOffset, END_MAGIC))
+            self.__sync()
+        finally:
+            self.__file.close()
+        if self.__error is not None:
+            raise self.__error
+        return self.stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __run(self):
+        try:
+            while not self.__stop.wait(self.__flushInterval):
+                self.__writeQueued()
+                if time.perf_counter() - self.__lastSync >= self.__fsyncInterval:
+                    self.__sync()
+        except Exception as error:
+            # Reported by close(), the samples keep queueing so nothing is lost silently
+            self.__error = error
+
+    def __writeQueued(self):
+        entries = []
+        while self.__queue:
+            entry = self.__queue.popleft()
+            if isinstance(entry, _GapMarker):
+                # Only the records queued after the marker can carry the flag
+                if entries:
+                    self.__writeRecords(self.__toRecords(entries))
+                    entries = []
+                self.__gapSlots.add(entry.slot)
+                continue
+            if isinstance(entry, np.ndarray):
+                if entries:
+                    self.__writeRecords(self.__toRecords(entries))
+                    entries = []
+                self.__writeRecords(entry)
+                continue
+            entries.append(entry)
+            if len(entries) >= self.__blockRecords:
+                self.__writeRecords(self.__toRecords(entries))
+                entries = []
+        if entries:
+            self.__writeRecords(self.__toRecords(entries))
+
+    def __writeRecords(self, records):
+        """
+        Splits records into blocks of one device and at most blockRecords records
+        """
+        devices = records["device"]
+        for slot in list(self.__gapSlots):
+            first = np.flatnonzero(devices == slot)
+            if len(first):
+                # addRecords arrays belong to the caller
+                records = records.copy()
+                devices = records["device"]
+                records["flags"][first[0]] |= AFTER_GAP
+                self.__gapSlots.discard(slot)
+        if devices[0] != devices[-1] or not np.all(devices == devices[0]):
+            # Stable, so the records of each device stay in arrival order
+            records = records[np.argsort(devices, kind="stable")]
+            devices = records["device"]
+        bounds = np.flatnonzero(np.diff(devices)) + 1
+        for deviceRecords in np.split(records, bounds):
+            for start in range(0, len(deviceRecords), self.__blockRecords):
+                self.__writeBlock(deviceRecords[start:start + self.__blockRecords])
+
+    def __toRecords(self, entries):
+        rows = [entry if len(entry) != 3 else self.__packetRow(*entry) for entry in entries]
+        records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+        for i, name in enumerate(RECORD_DTYPE.names):
+            records[name] = [row[i] for row in rows]
+        return records
+
+    def __packetRow(self, slot, receiveTime, packet):
+        """
+        Reads the fields of an XsDataPacket into a record tuple
+        """
+        flags = 0
+        quat = acc = gyro = freeAcc = mag = None
+        if packet.containsOrientation():
+            flags |= HAS_QUAT
+            quat = _quat(packet.orientationQuaternion())
+        if packet.containsCalibratedAcceleration():
+            flags |= HAS_ACC
+            acc = _vector(packet.calibratedAcceleration())
+        if packet.containsCalibratedGyroscopeData():
+            flags |= HAS_GYRO
+            gyro = _vector(packet.calibratedGyroscopeData())
+        if packet.containsFreeAcceleration():
+            flags |= HAS_FREE_ACC
+            freeAcc = _vector(packet.freeAcceleration())
+        if packet.containsCalibratedMagneticField():
+            flags |= HAS_MAG
+            mag = _vector(packet.calibratedMagneticField())
+        sampleTimeFine = packet.sampleTimeFine() if packet.containsSampleTimeFine() else 0
+        return (slot, flags, sampleTimeFine, receiveTime + self.__wallOffset, quat or _NAN4, acc or _NAN3,
+                gyro or _NAN3, freeAcc or _NAN3, mag or _NAN3)
+
+    def __writeBlock(self, records):
+        payload = records.tobytes() if self.__codec is None else self.__codec.encode(records)
+        offset = self.__file.tell()
+        firstTime = float(records["hostTime"][0])
+        lastTime = float(records["hostTime"][-1])
+        self.__file.write(_BLOCK_HEADER.pack(BLOCK_MAGIC, len(records), len(payload), zlib.crc32(payload),
+                                             firstTime, lastTime))
+        self.__file.write(payload)
+        slot = int(records["device"][0])
+        self.__index.append([offset, len(records), firstTime, lastTime, slot])
+        self.__records += len(records)
+        self.__deviceRecords[slot] = self.__deviceRecords.get(slot, 0) + len(records)
+
+    def __sync(self):
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__lastSync = time.perf_counter()
+
+
+class _GapMarker:
+    __slots__ = ("slot",)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+
+def _quat(q):
+    # SDK quaternions and vectors are indexable, but not iterable
+    return (q[0], q[1], q[2], q[3])
+
+
+def _vector(v):
+    return (v[0], v[1], v[2])
+
+
+def readHeader(path):
+    """
+    Parameters:
+        path: The session file
+    Returns:
+         A tuple (header, dataOffset): the JSON header as dict, with "devices" mapping the slot (int) to the
+         bluetooth address, and the offset of the first block
+    """
+    with open(path, "rb") as file:
+        return _readHeader(file)
+
+
+def readFooter(path):
+    """
+    Parameters:
+        path: The session file
+    Returns:
+         The footer as dict, with "devices" as in the header and "blocks" the list of
+         [offset, records, firstHostTime, lastHostTime, slot],
+         or None if the session was not closed (crashed), see iterBlocks
+    """
+    with open(path, "rb") as file:
+        footer = _readFooter(file)
+    if footer is not None:
+        del footer["_offset"]
+    return footer
+
+
+def iterBlocks(path):
+    """
+    Reads the blocks of a session in file order. A session without footer is read up to the
+    first truncated or corrupted block, i.e. everything that reached the disk before a crash
+
+    Parameters:
+        path: The session file
+    Returns:
+         A generator of structured arrays with RECORD_DTYPE
+    """
+    with open(path, "rb") as file:
+        header, offset = _readHeader(file)
+        codec = sessioncodec.fromHeader(header.get("codec"))
+        footer = _readFooter(file)
+        end = os.fstat(file.fileno()).st_size if footer is None else footer["_offset"]
+        while True:
+            file.seek(offset)
+            block = _blockHeader(file.read(_BLOCK_HEADER.size), 0, end - offset, codec is None)
+            if block is None:
+                break
+            count, size, crc = block
+            payload = file.read(size)
+            if zlib.crc32(payload) != crc:
+                break
+            yield np.frombuffer(payload, dtype=RECORD_DTYPE) if codec is None else codec.decode(payload, count, RECORD_DTYPE)
+            offset += _BLOCK_HEADER.size + size
+
+
+def load(path):
+    """
+    Reads a whole session
+
+    Parameters:
+        path: The session file
+    Returns:
+         A tuple (header, records): the header (see readHeader) and a structured array with all records
+    """
+    header, _ = readHeader(path)
+    blocks = list(iterBlocks(path))
+    return header, np.concatenate(blocks) if blocks else np.zeros(0, dtype=RECORD_DTYPE)
+
+
+class SessionReader:
+    """
+    Random access to a recorded session through a memory map
+
+    Opening reads only the header and the footer, the records are paged in by the OS when they
+    are used. The records of a device are returned as NumPy views into the map, without copying,
+    and seek locates a time in O(log n): a binary search over the blocks of the device followed
+    by one within the block. A session without footer (crashed) is indexed by scanning its block
+    headers and checksums once, the result is kept in a sidecar time index (see timeindex.py).
+
+    The blocks of a compressed session are decoded when they are used, the most recently used ones
+    are cached. The arrays are then copies instead of views.
+
+    The views are only valid until close() is called.
+    """
+    def __init__(self, path):
+        """
+        Parameters:
+            path: The session file
+        """
+        self.__path = path
+        self.__file = open(path, "rb")
+        try:
+            self.header, dataOffset = _readHeader(self.__file)
+            footer = _readFooter(self.__file)
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.__file.close()
+            raise
+
+        self.__codec = sessioncodec.fromHeader(self.header.get("codec"))
+        self.__devices = dict(self.header["devices"])
+        if footer is not None:
+            self.__devices.update(footer["devices"])
+            blocks = [(entry[0] + _BLOCK_HEADER.size, entry[1], entry[4] if len(entry) > 4 else -1)
+                      for entry in footer["blocks"]]
+        else:
+            blocks = self.__recover(dataOffset)
+        self.__complete = footer is not None
+
+        # Slot -> list of (payload offset, records), -1 for blocks of several devices (written by older versions)
+        self.__blocks = dict()
+        for offset, count, slot in blocks:
+            self.__blocks.setdefault(slot, []).append((offset, count))
+        self.__mixed = self.__blocks.pop(-1, [])
+        # Slot -> cached views, cumulative record counts and per block key ranges
+        self.__views = dict()
+        self.__starts = dict()
+        self.__keys = dict()
+
+    def path(self):
+        """
+        Returns:
+             The path of the session file
+        """
+        return self.__path
+
+    def complete(self):
+        """
+        Returns:
+             True if the session was closed properly, False if it was recovered up to the last intact block
+        """
+        return self.__complete
+
+    def addresses(self):
+        """
+        Returns:
+             The bluetooth addresses of the devices with records, in slot order
+        """
+        slots = set(self.__blocks)
+        if self.__mixed:
+            slots.update(self.__devices)
+        return [self.__devices.get(slot, str(slot)) for slot in sorted(slots)]
+
+    def count(self, address):
+        """
+        Parameters:
+            address: The bluetooth address of the device
+        Returns:
+             The number of records of the device
+        """
+        return int(self.__start(self.__slot(address))[-1])
+
+    def blocks(self, address):
+        """
+        Parameters:
+            address: The bluetooth address of the device
+        Returns:
+             A list with the records of the device as structured arrays with RECORD_DTYPE, one per block,
+             in time order. The arrays are read-only views into the file
+        """
+        return list(self.__blockViews(self.__slot(address)))
+
+    def channel(self, address, name):
+        """
+        Parameters:
+            address: The bluetooth address of the device
+            name: A field of RECORD_DTYPE, e.g. "quat" or "hostTime"
+        Returns:
+             A list with the field of the device's records, one view per block (e.g. N×4 for "quat")
+        """
+        if name not in RECORD_DTYPE.names:
+            raise KeyError(f"Unknown channel '{name}', expected one of {', '.join(RECORD_DTYPE.names)}")
+        return [view[name] for view in self.__blockViews(self.__slot(address))]
+
+    def records(self, address, start=0, stop=None):
+        """
+        The records start to stop (exclusive) of a device
+
+        Parameters:
+            address: The bluetooth address of the device
+            start: The index of the first record
+            stop: The index after the last record, None for the end
+        Returns:
+             A structured array with RECORD_DTYPE: a view into the file if the range lies in a single
+             block, else a copy of just the range
+        """
+        slot = self.__slot(address)
+        starts = self.__start(slot)
+        total = int(starts[-1])
+        stop = total if stop is None else min(max(stop, 0), total)
+        start = min(max(start, 0), stop)
+        views = self.__blockViews(slot)
+        first = max(int(np.searchsorted(starts, start, side="right")) - 1, 0)
+        pieces = []
+        block = first
+        while block < len(views) and starts[block] < stop:
+            begin = max(start - int(starts[block]), 0)
+            pieces.append(views[block][begin:stop - int(starts[block])])
+            block += 1
+        if not pieces:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+    def seek(self, address, value, by="hostTime"):
+        """
+        Finds the first record of a device at or after a time, in O(log n)
+
+        Parameters:
+            address: The bluetooth address of the device
+            value: The time: seconds since the epoch or a datetime for "hostTime", µs for "sampleTimeFine"
+            by: "hostTime" (wall clock) or "sampleTimeFine" (device clock, unwrapped, see timeFine)
+        Returns:
+             The index of the record, count(address) if all records are earlier
+        """
+        slot = self.__slot(address)
+        if isinstance(value, datetime):
+            value = value.timestamp()
+        _, lastKeys, bases = self.__blockKeys(slot, by)
+        block = int(np.searchsorted(lastKeys, value, side="left"))
+        starts = self.__start(slot)
+        if block == len(lastKeys):
+            return int(starts[-1])
+        keys = self.__keysOf(slot, block, by, bases)
+        return int(starts[block]) + int(np.searchsorted(keys, value, side="left"))
+
+    def window(self, address, start, stop, by="hostTime"):
+        """
+        Parameters:
+            address: The bluetooth address of the device
+            start: The start of the window, see seek
+            stop: The end of the window (exclusive), see seek
+            by: "hostTime" or "sampleTimeFine", see seek
+        Returns:
+             The records of the device in the window, see records
+        """
+        return self.records(address, self.seek(address, start, by), self.seek(address, stop, by))
+
+    def timeFine(self, address, start=0, stop=None):
+        """
+        Parameters:
+            address: The bluetooth address of the device
+            start: The index of the first record
+            stop: The index after the last record, None for the end
+        Returns:
+             The sampleTimeFine of the records unwrapped to int64 µs, counted from the raw value of the
+             device's first record, i.e. the timeline seek(by="sampleTimeFine") uses
+        """
+        slot = self.__slot(address)
+        starts = self.__start(slot)
+        _, _, bases = self.__blockKeys(slot, "sampleTimeFine")
+        records = self.records(address, start, stop)
+        if not len(records):
+            return np.zeros(0, dtype=np.int64)
+        start = min(max(start, 0), int(starts[-1]))
+        block = max(int(np.searchsorted(starts, start, side="right")) - 1, 0)
+        # Unwrap relative to the first record of the block the range starts in
+        first = self.__blockViews(slot)[block]["sampleTimeFine"][0]
+        steps = np.diff(np.concatenate(([first], records["sampleTimeFine"])).astype(np.int64)) % SAMPLE_TIME_FINE_WRAP
+        return bases[block] + np.cumsum(steps)
+
+    def close(self):
+        """
+        Closes the memory map, views returned before become invalid
+        """
+        self.__views.clear()
+        self.__keys.clear()
+        try:
+            self.__map.close()
+        except BufferError:
+            # Views are still referenced, the map is released with the last of them
+            pass
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __slot(self, address):
+        for slot, name in self.__devices.items():
+            if name == address:
+                return slot
+        raise KeyError(f"Device {address} is not in session {self.__path}")
+
+    def __recover(self, dataOffset):
+        """
+        Indexes the blocks of a session without footer. The result is kept in a sidecar time index,
+        so the blocks are only scanned once; when the session grew since (it is still being recorded)
+        only the new blocks are scanned
+        """
+        index = timeindex.load(timeindex.sidecarPath(self.__path))
+        blocks = []
+        firstTimes = []
+        sizes = []
+        offset = dataOffset
+        if index is not None and index.metadata.get("startTime") == self.header["startTime"] and "bytes" in index.extra:
+            if index.fresh(self.__path):
+                return list(zip(index.offsets.tolist(), index.extra["records"].tolist(), index.extra["slots"].tolist()))
+            if len(index) and index.sourceSize <= len(self.__map):
+                blocks = list(zip(index.offsets.tolist(), index.extra["records"].tolist(), index.extra["slots"].tolist()))
+                firstTimes = index.keys.tolist()
+                sizes = index.extra["bytes"].tolist()
+                offset = blocks[-1][0] + sizes[-1]
+
+        end = len(self.__map)
+        while True:
+            block = _blockHeader(self.__map, offset, end, self.__codec is None)
+            if block is None:
+                break
+            count, size, crc = block
+            payload = offset + _BLOCK_HEADER.size
+            if zlib.crc32(self.__map[payload:payload + size]) != crc:
+                break
+            records = self.__decode(payload, count, size)
+            devices = records["device"]
+            blocks.append((payload, count, int(devices[0]) if np.all(devices == devices[0]) else -1))
+            firstTimes.append(float(records["hostTime"][0]))
+            sizes.append(size)
+            offset = payload + size
+
+        fileSize, mtime = timeindex.statSource(self.__path)
+        offsets, counts, slots = zip(*blocks) if blocks else ((), (), ())
+        timeindex.trySave(timeindex.TimeIndex(firstTimes, offsets, 0, fileSize, mtime,
+                                              {"unit": "s", "key": "hostTime", "startTime": self.header["startTime"]},
+                                              {"records": np.array(counts, dtype=np.int64), "slots": np.array(slots, dtype=np.int64),
+                                               "bytes": np.array(sizes, dtype=np.int64)}),
+                          self.__path)
+        return blocks
+
+    def __decode(self, offset, count, size=None):
+        """
+        Returns the records of the block whose payload starts at offset, a view for raw blocks
+        """
+        if self.__codec is None:
+            return np.frombuffer(self.__map, dtype=RECORD_DTYPE, count=count, offset=offset)
+        if size is None:
+            size = _BLOCK_HEADER.unpack_from(self.__map, offset - _BLOCK_HEADER.size)[2]
+        return self.__codec.decode(self.__map[offset:offset + size], count, RECORD_DTYPE)
+
+    def __blockViews(self, slot):
+        views = self.__views.get(slot)
+        if views is None:
+            if self.__codec is not None:
+                views = _DecodedBlocks(self.__blocks.get(slot, []), self.__decode)
+            else:
+                views = [np.frombuffer(self.__map, dtype=RECORD_DTYPE, count=count, offset=offset)
+                         for offset, count in self.__blocks.get(slot, [])]
+            if self.__mixed:
+                # Copies of this device's records in blocks shared with other devices, merged in file order
+                views = self.__mergeMixed(slot, views)
+            self.__views[slot] = views
+        return views
+
+    def __mergeMixed(self, slot, views):
+        pieces = [(offset, view) for (offset, _), view in zip(self.__blocks.get(slot, []), views)]
+        for offset, count in self.__mixed:
+            records = self.__decode(offset, count)
+            records = records[records["device"] == slot]
+            if len(records):
+                pieces.append((offset, records))
+        pieces.sort(key=lambda piece: piece[0])
+        return [view for _, view in pieces]
+
+    def __start(self, slot):
+        starts = self.__starts.get(slot)
+        if starts is None:
+            if self.__mixed:
+                counts = [len(view) for view in self.__blockViews(slot)]
+            else:
+                counts = [count for _, count in self.__blocks.get(slot, [])]
+            starts = self.__starts[slot] = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+        return starts
+
+    def __blockKeys(self, slot, by):
+        """
+        Returns the first and last key of every block of a device, and for "sampleTimeFine" the
+        unwrapped value of the first record of each block
+        """
+        if by not in ("hostTime", "sampleTimeFine"):
+            raise ValueError(f"Unknown time base '{by}', expected hostTime or sampleTimeFine")
+        cached = self.__keys.get((slot, by))
+        if cached is not None:
+            return cached
+        dtype = np.float64 if by == "hostTime" else np.int64
+        if self.__codec is not None and not self.__mixed:
+            # Compressed blocks keep their first and last times in front of the compressed data
+            ends = [sessioncodec.blockEnds(self.__map, offset) for offset, _ in self.__blocks.get(slot, [])]
+            first, last = (2, 3) if by == "hostTime" else (0, 1)
+            firstKeys = np.array([end[first] for end in ends], dtype=dtype)
+            lastKeys = np.array([end[last] for end in ends], dtype=dtype)
+        else:
+            views = self.__blockViews(slot)
+            firstKeys = np.array([view[by][0] for view in views], dtype=dtype)
+            lastKeys = np.array([view[by][-1] for view in views], dtype=dtype)
+        bases = None
+        if by == "sampleTimeFine" and len(firstKeys):
+            # Steps within a block and from the end of a block to the start of the next, modulo the wrap
+            within = (lastKeys - firstKeys) % SAMPLE_TIME_FINE_WRAP
+            between = (firstKeys[1:] - lastKeys[:-1]) % SAMPLE_TIME_FINE_WRAP
+            bases = firstKeys[0] + np.concatenate(([0], np.cumsum(within[:-1] + between)))
+            firstKeys, lastKeys = bases, bases + within
+        cached = self.__keys[(slot, by)] = (firstKeys, lastKeys, bases)
+        return cached
+
+    def __keysOf(self, slot, block, by, bases):
+        values = self.__blockViews(slot)[block][by]
+        if by == "hostTime":
+            return values
+        steps = np.diff(values.astype(np.int64)) % SAMPLE_TIME_FINE_WRAP
+        return bases[block] + np.concatenate(([0], np.cumsum(steps)))
+
+
+class _DecodedBlocks:
+    """
+    The blocks of a device in a compressed session, decoded on access with a small cache
+    """
+    CACHED = 16
+
+    def __init__(self, blocks, decode):
+        self.__blocks = blocks
+        self.__decode = decode
+        self.__cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.__blocks)
+
+    def __getitem__(self, block):
+        records = self.__cache.get(block)
+        if records is not None:
+            self.__cache.move_to_end(block)
+            return records
+        offset, count = self.__blocks[block]
+        records = self.__cache[block] = self.__decode(offset, count)
+        if len(self.__cache) > self.CACHED:
+            self.__cache.popitem(last=False)
+        return records
+
+    def __iter__(self):
+        for block in range(len(self.__blocks)):
+            yield self[block]
+
+
+def toCsv(path, csvPath, address=None):
+    """
+    Converts a session to CSV. The columns are those of the CSV files written by recordDAta.py
+    (timestamp, dt, qw, qx, qy, qz, ax, ay, az, gx, gy, gz), with the address of the device first
+    when all devices are converted. The blocks are converted one by one, so the session does not
+    have to fit in memory
+
+    Parameters:
+        path: The session file
+        csvPath: The CSV file to write
+        address: The bluetooth address of the device to convert, None converts all devices
+    Returns:
+         The number of rows written
+    """
+    header, _ = readHeader(path)
+    footer = readFooter(path)
+    devices = dict(header["devices"])
+    if footer is not None:
+        devices.update(footer["devices"])
+    slots = [slot for slot, name in devices.items() if name == address]
+    if address is not None and not slots:
+        raise KeyError(f"Device {address} is not in session {path}")
+
+    lastTime = dict()
+    rows = 0
+    with open(csvPath, "w", newline="") as file:
+        writer = csv.writer(file)
+        columns = ["timestamp", "dt", "qw", "qx", "qy", "qz", "ax", "ay", "az", "gx", "gy", "gz"]
+        writer.writerow(columns if address is not None else ["address"] + columns)
+        for records in iterBlocks(path):
+            if address is not None:
+                records = records[np.isin(records["device"], slots)]
+            for record in records.tolist():
+                slot, _, timestamp, _, quat, acc, gyro = record[:7]
+                previous = lastTime.get(slot)
+                # sampleTimeFine wraps at 32 bits
+                dt = 0 if previous is None else ((timestamp - previous) % (1 << 32)) / 1e6
+                lastTime[slot] = timestamp
+                row = [timestamp, dt, *quat, *acc, *gyro]
+                writer.writerow(row if address is not None else [devices.get(slot, str(slot))] + row)
+            rows += len(records)
+    return rows
+
+
+def _blockHeader(data, offset, end, raw=True):
+    """
+    Returns (records, payload bytes, crc32) of the block header at offset in data, None if the
+    header is missing, invalid or its payload extends past end. Raw blocks must hold exactly
+    count records, the size of encoded blocks varies
+    """
+    if offset + _BLOCK_HEADER.size > end:
+        return None
+    magic, count, size, crc, _, _ = _BLOCK_HEADER.unpack_from(data, offset)
+    if magic != BLOCK_MAGIC or count == 0 or offset + _BLOCK_HEADER.size + size > end:
+        return None
+    if size != count * RECORD_DTYPE.itemsize if raw else size < sessioncodec.PREFIX_BYTES:
+        return None
+    return count, size, crc
+
+
+def _readHeader(file):
+    file.seek(0)
+    if file.read(len(FILE_MAGIC)) != FILE_MAGIC:
+        raise ValueError(f"{file.name} is not a session file")
+    (length,) = _LENGTH.unpack(file.read(_LENGTH.size))
+    header = json.loads(file.read(length).decode("utf-8"))
+    header["devices"] = {int(slot): address for slot, address in header["devices"].items()}
+    return header, len(FILE_MAGIC) + _LENGTH.size + length
+
+
+def _readFooter(file):
+    size = os.fstat(file.fileno()).st_size
+    if size < _TRAILER.size:
+        return None
+    file.seek(size - _TRAILER.size)
+    offset, magic = _TRAILER.unpack(file.read(_TRAILER.size))
+    if magic != END_MAGIC or offset > size - _TRAILER.size:
+        return None
+    file.seek(offset)
+    try:
+        footer = json.loads(file.read(size - _TRAILER.size - offset).decode("utf-8"))
+    except ValueError:
+        return None
+    footer["devices"] = {int(slot): address for slot, address in footer["devices"].items()}
+    # The blocks end where the footer starts
+    footer["_offset"] = offset
+    return footer
@@ -0,0 +1,221 @@
+#  Resampling of the streams of several Movella DOTs onto one common clock.
+#
+#  Without synchronization (startSync failed or was not used) every DOT samples on its own
+#  clock, so the samples of different devices are offset by up to one sample period and their
+#  sampleTimeFine values can not be compared. The StreamAligner maps each device's samples onto
+#  the host clock and interpolates them at common instants: SLERP for the orientation and linear
+#  interpolation for acceleration and angular velocity, on whole NumPy blocks.
+#
+
+import numpy as np
+
+from quatmath import slerp
+
+SAMPLE_TIME_FINE_WRAP = 1 << 32
+
+
+class _DeviceStream:
+    """
+    The samples of a single device that are not resampled yet, on the common timeline
+    """
+    def __init__(self):
+        self.times = np.zeros(0)
+        self.quat = np.zeros((0, 4))
+        self.acc = np.zeros((0, 3))
+        self.gyro = np.zeros((0, 3))
+        # Unwrapped sampleTimeFine of the newest sample
+        self.lastTimeFine = None
+        # Host time minus device time [s], the lower envelope of the observed values
+        self.offset = None
+        self.offsetTime = None
+
+
+class StreamAligner:
+    """
+    Resamples the orientation, acceleration and angular velocity of several devices at a common rate
+
+    Synchronized devices share the sampleTimeFine clock, which is used as timeline directly. For
+    unsynchronized devices the host receive times are needed: the offset between a device's
+    sampleTimeFine and the host clock is estimated as the minimum of receiveTime - sampleTimeFine,
+    which filters out the variable BLE and callback latency, and may drift by driftPpm.
+
+    Output instants are only produced once every device has a sample at or after them, so the
+    output lags the slowest device by up to one of its sample periods. Instants in a gap of more
+    than maxGap seconds in a device's data are NaN for that device.
+
+    Not thread-safe, meant to be used by the thread that reads the samples.
+    """
+    def __init__(self, addresses, rate, synchronized=False, maxGap=0.1, driftPpm=100.0):
+        """
+        Parameters:
+            addresses: The bluetooth addresses of the devices to align
+            rate: The rate of the common clock in Hz
+            synchronized: True if the devices were synchronized with startSync
+            maxGap: The longest gap in seconds between two samples of a device that is interpolated
+            driftPpm: The maximum clock drift between a device and the host, in parts per million
+        """
+        self.__addresses = list(addresses)
+        self.__rate = rate
+        self.__synchronized = synchronized
+        self.__maxGap = maxGap
+        self.__drift = driftPpm * 1e-6
+        self.__streams = {address: _DeviceStream() for address in self.__addresses}
+        # Raw sampleTimeFine that the unwrapping of synchronized devices starts from
+        self.__reference = None
+        # The common instants are origin + index / rate
+        self.__origin = None
+        self.__nextIndex = 0
+
+    def addresses(self):
+        """
+        Returns:
+             The bluetooth addresses of the aligned devices
+        """
+        return list(self.__addresses)
+
+    def add(self, address, sampleTimeFine, quat, acc=None, gyro=None, receiveTimes=None):
+        """
+        Adds a block of samples of one device, oldest first
+
+        Parameters:
+            address: The bluetooth address of the device
+            sampleTimeFine: The sampleTimeFine of the samples [µs], N values
+            quat: The orientation quaternions (w, x, y, z), N×4
+            acc: The accelerations, N×3, None fills NaN
+            gyro: The angular velocities, N×3, None fills NaN
+            receiveTimes: The host receive times of the samples [s], N values, required when not synchronized
+        """
+        stream = self.__streams.get(address)
+        if stream is None:
+            raise KeyError(f"Device {address} is not aligned by this StreamAligner")
+        timeFine = np.asarray(sampleTimeFine, dtype=np.int64)
+        n = len(timeFine)
+        if n == 0:
+            return
+        if not self.__synchronized and receiveTimes is None:
+            raise ValueError("receiveTimes are required to align unsynchronized devices")
+
+        deviceTimes = self.__unwrap(stream, timeFine) * 1e-6
+        if self.__synchronized:
+            times = deviceTimes
+        else:
+            receiveTimes = np.asarray(receiveTimes, dtype=np.float64)
+            offset = float(np.min(receiveTimes - deviceTimes))
+            if stream.offset is None:
+                stream.offset = offset
+            else:
+                # Allow the estimate to rise by the clock drift since the previous block
+                allowed = stream.offset + self.__drift * (deviceTimes[-1] - stream.offsetTime)
+                stream.offset = min(allowed, offset)
+            stream.offsetTime = deviceTimes[-1]
+            times = deviceTimes + stream.offset
+
+        stream.times = np.concatenate((stream.times, times))
+        stream.quat = np.concatenate((stream.quat, np.asarray(quat, dtype=np.float64).reshape(n, 4)))
+        stream.acc = np.concatenate((stream.acc, self.__block(acc, n)))
+        stream.gyro = np.concatenate((stream.gyro, self.__block(gyro, n)))
+
+    def addPackets(self, packets):
+        """
+        Adds the packets returned by XdpcHandler.drainAll(with_times=True)
+
+        Parameters:
+            packets: A dict mapping the bluetooth address of each device to a list of (receiveTime, packet)
+        """
+        for address, items in packets.items():
+            if not items or address not in self.__streams:
+                continue
+            receiveTimes = [receiveTime for receiveTime, _ in items]
+            timeFine = [packet.sampleTimeFine() for _, packet in items]
+            nan3 = (np.nan, np.nan, np.nan)
+            quat = [packet.orientationQuaternion() if packet.containsOrientation() else (np.nan,) * 4 for _, packet in items]
+            acc = [packet.calibratedAcceleration() if packet.containsCalibratedAcceleration() else nan3 for _, packet in items]
+            gyro = [packet.calibratedGyroscopeData() if packet.containsCalibratedGyroscopeData() else nan3 for _, packet in items]
+            self.add(address, timeFine, quat, acc, gyro, receiveTimes)
+
+    def resample(self):
+        """
+        Interpolates all devices at the common instants that are covered by every device
+
+        Returns:
+             A tuple (times, samples): times is an array with the K new instants in seconds (on the
+             sampleTimeFine clock when synchronized, else on the time.perf_counter() clock), samples is a
+             dict mapping each bluetooth address to a dict with "quat" (K×4), "acc" and "gyro" (K×3)
+        """
+        streams = self.__streams.values()
+        if any(len(stream.times) == 0 for stream in streams):
+            return np.zeros(0), dict()
+
+        if self.__origin is None:
+            # Start at the first instant every device has data for
+            self.__origin = max(stream.times[0] for stream in streams)
+        end = min(stream.times[-1] for stream in streams)
+        last = int(np.floor((end - self.__origin) * self.__rate))
+        if last < self.__nextIndex:
+            return np.zeros(0), dict()
+
+        times = self.__origin + np.arange(self.__nextIndex, last + 1) / self.__rate
+        self.__nextIndex = last + 1
+        samples = {address: self.__interpolate(stream, times) for address, stream in self.__streams.items()}
+
+        # Keep the sample before the next instant, it brackets the next output
+        nextTime = self.__origin + self.__nextIndex / self.__rate
+        for stream in streams:
+            first = max(int(np.searchsorted(stream.times, nextTime, side="right")) - 1, 0)
+            stream.times = stream.times[first:]
+            stream.quat = stream.quat[first:]
+            stream.acc = stream.acc[first:]
+            stream.gyro = stream.gyro[first:]
+        return times, samples
+
+    def __interpolate(self, stream, times):
+        if len(stream.times) == 1:
+            i = np.zeros(len(times), dtype=np.intp)
+            j = i
+            fraction = np.zeros(len(times))
+        else:
+            i = np.clip(np.searchsorted(stream.times, times, side="right") - 1, 0, len(stream.times) - 2)
+            j = i + 1
+            span = stream.times[j] - stream.times[i]
+            fraction = np.clip((times - stream.times[i]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+
+        fraction3 = fraction[:, np.newaxis]
+        quat = slerp(stream.quat[i], stream.quat[j], fraction)
+        acc = stream.acc[i] + (stream.acc[j] - stream.acc[i]) * fraction3
+        gyro = stream.gyro[i] + (stream.gyro[j] - stream.gyro[i]) * fraction3
+
+        gap = stream.times[j] - stream.times[i] > self.__maxGap
+        if gap.any():
+            quat[gap] = np.nan
+            acc[gap] = np.nan
+            gyro[gap] = np.nan
+        return {"quat": quat, "acc": acc, "gyro": gyro}
+
+    def __unwrap(self, stream, timeFine):
+        """
+        Turns 32 bit sampleTimeFine values into a timeline without wraparound
+        """
+        if stream.lastTimeFine is None:
+            if self.__reference is None or not self.__synchronized:
+                first = int(timeFine[0])
+            else:
+                # Synchronized devices share the clock, unwrap relative to the first device
+                delta = (int(timeFine[0]) - self.__reference) % SAMPLE_TIME_FINE_WRAP
+                if delta >= SAMPLE_TIME_FINE_WRAP // 2:
+                    delta -= SAMPLE_TIME_FINE_WRAP
+                first = self.__reference + delta
+            if self.__reference is None:
+                self.__reference = first
+            steps = np.diff(timeFine) % SAMPLE_TIME_FINE_WRAP
+            unwrapped = first + np.concatenate(([0], np.cumsum(steps)))
+        else:
+            steps = np.diff(np.concatenate(([stream.lastTimeFine % SAMPLE_TIME_FINE_WRAP], timeFine))) % SAMPLE_TIME_FINE_WRAP
+            unwrapped = stream.lastTimeFine + np.cumsum(steps)
+        stream.lastTimeFine = int(unwrapped[-1])
+        return unwrapped.astype(np.float64)
+
+    @staticmethod
+    def __block(values, n):
+        if values is None:
+            return np.full((n, 3), np.nan)
+        return np.asarray(values, dtype=np.float64).reshape(n, 3)
@@ -0,0 +1,160 @@
+#  Sparse time index sidecar files for recordings.
+#
+#  Finding a time in a long CSV capture otherwise means parsing it from the start. A TimeIndex
+#  keeps the time of every Nth sample together with the byte offset of its line (or block), so a
+#  reader seeks to the anchor before the requested time and parses only the slice it needs. The
+#  index is stored next to the recording as "<recording>.tidx" together with the size and the
+#  modification time of the recording, so a stale index (the recording grew or was replaced) is
+#  detected and rebuilt.
+#
+
+import json
+import os
+
+import numpy as np
+
+SUFFIX = ".tidx"
+
+
+class TimeIndex:
+    """
+    Ascending times (keys) and the byte offsets where they start in the recording
+    """
+    def __init__(self, keys, offsets, every, sourceSize, sourceMtime, metadata=None, extra=None):
+        """
+        Parameters:
+            keys: The times of the anchors, ascending for locate and after
+            offsets: The byte offset of each anchor in the recording
+            every: The number of samples between two anchors, 0 if the anchors are blocks
+            sourceSize: The size of the recording in bytes when the index was built
+            sourceMtime: The modification time of the recording in ns when the index was built
+            metadata: A dict with JSON serializable information on the keys, e.g. their unit
+            extra: A dict of additional arrays with one value per anchor
+        """
+        self.keys = np.asarray(keys)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        if len(self.keys) != len(self.offsets):
+            raise ValueError(f"Got {len(self.keys)} keys for {len(self.offsets)} offsets")
+        self.every = every
+        self.sourceSize = sourceSize
+        self.sourceMtime = sourceMtime
+        self.metadata = metadata or dict()
+        self.extra = {name: np.asarray(values) for name, values in (extra or dict()).items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def locate(self, key):
+        """
+        Parameters:
+            key: A time on the scale of the keys
+        Returns:
+             The position of the last anchor at or before key, 0 if key is before the first anchor
+        """
+        return max(int(np.searchsorted(self.keys, key, side="right")) - 1, 0)
+
+    def after(self, key):
+        """
+        Parameters:
+            key: A time on the scale of the keys
+        Returns:
+             The position of the first anchor after key, len(self) if there is none
+        """
+        return int(np.searchsorted(self.keys, key, side="right"))
+
+    def fresh(self, path):
+        """
+        Parameters:
+            path: The recording the index was built for
+        Returns:
+             True if the recording did not change since the index was built
+        """
+        try:
+            status = os.stat(path)
+        except OSError:
+            return False
+        return status.st_size == self.sourceSize and status.st_mtime_ns == self.sourceMtime
+
+    def save(self, path):
+        """
+        Writes the index, replacing an existing file only once the new one is complete
+
+        Parameters:
+            path: The index file, usually sidecarPath(recording)
+        """
+        header = {"every": self.every, "sourceSize": self.sourceSize, "sourceMtime": self.sourceMtime,
+                  "metadata": self.metadata}
+        arrays = {"extra_" + name: values for name, values in self.extra.items()}
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            np.savez(file, keys=self.keys, offsets=self.offsets, header=np.array(json.dumps(header)), **arrays)
+        os.replace(temporary, path)
+
+
+def sidecarPath(path):
+    """
+    Parameters:
+        path: A recording
+    Returns:
+         The path of its index file
+    """
+    return path + SUFFIX
+
+
+def statSource(path):
+    """
+    Parameters:
+        path: A recording
+    Returns:
+         A tuple (size, mtime in ns) to build a TimeIndex with
+    """
+    status = os.stat(path)
+    return status.st_size, status.st_mtime_ns
+
+
+def load(path):
+    """
+    Parameters:
+        path: The index file
+    Returns:
+         The TimeIndex, None if the file does not exist or can not be read
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            extra = {name[len("extra_"):]: data[name] for name in data.files if name.startswith("extra_")}
+            return TimeIndex(data["keys"], data["offsets"], header["every"], header["sourceSize"],
+                             header["sourceMtime"], header["metadata"], extra)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def loadFresh(recording):
+    """
+    Parameters:
+        recording: A recording
+    Returns:
+         The TimeIndex of its sidecar file, None if there is none or the recording changed since
+    """
+    index = load(sidecarPath(recording))
+    if index is None or not index.fresh(recording):
+        return None
+    return index
+
+
+def trySave(index, recording):
+    """
+    Saves the sidecar file of a recording, a read-only location is not an error: the index is then
+    built again on the next open
+
+    Parameters:
+        index: The TimeIndex
+        recording: The recording it was built for
+    Returns:
+         True if the index was saved
+    """
+    try:
+        index.save(sidecarPath(recording))
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,239 @@
+#  Parallel export of the onboard recordings of docked Movella DOTs.
+#
+#  movelladot_pc_sdk_data_export.py used to export one recording of the first USB device and give
+#  up after 10 seconds. An ExportOrchestrator exports every recording of every connected USB device:
+#  each device exports its recordings one after the other (a device handles one export at a time),
+#  while up to maxConcurrent devices export at the same time on worker threads. The progress of
+#  each device comes from the per-device export state of the XdpcHandler, an export that makes no
+#  progress for stallTimeout seconds is stopped, and summary() reports the packets and bytes per
+#  second of every device.
+#
+
+import os
+import queue
+import threading
+import time
+
+QUEUED = "queued"
+EXPORTING = "exporting"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class DeviceExport:
+    """
+    Export state and throughput of one USB device
+    """
+    def __init__(self, device, deviceId, recordings):
+        """
+        Parameters:
+            device: The XsDotUsbDevice
+            deviceId: The device ID as string
+            recordings: The indices of the recordings to export
+        """
+        self.device = device
+        self.deviceId = deviceId
+        self.recordings = list(recordings)
+        self.state = QUEUED
+        self.recording = None
+        self.exported = []
+        self.files = []
+        self.packets = 0
+        self.bytes = 0
+        self.started = None
+        self.finished = None
+        self.errors = []
+
+    def seconds(self):
+        """
+        Returns:
+             The time spent exporting so far in seconds, 0 before the export started
+        """
+        if self.started is None:
+            return 0.0
+        return (self.finished if self.finished is not None else time.perf_counter()) - self.started
+
+    def asDict(self):
+        """
+        Returns:
+             A dict with the state, the recordings exported of the total, the packets and bytes and
+             their rates per second, and the errors
+        """
+        seconds = self.seconds()
+        return {"state": self.state,
+                "recording": self.recording,
+                "recordings": len(self.recordings),
+                "exported": len(self.exported),
+                "files": list(self.files),
+                "packets": self.packets,
+                "bytes": self.bytes,
+                "seconds": seconds,
+                "packets_per_s": self.packets / seconds if seconds > 0 else 0.0,
+                "bytes_per_s": self.bytes / seconds if seconds > 0 else 0.0,
+                "errors": list(self.errors)}
+
+
+class ExportOrchestrator:
+    """
+    Exports all recordings of the connected USB devices of an XdpcHandler concurrently
+    """
+    def __init__(self, handler, exportData, directory=".", maxConcurrent=4, stallTimeout=10.0,
+                 fileName="device_{deviceId}_{recording}.csv"):
+        """
+        Parameters:
+            handler: The XdpcHandler the USB devices are connected with
+            exportData: The XsIntArray with the RecordingData fields to export
+            directory: The directory of the exported CSV files
+            maxConcurrent: The maximum number of devices exporting at the same time
+            stallTimeout: Seconds without export callbacks after which an export is stopped and counted as failed
+            fileName: The file name pattern, formatted with deviceId and recording
+        """
+        if maxConcurrent < 1:
+            raise ValueError(f"maxConcurrent must be at least 1, got {maxConcurrent}")
+        self.__handler = handler
+        self.__exportData = exportData
+        self.__directory = directory
+        self.__maxConcurrent = maxConcurrent
+        self.__stallTimeout = stallTimeout
+        self.__fileName = fileName
+        self.__exports = []
+        self.__cancel = threading.Event()
+
+    def run(self, devices=None, recordings=None):
+        """
+        Exports the recordings and returns when all devices finished
+
+        Parameters:
+            devices: The XsDotUsbDevices to export, None for handler.connectedUsbDots()
+            recordings: A function returning the recording indices to export of a device, None for all of them
+        Returns:
+             The summary(), see there
+        """
+        if devices is None:
+            devices = self.__handler.connectedUsbDots()
+        self.__cancel.clear()
+        self.__exports = []
+        pending = queue.SimpleQueue()
+        for device in devices:
+            indices = recordings(device) if recordings is not None else range(1, device.recordingCount() + 1)
+            export = DeviceExport(device, device.deviceId().toXsString(), indices)
+            self.__exports.append(export)
+            pending.put(export)
+
+        workers = [threading.Thread(target=self.__work, args=(pending,), name=f"usb export {i}", daemon=True)
+                   for i in range(min(self.__maxConcurrent, len(self.__exports)))]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Stop the devices before handing the interrupt on, so no export keeps writing its file
+            self.cancel()
+            for worker in workers:
+                worker.join()
+            raise
+        return self.summary()
+
+    def cancel(self):
+        """
+        Stops the running exports and skips the devices that did not start yet, run() then returns
+        """
+        self.__cancel.set()
+
+    def summary(self):
+        """
+        Can be called from another thread while run() is exporting
+
+        Returns:
+             A dict mapping each device ID to DeviceExport.asDict(), in the order of the devices
+        """
+        return {export.deviceId: export.asDict() for export in list(self.__exports)}
+
+    def __work(self, pending):
+        while not self.__cancel.is_set():
+            try:
+                export = pending.get_nowait()
+            except queue.Empty:
+                return
+            self.__exportDevice(export)
+        # Whatever is left was cancelled before it started
+        while True:
+            try:
+                pending.get_nowait().state = CANCELLED
+            except queue.Empty:
+                return
+
+    def __exportDevice(self, export):
+        device = export.device
+        export.state = EXPORTING
+        export.started = time.perf_counter()
+        if not device.selectExportData(self.__exportData):
+            export.errors.append(f"Could not select export data. Reason: {device.lastResultText()}")
+        else:
+            for recordingIndex in export.recordings:
+                if self.__cancel.is_set():
+                    break
+                self.__exportRecording(export, recordingIndex)
+        export.recording = None
+        export.finished = time.perf_counter()
+        if self.__cancel.is_set() and len(export.exported) < len(export.recordings):
+            export.state = CANCELLED
+        else:
+            export.state = FAILED if export.errors else DONE
+
+    def __exportRecording(self, export, recordingIndex):
+        device = export.device
+        export.recording = recordingIndex
+        info = device.getRecordingInfo(recordingIndex)
+        if info.empty():
+            export.errors.append(f"Could not get info of recording {recordingIndex}. Reason: {device.lastResultText()}")
+            return
+
+        path = os.path.join(self.__directory, self.__fileName.format(deviceId=export.deviceId, recording=recordingIndex))
+        if not device.enableLogging(path):
+            export.errors.append(f"Could not open logfile {path}. Reason: {device.lastResultText()}")
+            return
+        self.__handler.prepareExport(device, recordingIndex)
+        if not device.startExportRecording(recordingIndex):
+            export.errors.append(f"Could not export recording {recordingIndex}. Reason: {device.lastResultText()}")
+            device.disableLogging()
+            return
+
+        packetsBefore = export.packets
+        while not self.__handler.waitForExport(device, timeout=0.25):
+            progress = self.__handler.exportProgress(device)
+            export.packets = packetsBefore + progress["packets"]
+            if self.__cancel.is_set() or time.perf_counter() - progress["last_update"] > self.__stallTimeout:
+                if not self.__cancel.is_set():
+                    export.errors.append(f"Export of recording {recordingIndex} stalled")
+                if not device.stopExportRecording():
+                    export.errors.append(f"Device stop export failed. Reason: {device.lastResultText()}")
+                # The SDK reports onRecordedDataDone for a stopped export as well
+                self.__handler.waitForExport(device, timeout=self.__stallTimeout)
+                break
+        else:
+            export.exported.append(recordingIndex)
+            export.files.append(path)
+            export.bytes += info.storageSize()
+        export.packets = packetsBefore + self.__handler.exportProgress(device)["packets"]
+        device.disableLogging()
+
+
+def formatSummary(summary):
+    """
+    Parameters:
+        summary: The result of ExportOrchestrator.run or summary
+    Returns:
+         The summary as a table with one line per device
+    """
+    lines = [f"{'device':>16} {'state':>10} {'recordings':>10} {'packets':>10} {'MB':>8} {'s':>7} "
+             f"{'packets/s':>10} {'kB/s':>8}"]
+    for deviceId, stats in summary.items():
+        lines.append(f"{deviceId:>16} {stats['state']:>10} {stats['exported']:>5}/{stats['recordings']:<4} "
+                     f"{stats['packets']:>10} {stats['bytes'] / 1e6:>8.2f} {stats['seconds']:>7.2f} "
+                     f"{stats['packets_per_s']:>10.0f} {stats['bytes_per_s'] / 1e3:>8.1f}")
+        for error in stats["errors"]:
+            lines.append(f"{'':>16} {error}")
+    return "\n".join(lines)
@@ -28,9 +28,12 @@
 #  
 
 import getpass
+import os
 
 whitelist = list()
 dot_basename = "movella"
 username = getpass.getuser().lower()
 whitelist = {}
 dot_basename = "Movella DOT"
+# Last known good devices for XdpcHandler.connectKnownDots, None disables the cache
+device_cache_path = os.path.join(os.path.expanduser("~"), ".movelladot", "devices.json")
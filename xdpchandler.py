@@ -29,8 +29,15 @@
 
 import movelladot_pc_sdk
 from collections import defaultdict
-from threading import Lock
-from pynput import keyboard
+from threading import Lock, Condition
+from packetbuffer import SpscChannel
+from latencystats import DeviceLatency, dumpReport
+from sequencetracker import SequenceTracker
+from sessionfile import SessionWriter
+from connectscheduler import ConnectionScheduler
+from deviceregistry import DeviceRegistry
+import devicecache
+from reconnectsupervisor import ReconnectSupervisor
 from user_settings import *
 import time
 
@@ -42,27 +49,123 @@ def on_press(key):
     waitForConnections = False
 
 
+def _deviceKey(device):
+    """
+    Returns the identity of the C++ device object behind a SWIG proxy
+    The SDK passes a new proxy object to every callback, but they all wrap the same pointer
+    """
+    return int(device.this)
+
+
+class _ExportState:
+    """
+    Export progress of one USB device, updated by the SDK callbacks
+    """
+    __slots__ = ("deviceId", "recording", "packets", "totalPackets", "current", "total", "done", "lastUpdate")
+
+    def __init__(self, deviceId):
+        self.deviceId = deviceId
+        self.recording = None
+        # Packets of the current export and of all exports of the device
+        self.packets = 0
+        self.totalPackets = 0
+        self.current = 0
+        self.total = 0
+        self.done = False
+        self.lastUpdate = time.perf_counter()
+
+    def asDict(self):
+        return {"recording": self.recording, "packets": self.packets, "current": self.current,
+                "total": self.total, "done": self.done, "last_update": self.lastUpdate}
+
+
+class _Advertisement:
+    """
+    The advertisements received from one device during discovery
+    """
+    __slots__ = ("portInfo", "rssi", "count", "firstSeen", "lastSeen")
+
+    def __init__(self, portInfo, rssi, now):
+        self.portInfo = portInfo
+        self.rssi = rssi
+        self.count = 1
+        self.firstSeen = now
+        self.lastSeen = now
+
+    def asDict(self):
+        return {"rssi": self.rssi, "count": self.count, "first_seen": self.firstSeen, "last_seen": self.lastSeen}
+
+
+def _rssi(portInfo):
+    """
+    Returns the signal strength of an advertisement in dBm, None if the SDK does not report it
+    """
+    rssi = getattr(portInfo, "rssi", None)
+    return rssi() if rssi is not None else None
+
+
+class _CallProfile:
+    """
+    Accumulates the number of calls and the time spent per call name
+    """
+    def __init__(self):
+        self.__start = time.perf_counter()
+        self.__calls = defaultdict(int)
+        self.__seconds = defaultdict(float)
+
+    def add(self, name, seconds):
+        self.__calls[name] += 1
+        self.__seconds[name] += seconds
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.__start, 1e-9)
+        return {name: {"calls": calls,
+                       "seconds": self.__seconds[name],
+                       "calls_per_s": calls / elapsed,
+                       "ms_per_s": 1000.0 * self.__seconds[name] / elapsed}
+                for name, calls in list(self.__calls.items())}
+
+
 class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
     def __init__(self, max_buffer_size=5):
         movelladot_pc_sdk.XsDotCallback.__init__(self)
 
         self.__manager = 0
 
+        # Serializes the readers of the packet channels, the SDK callback thread never takes it
+        # unless a reader is sleeping in waitForPacket(s)
         self.__lock = Lock()
+        # Signalled by onLiveDataAvailable whenever a packet was published while a reader is waiting
+        self.__packetCondition = Condition(self.__lock)
+        self.__packetWaiters = 0
         self.__errorReceived = False
         self.__updateDone = False
         self.__recordingStopped = False
-        self.__exportDone = False
         self.__closing = False
-        self.__progressCurrent = 0
-        self.__progressTotal = 0
-        self.__packetsReceived = 0
+        # Device pointer -> _ExportState of each USB device that exported, signalled when an export finishes
+        self.__exports = dict()
+        self.__exportCondition = Condition()
 
         self.__detectedDots = list()
-        self.__connectedDots = list()
+        # Bluetooth address -> _Advertisement of the detected (and the ignored) devices, guarded by
+        # __discoveryCondition, which is signalled on every new device
+        self.__advertisements = dict()
+        self.__ignored = set()
+        self.__discoveryCondition = Condition()
+        # The connected devices (and the ones that stream without being opened here) by address and pointer
+        self.__devices = DeviceRegistry()
+        self.__swigProfile = None
+        # Bluetooth address -> DeviceLatency while latency statistics are enabled, guarded by __lock
+        self.__latencyStats = None
+        # SessionWriter while startSessionRecording is active
+        self.__sessionWriter = None
+        # ReconnectSupervisor while startSupervisor is active
+        self.__supervisor = None
         self.__connectedUsbDots = list()
+        # Bluetooth address -> connectscheduler.ConnectResult of the devices connectDots tried
+        self.__connectResults = dict()
         self.__maxNumberOfPacketsInBuffer = max_buffer_size
-        self.__packetBuffer = defaultdict(list)
+        self.__packetBuffer = dict()
         self.__progress = dict()
 
     def initialize(self):
@@ -96,6 +199,10 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         """
         Close connections to any Movella DOT devices and destructs the connection manager created in initialize
         """
+        if self.__supervisor is not None:
+            self.stopSupervisor()
+        if self.__sessionWriter is not None:
+            self.stopSessionRecording()
         print("Closing ports...")
         self.__closing = True
         self.__manager.close()
@@ -115,11 +222,13 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         print("Scanning for devices...")
         self.__manager.enableDeviceDetection()
 
-        # Setup the keyboard input listener
+        # Setup the keyboard input listener, imported here so headless use of the handler does not need pynput
+        from pynput import keyboard
         listener = keyboard.Listener(on_press=on_press)
         listener.start()
 
         print("Press any key or wait 20 seconds to stop scanning...")
+        expected = {address.upper() for address in whitelist}
         connectedDOTCount = 0
         startTime = movelladot_pc_sdk.XsTimeStamp_nowMs()
         while waitForConnections and not self.errorReceived() and movelladot_pc_sdk.XsTimeStamp_nowMs() - startTime <= 20000:
@@ -129,51 +238,215 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
             if nextCount != connectedDOTCount:
                 print(f"Number of connected DOTs: {nextCount}. Press any key to start.")
                 connectedDOTCount = nextCount
+            if expected and self.__discoveryComplete(expected, None):
+                print("All whitelisted devices found.")
+                break
 
+        listener.stop()
         self.__manager.disableDeviceDetection()
         print("Stopped scanning for devices.")
 
-    def connectDots(self):
+    def discoverDots(self, expected=None, count=None, timeout=20.0):
+        """
+        Scans for Movella DOT devices without user interaction
+
+        Returns as soon as every expected address has advertised, or count devices were found, or after
+        timeout seconds. Repeated advertisements of a device only update its signal strength, afterwards
+        detectedDots() is ordered from the strongest to the weakest signal, so connectDots opens the
+        devices with the best link first
+
+        Parameters:
+            expected: The bluetooth addresses to wait for, None for user_settings.whitelist
+            count: The number of devices to wait for, None to wait for the expected addresses only
+            timeout: The maximum scan time in seconds
+        Returns:
+             The detected XsPortInfos, strongest signal first (devices without signal strength last)
+        """
+        if expected is None:
+            expected = whitelist
+        expected = {address.upper() for address in expected or ()}
+        if not expected and count is None:
+            print(f"Scanning for devices for {timeout:g} seconds...")
+        else:
+            print(f"Scanning for {len(expected) or count} device(s), at most {timeout:g} seconds...")
+
+        start = time.perf_counter()
+        self.__manager.enableDeviceDetection()
+        try:
+            with self.__discoveryCondition:
+                self.__discoveryCondition.wait_for(lambda: self.__discoveryComplete(expected, count), timeout)
+        finally:
+            self.__manager.disableDeviceDetection()
+
+        with self.__discoveryCondition:
+            self.__detectedDots.sort(key=lambda portInfo: self.__signalRank(portInfo.bluetoothAddress()))
+            detected = list(self.__detectedDots)
+        missing = expected - {portInfo.bluetoothAddress().upper() for portInfo in detected}
+        print(f"Found {len(detected)} device(s) in {time.perf_counter() - start:.2f} s.")
+        if missing:
+            print(f"Not found: {', '.join(sorted(missing))}")
+        return detected
+
+    def advertisements(self):
+        """
+        Returns:
+             A dict mapping the bluetooth address of every detected device to its strongest signal
+             strength (None if unknown), the number of advertisements received and the perf_counter
+             times of the first and the last one
+        """
+        with self.__discoveryCondition:
+            return {address: advertisement.asDict() for address, advertisement in self.__advertisements.items()}
+
+    def __discoveryComplete(self, expected, count):
+        if self.__errorReceived:
+            return True
+        if expected and expected.issubset(address.upper() for address in self.__advertisements):
+            return True
+        return count is not None and len(self.__detectedDots) >= count
+
+    def __signalRank(self, address):
+        rssi = self.__advertisements[address].rssi if address in self.__advertisements else None
+        return (rssi is None, -(rssi or 0))
+
+    def connectDots(self, workers=4, attempts=3, backoff=None):
         """
         Connects to Movella DOTs found via either USB or Bluetooth connection
 
         Uses the isBluetooth function of the XsPortInfo to determine if the device was detected
         via Bluetooth or via USB. Then connects to the device accordingly
-        When using Bluetooth, a retry has been built in, since wireless connection sometimes just fails the 1st time
-        Connected devices can be retrieved using either connectedDots() or connectedUsbDots()
+        Bluetooth devices are opened in parallel by a ConnectionScheduler, a device that fails is retried
+        after an exponential backoff, since wireless connection sometimes just fails the 1st time
+        Connected devices can be retrieved using either connectedDots() or connectedUsbDots(), the
+        time and attempts it took per device using connectReport()
 
         USB and Bluetooth devices should not be mixed in the same session!
+
+        Parameters:
+            workers: The maximum number of Bluetooth devices connecting at the same time, 1 connects one after the other
+            attempts: The number of connection attempts per Bluetooth device
+            backoff: The connectscheduler.Backoff between the attempts, None for the default
         """
+        bluetoothPorts = [portInfo for portInfo in self.detectedDots() if portInfo.isBluetooth()]
+        if bluetoothPorts:
+            self.__connectBluetooth(bluetoothPorts, workers, attempts, backoff)
+
         for portInfo in self.detectedDots():
             if portInfo.isBluetooth():
-                address = portInfo.bluetoothAddress()
-
-                print(f"Opening DOT with address: @ {address}")
-                if not self.__manager.openPort(portInfo):
-                    print(f"Connection to Device {address} failed, retrying...")
-                    print(f"Device {address} retry connected:")
-                    if not self.__manager.openPort(portInfo):
-                        print(f"Could not open DOT. Reason: {self.__manager.lastResultText()}")
-                        continue
-
-                device = self.__manager.device(portInfo.deviceId())
-                if device is None:
-                    continue
-
-                self.__connectedDots.append(device)
-                print(f"Found a device with Tag: {device.deviceTagName()} @ address: {address}")
-            else:
-                print(f"Opening DOT with ID: {portInfo.deviceId().toXsString()} @ port: {portInfo.portName()}, baudrate: {portInfo.baudrate()}")
-                if not self.__manager.openPort(portInfo):
-                    print(f"Could not open DOT. Reason: {self.__manager.lastResultText()}")
-                    continue
+                continue
+            print(f"Opening DOT with ID: {portInfo.deviceId().toXsString()} @ port: {portInfo.portName()}, baudrate: {portInfo.baudrate()}")
+            if not self.__manager.openPort(portInfo):
+                print(f"Could not open DOT. Reason: {self.__manager.lastResultText()}")
+                continue
 
-                device = self.__manager.usbDevice(portInfo.deviceId())
-                if device is None:
-                    continue
+            device = self.__manager.usbDevice(portInfo.deviceId())
+            if device is None:
+                continue
 
-                self.__connectedUsbDots.append(device)
-                print(f"Device: {device.productCode()}, with ID: {device.deviceId().toXsString()} opened.")
+            self.__connectedUsbDots.append(device)
+            print(f"Device: {device.productCode()}, with ID: {device.deviceId().toXsString()} opened.")
+
+    def connectKnownDots(self, expected=None, scanTimeout=20.0, workers=4, attempts=2, backoff=None, cachePath=None):
+        """
+        Connects the devices of the device cache directly, without waiting for their advertisements,
+        and scans only for the expected devices that could not be reached that way
+        Without a cache (first start) this is discoverDots followed by connectDots. The connected devices
+        are saved to the cache afterwards
+
+        Parameters:
+            expected: The bluetooth addresses to connect, None for user_settings.whitelist, empty for all cached devices
+            scanTimeout: The maximum time to scan for the devices that are missing after the direct connection
+            workers: The maximum number of devices connecting at the same time
+            attempts: The number of connection attempts per device, for the cached devices and the scanned ones
+            backoff: The connectscheduler.Backoff between the attempts, None for the default
+            cachePath: The device cache file, None for user_settings.device_cache_path
+        Returns:
+             connectedDots()
+        """
+        cachePath = cachePath or device_cache_path
+        cached = devicecache.load(cachePath) if cachePath else dict()
+        if expected is None:
+            expected = whitelist
+        expected = {address.upper() for address in expected or ()}
+
+        entries = [entry for address, entry in cached.items() if not expected or address.upper() in expected]
+        portInfos = []
+        for entry in entries:
+            portInfo = devicecache.portInfo(movelladot_pc_sdk, entry)
+            if portInfo is None:
+                # The constructor fails the same way for every entry, no need to try the others
+                print("This SDK version can not open a device without its advertisement, "
+                      f"scanning for the {len(entries)} cached device(s) instead.")
+                portInfos = []
+                break
+            portInfos.append(portInfo)
+        if portInfos:
+            print(f"Connecting {len(portInfos)} known device(s) from {cachePath}...")
+            self.__connectBluetooth(portInfos, workers, attempts, backoff)
+
+        wanted = expected or {address.upper() for address in cached}
+        missing = wanted - {address.upper() for address in self.connectedAddresses()}
+        if missing or not wanted:
+            # Devices that were off or moved, or no cache yet: scan, but only until the missing ones advertised
+            self.discoverDots(expected=missing, timeout=scanTimeout)
+            connected = {address.upper() for address in self.connectedAddresses()}
+            scanned = [portInfo for portInfo in self.detectedDots() if portInfo.isBluetooth()
+                       and portInfo.bluetoothAddress().upper() not in connected
+                       and (not missing or portInfo.bluetoothAddress().upper() in missing)]
+            if scanned:
+                self.__connectBluetooth(scanned, workers, attempts, backoff)
+
+        if cachePath:
+            self.saveDeviceCache(cachePath)
+        return self.connectedDots()
+
+    def saveDeviceCache(self, path=None):
+        """
+        Adds the connected devices (address, device ID, tag name, firmware, output rate and filter profile)
+        to the device cache, devices cached earlier that are not connected now are kept
+
+        Parameters:
+            path: The device cache file, None for user_settings.device_cache_path
+        Returns:
+             True if the cache was written
+        """
+        path = path or device_cache_path
+        entries = devicecache.load(path)
+        for handle in self.__devices.snapshot():
+            entries[handle.address] = devicecache.describe(handle.device, handle.address)
+        try:
+            devicecache.save(path, entries)
+            return True
+        except OSError as error:
+            print(f"Could not save the device cache {path}: {error}")
+            return False
+
+    def __connectBluetooth(self, portInfos, workers, attempts, backoff):
+        """
+        Opens the ports with a ConnectionScheduler and registers the devices that connected, skipping
+        the ones that are connected already
+        """
+        connected = set(self.connectedAddresses())
+        portInfos = [portInfo for portInfo in portInfos if portInfo.bluetoothAddress() not in connected]
+        if not portInfos:
+            return
+        scheduler = ConnectionScheduler(self.__manager, workers=workers, attempts=attempts, backoff=backoff)
+        # Registered in the given order, so the slots do not depend on which connection finished first
+        for result in scheduler.connect(portInfos):
+            self.__connectResults[result.address] = result
+            if not result.connected():
+                continue
+            device = result.device
+            self.__registerDevice(device, result.address, connected=True)
+            print(f"Found a device with Tag: {device.deviceTagName()} @ address: {result.address}")
+
+    def connectReport(self):
+        """
+        Returns:
+             A dict mapping the address of each Bluetooth device connectDots tried to whether it is connected,
+             the attempts and retries, the seconds until it was done, spent in openPort and in backoff, and
+             the last error. connectscheduler.formatReport prints it as a table
+        """
+        return {address: result.asDict() for address, result in self.__connectResults.items()}
 
     def detectUsbDevices(self):
         """
@@ -199,9 +472,46 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
     def connectedDots(self):
         """
         Returns:
-            A list containing an XsDotDevice pointer for each Movella DOT device connected via Bluetooth
+            A list containing an XsDotDevice pointer for each Movella DOT device connected via Bluetooth,
+            ordered by slot. It is a copy, devices that connect or power down later do not change it
+        """
+        return [handle.device for handle in self.__devices.snapshot()]
+
+    def connectedAddresses(self):
+        """
+        Returns:
+            A list with the cached bluetooth address of each device in connectedDots(), in the same order
+        """
+        return [handle.address for handle in self.__devices.snapshot()]
+
+    def connectedDevices(self):
+        """
+        Returns:
+            A dict mapping the bluetooth address of each connected device to its XsDotDevice, ordered by slot.
+            Like connectedDots() a snapshot, safe to iterate while devices connect or power down
+        """
+        return {handle.address: handle.device for handle in self.__devices.snapshot()}
+
+    def connectedDevice(self, bluetoothAddress):
+        """
+        Parameters:
+            bluetoothAddress: The bluetooth address of a Movella DOT
+        Returns:
+            The connected XsDotDevice with the address, None if it is not connected
+        """
+        handle = self.__devices.get(bluetoothAddress)
+        return handle.device if handle is not None and handle.connected else None
+
+    def deviceSlot(self, bluetoothAddress):
+        """
+        Parameters:
+            bluetoothAddress: The bluetooth address of a Movella DOT
+        Returns:
+            The slot of the device, it stays the same when the device reconnects or connects again
+            after a power down. None if the device is not known
         """
-        return self.__connectedDots
+        handle = self.__devices.get(bluetoothAddress)
+        return handle.slot if handle is not None else None
 
     def connectedUsbDots(self):
         """
@@ -217,11 +527,63 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         """
         return self.__errorReceived
 
-    def exportDone(self):
+    def exportDone(self, device=None):
+        """
+        Parameters:
+            device: An XsDotUsbDevice, None for all devices that started an export
+        Returns:
+             True if the export of the device (or of every exporting device) has finished
+        """
+        if device is None:
+            states = list(self.__exports.values())
+            return bool(states) and all(state.done for state in states)
+        state = self.__exports.get(_deviceKey(device))
+        return state is not None and state.done
+
+    def prepareExport(self, device, recordingIndex=None):
         """
-        True if the export has finished
+        Resets the export state of a USB device, call it before device.startExportRecording so
+        exportDone, waitForExport and exportProgress refer to the new export
+
+        Parameters:
+            device: The XsDotUsbDevice
+            recordingIndex: The recording that is going to be exported, reported by exportProgress
+        """
+        state = self.__exportState(device)
+        with self.__exportCondition:
+            state.recording = recordingIndex
+            state.packets = 0
+            state.current = 0
+            state.total = 0
+            state.done = False
+            state.lastUpdate = time.perf_counter()
+
+    def waitForExport(self, device, timeout=None):
         """
-        return self.__exportDone
+        Sleeps until the export of a USB device has finished
+
+        Parameters:
+            device: The XsDotUsbDevice
+            timeout: The maximum time to wait in seconds, None waits indefinitely
+        Returns:
+             True if the export has finished, False on timeout
+        """
+        state = self.__exportState(device)
+        with self.__exportCondition:
+            return self.__exportCondition.wait_for(lambda: state.done, timeout)
+
+    def exportProgress(self, device=None):
+        """
+        Parameters:
+            device: An XsDotUsbDevice, None for all devices that exported
+        Returns:
+             A dict with the recording index, the packets received, the progress (current of total,
+             total 0xffff if unknown), whether it is done and the perf_counter time of the last
+             callback of the export of the device. For device None a dict of those per device ID
+        """
+        if device is None:
+            return {state.deviceId: state.asDict() for state in list(self.__exports.values())}
+        return self.__exportState(device).asDict()
 
     def updateDone(self):
         """
@@ -254,8 +616,8 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         Returns:
              True if a data packet is available for each of the connected Movella DOT devices
         """
-        for dev in self.__connectedDots:
-            if self.packetAvailable(dev.bluetoothAddress()) == 0:
+        for handle in self.__devices.snapshot():
+            if len(handle.channel) == 0:
                 return False
         return True
 
@@ -266,17 +628,49 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         Returns:
             True if a data packet is available for the Movella DOT with the provided bluetoothAddress
         """
-        self.__lock.acquire()
-        res = len(self.__packetBuffer[bluetoothAddress]) > 0
-        self.__lock.release()
+        return len(self.__channel(bluetoothAddress)) > 0
+
+    def waitForPacket(self, bluetoothAddress, timeout=None):
+        """
+        Blocks until a data packet is available for a device, without polling
+
+        Parameters:
+            bluetoothAddress: The bluetooth address of the Movella DOT to wait for
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+            True if a data packet is available, False if the timeout expired
+        """
+        channel = self.__channel(bluetoothAddress)
+        self.__packetCondition.acquire()
+        self.__packetWaiters += 1
+        res = self.__packetCondition.wait_for(lambda: len(channel) > 0, timeout)
+        self.__packetWaiters -= 1
+        self.__packetCondition.release()
+        return res
+
+    def waitForPackets(self, timeout=None):
+        """
+        Blocks until a data packet is available for each of the connected Movella DOT devices, without polling
+
+        Parameters:
+            timeout: The maximum time to wait in seconds, None waits forever
+        Returns:
+            True if a data packet is available for each device, False if the timeout expired
+        """
+        channels = [handle.channel for handle in self.__devices.snapshot()]
+        self.__packetCondition.acquire()
+        self.__packetWaiters += 1
+        res = self.__packetCondition.wait_for(lambda: all(len(channel) > 0 for channel in channels), timeout)
+        self.__packetWaiters -= 1
+        self.__packetCondition.release()
         return res
 
     def packetsReceived(self):
         """
         Returns:
-             The number of packets received during data export
+             The number of packets received during data export, of all USB devices
         """
-        return self.__packetsReceived
+        return sum(state.totalPackets for state in list(self.__exports.values()))
 
     def getNextPacket(self, bluetoothAddress):
         """
@@ -285,12 +679,339 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         Returns:
              The next available data packet for the Movella DOT with the provided bluetoothAddress
         """
-        if len(self.__packetBuffer[bluetoothAddress]) == 0:
-            return None
         self.__lock.acquire()
-        oldest_packet = movelladot_pc_sdk.XsDataPacket(self.__packetBuffer[bluetoothAddress].pop(0))
+        channel = self.__channel(bluetoothAddress)
+        depth = len(channel)
+        item = channel.pop()
+        if item is not None:
+            # The channel holds a private copy made in onLiveDataAvailable, so it can be handed out as-is
+            item = self.__unstamp(bluetoothAddress, depth, [item])[0]
+        self.__lock.release()
+        return item
+
+    def getPackets(self, bluetoothAddress, max_n=None, with_times=False):
+        """
+        Retrieves the pending data packets of a single device with one lock acquisition
+
+        Parameters:
+            bluetoothAddress: The bluetooth address of the Movella DOT to get the packets for
+            max_n: The maximum number of packets to return, None returns all pending packets
+            with_times: Return (receiveTime, packet) tuples, receiveTime is the time.perf_counter() of the callback
+        Returns:
+             A list with the pending data packets for the Movella DOT, oldest first
+        """
+        self.__lock.acquire()
+        channel = self.__channel(bluetoothAddress)
+        depth = len(channel)
+        packets = self.__unstamp(bluetoothAddress, depth, channel.popMany(max_n), with_times)
         self.__lock.release()
-        return oldest_packet
+        return packets
+
+    def drainAll(self, max_n=None, with_times=False):
+        """
+        Retrieves the pending data packets of all devices with one lock acquisition
+
+        Parameters:
+            max_n: The maximum number of packets to return per device, None returns all pending packets
+            with_times: Return (receiveTime, packet) tuples, receiveTime is the time.perf_counter() of the callback
+        Returns:
+             A dict mapping the bluetooth address of each device to a list of its pending data packets, oldest first
+        """
+        self.__lock.acquire()
+        # Copy the items first, the callback thread may add a channel for a new device meanwhile
+        packets = {address: self.__unstamp(address, len(channel), channel.popMany(max_n), with_times)
+                   for address, channel in list(self.__packetBuffer.items())}
+        self.__lock.release()
+        return packets
+
+    def droppedPackets(self, bluetoothAddress):
+        """
+        Parameters:
+            bluetoothAddress: The bluetooth address of the Movella DOT
+        Returns:
+             The number of packets that were discarded because the packet buffer of the device was full
+        """
+        return self.__channel(bluetoothAddress).dropped()
+
+    def __unstamp(self, bluetoothAddress, depth, items, keepTimes=False):
+        """
+        Strips the receive times from dequeued (receiveTime, packet) items unless keepTimes is set,
+        the lock must be held. Updates the latency statistics of the device when they are enabled
+        """
+        stats = self.__latencyStats
+        if stats is None or not items:
+            return items if keepTimes else [packet for _, packet in items]
+
+        device = stats.get(bluetoothAddress)
+        if device is None:
+            device = stats[bluetoothAddress] = DeviceLatency(self.__maxNumberOfPacketsInBuffer)
+        device.addQueueDepth(depth)
+        now = time.perf_counter()
+        packets = []
+        for receiveTime, packet in items:
+            device.addPacket(receiveTime, packet.sampleTimeFine() if packet.containsSampleTimeFine() else None, now)
+            packets.append(packet)
+        return items if keepTimes else packets
+
+    def enableLatencyStats(self, enabled=True):
+        """
+        Starts (or stops) collecting the latency statistics of the packets dequeued by getNextPacket,
+        getPackets and drainAll. Enabling again restarts the measurement
+
+        Parameters:
+            enabled: True to start collecting, False to stop
+        """
+        self.__lock.acquire()
+        self.__latencyStats = dict() if enabled else None
+        self.__lock.release()
+
+    def latencyStats(self, bluetoothAddress=None):
+        """
+        Parameters:
+            bluetoothAddress: The bluetooth address of a single Movella DOT, None reports all devices
+        Returns:
+             A dict mapping the bluetooth address of each device to its statistics: the callback to dequeue
+             latency and the inter-arrival jitter (derived from sampleTimeFine) in milliseconds, and the
+             packet channel depth at dequeue, each with count, mean, min, p50, p95, p99 and max.
+             Empty if latency statistics are disabled
+        """
+        self.__lock.acquire()
+        stats = self.__latencyStats or dict()
+        report = {address: device.report() for address, device in stats.items()
+                  if bluetoothAddress is None or address == bluetoothAddress}
+        self.__lock.release()
+        return report
+
+    def dumpLatencyStats(self, path):
+        """
+        Writes the latency statistics of all devices to a JSON file
+
+        Parameters:
+            path: The file to write
+        """
+        dumpReport(self.latencyStats(), path)
+
+    def sequenceStats(self, bluetoothAddress=None):
+        """
+        Reports the sample loss of the devices, detected from gaps in sampleTimeFine at the output rate
+
+        Parameters:
+            bluetoothAddress: The bluetooth address of a single Movella DOT, None reports all devices
+        Returns:
+             A dict mapping the bluetooth address of each device that sent data to its SequenceTracker
+             report: received, lost and out of order samples, loss percentage, gaps, stalls and bursts
+             and the effective throughput. Samples dropped by a full packet buffer are not included,
+             see droppedPackets()
+        """
+        return {handle.address: handle.tracker.report() for handle in self.__devices.handles()
+                if handle.tracker is not None and (bluetoothAddress is None or handle.address == bluetoothAddress)}
+
+    def resetSequenceStats(self):
+        """
+        Restarts the sample loss statistics of all devices, e.g. after changing the output rate
+        The output rate is read from the devices again when their next packet arrives
+        """
+        for handle in self.__devices.handles():
+            handle.tracker = None
+
+    def startSessionRecording(self, path, metadata=None, **kwargs):
+        """
+        Starts writing every live data packet of the connected devices to a binary session file
+        The SDK callback only queues the packets, a background thread reads their fields and writes
+        them, see sessionfile.SessionWriter. Convert the session with sessionfile.toCsv if needed
+
+        Parameters:
+            path: The session file to create
+            metadata: A dict with additional header fields, e.g. the payload mode
+            kwargs: Passed on to SessionWriter, e.g. fsyncInterval
+        Returns:
+             The SessionWriter
+        """
+        if self.__sessionWriter is not None:
+            raise RuntimeError(f"Already recording to {self.__sessionWriter.path()}")
+        handles = self.__devices.handles()
+        outputRates = {self.__swigCall("outputRate", handle.device.outputRate) for handle in self.__devices.snapshot()}
+        writer = SessionWriter(path, {handle.slot: handle.address for handle in handles},
+                               outputRate=outputRates.pop() if len(outputRates) == 1 else None,
+                               metadata=metadata, **kwargs)
+        self.__sessionWriter = writer
+        return writer
+
+    def stopSessionRecording(self):
+        """
+        Stops the session recording, writes the queued packets and closes the session file
+
+        Returns:
+             The final SessionWriter.stats(), None if no session was recorded
+        """
+        writer = self.__sessionWriter
+        if writer is None:
+            return None
+        self.__sessionWriter = None
+        return writer.close()
+
+    def startSupervisor(self, payloadMode, checkInterval=0.5, silenceTimeout=None, backoff=None, maxAttempts=None):
+        """
+        Starts reconnecting devices that lose their connection during the measurement
+        The filter profile and output rate the connected devices have now are applied again after a
+        reconnection, then the measurement is restarted with payloadMode. Each outage is listed by
+        dataGaps() and the first sample after it is flagged with sessionfile.AFTER_GAP in a running
+        session recording; the sample loss statistics count the samples missed meanwhile
+
+        Parameters:
+            payloadMode: The payload mode the measurement was started with
+            checkInterval: The interval in seconds at which the connections are checked
+            silenceTimeout: Seconds without a packet after which a device counts as lost, None to only
+                            use the connection state
+            backoff: The connectscheduler.Backoff between reconnection attempts, None for the default
+            maxAttempts: The number of reconnection attempts before a device is given up, None for no limit
+        Returns:
+             The ReconnectSupervisor
+        """
+        if self.__supervisor is not None:
+            raise RuntimeError("The reconnect supervisor is already running")
+        supervisor = ReconnectSupervisor(self, self.__manager, payloadMode, checkInterval=checkInterval,
+                                         silenceTimeout=silenceTimeout, backoff=backoff, maxAttempts=maxAttempts)
+        for handle in self.__devices.snapshot():
+            device = handle.device
+            result = self.__connectResults.get(handle.address)
+            portInfo = result.portInfo if result is not None else device.portInfo()
+            # setOnboardFilterProfile takes the label, not the XsFilterProfile object
+            filterProfile = str(device.onboardFilterProfile().label())
+            supervisor.watch(handle.address, device, portInfo, device.outputRate(), filterProfile)
+        supervisor.start()
+        self.__supervisor = supervisor
+        return supervisor
+
+    def stopSupervisor(self):
+        """
+        Stops reconnecting devices
+
+        Returns:
+             The final supervisorReport(), None if the supervisor was not running
+        """
+        supervisor = self.__supervisor
+        if supervisor is None:
+            return None
+        self.__supervisor = None
+        supervisor.stop()
+        return supervisor.report()
+
+    def supervisorReport(self):
+        """
+        Returns:
+             A dict mapping each supervised address to its state (streaming, reconnecting or failed), the
+             number of disconnects, reconnects and reconnection attempts, the downtime in seconds and the
+             last error. Empty if the supervisor is not running
+        """
+        supervisor = self.__supervisor
+        return supervisor.report() if supervisor is not None else dict()
+
+    def dataGaps(self):
+        """
+        Returns:
+             A list with a dict per outage the supervisor recovered from: the address, the perf_counter
+             times the device was lost and restored and the duration in seconds
+        """
+        supervisor = self.__supervisor
+        return supervisor.gaps() if supervisor is not None else list()
+
+    def lastReceiveTime(self, bluetoothAddress):
+        """
+        Returns:
+             The perf_counter time of the last packet of a device, None if none arrived yet
+        """
+        handle = self.__devices.get(bluetoothAddress)
+        return handle.lastReceive if handle is not None else None
+
+    def rebindDevice(self, bluetoothAddress, device):
+        """
+        Continues the stream of a connected address with a (new) device object after a reconnection, keeping
+        its slot, packet channel and statistics, and marks the gap in a running session recording
+
+        Parameters:
+            bluetoothAddress: The address of a device in connectedDots()
+            device: The XsDotDevice that was reconnected, may be the same object
+        """
+        handle = self.__devices.rebind(bluetoothAddress, device, _deviceKey(device))
+        if handle is None:
+            return
+        handle.lastReceive = time.perf_counter()
+        writer = self.__sessionWriter
+        if writer is not None:
+            writer.markGap(handle.slot)
+
+    def reconnectFailed(self, bluetoothAddress):
+        """
+        Called by the reconnect supervisor when it gave up a device, removes it from connectedDots()
+
+        Parameters:
+            bluetoothAddress: The address of the device
+        """
+        print(f"\n{bluetoothAddress} Device given up after failed reconnection attempts")
+        self.__devices.remove(bluetoothAddress)
+
+    def __channel(self, bluetoothAddress):
+        """
+        Returns the packet channel of a device, creating it on first use
+        dict.setdefault is atomic in CPython, so the callback thread and the readers can both create it
+        """
+        channel = self.__packetBuffer.get(bluetoothAddress)
+        if channel is None:
+            channel = self.__packetBuffer.setdefault(bluetoothAddress, SpscChannel(self.__maxNumberOfPacketsInBuffer))
+        return channel
+
+    def __registerDevice(self, device, address=None, connected=False):
+        """
+        Creates the cached handle (slot, address and packet channel) of a device, connected adds it to connectedDots()
+        """
+        if address is None:
+            address = self.__swigCall("bluetoothAddress", lambda: device.portInfo().bluetoothAddress())
+        handle = self.__devices.add(address, device, _deviceKey(device), self.__channel(address), connected)
+        writer = self.__sessionWriter
+        if writer is not None:
+            writer.setDevice(handle.slot, address)
+        return handle
+
+    def __swigCall(self, name, function, *args):
+        """
+        Calls function, timing it under name when SWIG profiling is enabled
+        """
+        profile = self.__swigProfile
+        if profile is None:
+            return function(*args)
+        start = time.perf_counter()
+        res = function(*args)
+        profile.add(name, time.perf_counter() - start)
+        return res
+
+    def enableSwigProfiling(self, enabled=True):
+        """
+        Starts (or stops) timing the SDK calls made on the live data path
+        Enabling again restarts the measurement
+
+        Parameters:
+            enabled: True to start profiling, False to stop
+        """
+        self.__swigProfile = _CallProfile() if enabled else None
+
+    def swigProfile(self):
+        """
+        Returns:
+             A dict mapping each profiled SDK call to its number of calls, total seconds, calls per second
+             and milliseconds spent per second since profiling was enabled. Empty if profiling is disabled
+        """
+        profile = self.__swigProfile
+        return profile.report() if profile is not None else dict()
+
+    def __exportState(self, device):
+        """
+        Returns the export state of a USB device, creating it on first use
+        """
+        state = self.__exports.get(_deviceKey(device))
+        if state is None:
+            state = self.__exports.setdefault(_deviceKey(device), _ExportState(device.deviceId().toXsString()))
+        return state
 
     def addDeviceToProgressBuffer(self, bluetoothAddress):
         """
@@ -310,16 +1031,19 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
 
     def _outputDeviceProgress(self):
         """
-        Helper function for printing file export info to the command line.
+        Helper function for printing file export info to the command line, one entry per exporting device.
         """
-        line = '\rExporting... '
-        if self.__exportDone:
-            line += 'done!'
-        elif self.__progressTotal != 0xffff:
-            line += '{:.1f}%'.format(100.0 * self.__progressCurrent / self.__progressTotal)
-        else:
-            line += f'{self.__progressCurrent}'
-        if self.__exportDone:
+        states = list(self.__exports.values())
+        parts = []
+        for state in states:
+            if state.done:
+                parts.append(f"{state.deviceId} done")
+            elif state.total not in (0, 0xffff):
+                parts.append(f"{state.deviceId} {100.0 * state.current / state.total:.1f}%")
+            else:
+                parts.append(f"{state.deviceId} {state.current}")
+        line = '\rExporting... ' + ' | '.join(parts)
+        if all(state.done for state in states):
             print(line)
         else:
             print(line, end='', flush=True)
@@ -330,10 +1054,25 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         Parameters:
             port_info: The XsPortInfo of the discovered information
         """
-        if not whitelist or port_info.bluetoothAddress() in whitelist:
+        address = port_info.bluetoothAddress()
+        rssi = _rssi(port_info)
+        with self.__discoveryCondition:
+            advertisement = self.__advertisements.get(address)
+            if advertisement is not None:
+                # A device advertises repeatedly, keep it once with its strongest signal
+                advertisement.count += 1
+                advertisement.lastSeen = time.perf_counter()
+                if rssi is not None and (advertisement.rssi is None or rssi > advertisement.rssi):
+                    advertisement.rssi = rssi
+                return
+            if whitelist and address not in whitelist:
+                if address not in self.__ignored:
+                    self.__ignored.add(address)
+                    print(f"Ignoring {address}")
+                return
+            self.__advertisements[address] = _Advertisement(port_info, rssi, time.perf_counter())
             self.__detectedDots.append(port_info)
-        else:
-            print(f"Ignoring {port_info.bluetoothAddress()}")
+            self.__discoveryCondition.notify_all()
 
     def onBatteryUpdated(self, device, batteryLevel, chargingStatus):
         """
@@ -359,18 +1098,37 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
     def onLiveDataAvailable(self, device, packet):
         """
         Called when new data has been received from a device
-        Adds the new packet to the device's packet buffer
-        Monitors buffer size, removes oldest packets if the size gets too big
+        Publishes a copy of the new packet, stamped with the host receive time, on the device's packet
+        channel without taking a lock. The packet channel has a fixed size, when it is full the oldest packet is dropped
 
         Parameters:
             device: The device that initiated the callback.
             packet: The data packet that has been received (and processed).
         """
-        self.__lock.acquire()
-        while len(self.__packetBuffer[device.portInfo().bluetoothAddress()]) >= self.__maxNumberOfPacketsInBuffer:
-            self.__packetBuffer[device.portInfo().bluetoothAddress()].pop()
-        self.__packetBuffer[device.portInfo().bluetoothAddress()].append(movelladot_pc_sdk.XsDataPacket(packet))
-        self.__lock.release()
+        handle = self.__devices.byKey(_deviceKey(device))
+        if handle is None:
+            # A device that was not opened through connectDots, the address is looked up only once
+            handle = self.__registerDevice(device)
+        # perf_counter is monotonic and, unlike time.monotonic on Windows, has sub-millisecond resolution
+        receiveTime = time.perf_counter()
+        tracker = handle.tracker
+        if tracker is None:
+            tracker = handle.tracker = SequenceTracker(self.__swigCall("outputRate", device.outputRate))
+        if self.__swigCall("containsSampleTimeFine", packet.containsSampleTimeFine):
+            tracker.add(self.__swigCall("sampleTimeFine", packet.sampleTimeFine), receiveTime)
+        handle.lastReceive = receiveTime
+        packetCopy = self.__swigCall("XsDataPacket", movelladot_pc_sdk.XsDataPacket, packet)
+        handle.channel.push((receiveTime, packetCopy))
+        writer = self.__sessionWriter
+        if writer is not None:
+            writer.addPacket(handle.slot, receiveTime, packetCopy)
+
+        # Publishing happens before reading the waiter count, and a reader registers before checking
+        # the channels, so a reader can not miss a packet; the lock is only taken when someone waits
+        if self.__packetWaiters:
+            self.__packetCondition.acquire()
+            self.__packetCondition.notify_all()
+            self.__packetCondition.release()
 
     def onProgressUpdated(self, device, current, total, identifier):
         """
@@ -384,8 +1142,10 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
             identifier: An identifier for the task. This may for example be a filename for file read operations.
         """
         if isinstance(device, movelladot_pc_sdk.XsDotUsbDevice):
-            self.__progressCurrent = current
-            self.__progressTotal = total
+            state = self.__exportState(device)
+            state.current = current
+            state.total = total
+            state.lastUpdate = time.perf_counter()
             self._outputDeviceProgress()
         else:
             address = device.bluetoothAddress()
@@ -426,11 +1186,22 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
             newState: The new device state.
             oldState: The old device state.
         """
+        supervisor = self.__supervisor
+        if supervisor is not None and not self.__closing:
+            handle = self.__devices.byKey(_deviceKey(device))
+            if handle is not None and supervisor.supervises(handle.address):
+                # The supervisor checks the device and reconnects it, the device keeps its handle
+                destroyed = newState == movelladot_pc_sdk.XDS_Destructing
+                if destroyed:
+                    # The device object is gone: out of connectedDots() until rebindDevice brings it back
+                    self.__devices.setDisconnected(handle.address)
+                supervisor.notifyStateChanged(handle.address, destroyed=destroyed)
+                return
         if newState == movelladot_pc_sdk.XDS_Destructing and not self.__closing:
             print(f"\n{device.deviceTagName()} Device powered down")
-            for dev in self.__connectedDots:
-                if dev.bluetoothAddress() == device.bluetoothAddress():
-                    self.__connectedDots.remove(dev)
+            handle = self.__devices.byKey(_deviceKey(device))
+            address = handle.address if handle is not None else device.bluetoothAddress()
+            self.__devices.remove(address)
 
     def onButtonClicked(self, device, timestamp):
         """
@@ -451,7 +1222,13 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
             device: The device that initiated the callback.
             packet: The data packet that has been received.
         """
-        self.__packetsReceived += 1
+        # Every device exports on its own SDK thread, so the counters of a device have a single writer
+        state = self.__exports.get(_deviceKey(device))
+        if state is None:
+            state = self.__exportState(device)
+        state.packets += 1
+        state.totalPackets += 1
+        state.lastUpdate = time.perf_counter()
 
     def onRecordedDataDone(self, device):
         """
@@ -462,7 +1239,11 @@ class XdpcHandler(movelladot_pc_sdk.XsDotCallback):
         Parameters:
             device: The device that initiated the callback.
         """
-        self.__exportDone = True
+        state = self.__exportState(device)
+        with self.__exportCondition:
+            state.done = True
+            state.lastUpdate = time.perf_counter()
+            self.__exportCondition.notify_all()
         self._outputDeviceProgress()
 
 